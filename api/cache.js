@@ -0,0 +1,213 @@
+// api/cache.js
+const fs = require('fs');
+const path = require('path');
+const config = require('../shared/config');
+const logger = require('../shared/logger');
+const runner = require('./runner');
+
+/**
+ * Result Cache
+ * Sits in front of runner.scrape: the same product asked for again answers from memory.
+ * - Canonical Key: tracking params, fragments and locale noise are stripped (see canonicalUrl),
+ *   so `?utm_source=x#reviews` and the bare URL share one entry.
+ * - LRU: at most CACHE_MAX_ENTRIES results; the least recently used one goes first.
+ * - TTL per domain: CACHE_DOMAIN_TTL_MS (matched on the host and its parent domains), else CACHE_TTL_MS.
+ * - Coalescing: concurrent requests for the same key share ONE scrape.
+ * - Bypass: `Cache-Control: no-cache` skips the lookup (the fresh result is still stored).
+ * - Optional file tier (CACHE_STORE_FILE): entries survive a restart.
+ *
+ * Only successful scrapes with at least one image are cached (not partial results salvaged from a timeout).
+ */
+
+const entries = new Map(); // key -> { result, expires_at } (insertion order = LRU order)
+const inflight = new Map(); // key -> Promise
+const counters = { hits: 0, misses: 0, bypassed: 0, coalesced: 0 };
+let loaded = false;
+let saveTimer = null;
+
+// === Canonical URL ===
+
+const TRACKING_PARAMS = new Set([
+    'gclid', 'gclsrc', 'dclid', 'fbclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid',
+    '_ga', '_gl', 'ref', 'ref_', 'spm', 'cmpid',
+    // Flipkart / eBay listing + tracking noise (pid, var, variant are kept: they pick the product)
+    'otracker', 'lid', 'marketplace', 'srno', 'ssid', 'iid', '_trkparms', '_trksid', 'amdata'
+]);
+const TRACKING_PREFIXES = ['utm_', 'pf_rd_', 'pd_rd_'];
+const LOCALE_PARAMS = new Set(['lang', 'language', 'locale', 'hl', 'currency']);
+
+/**
+ * One key per product page:
+ * lowercase host without `www.`, no fragment / tracking / locale params, sorted query,
+ * no trailing slash, and the short product path on Amazon (/dp/<ASIN>) and eBay (/itm/<id>).
+ */
+function canonicalUrl(raw) {
+    const url = new URL(raw);
+    url.hash = '';
+    url.hostname = url.hostname.toLowerCase().replace(/^www\./, '');
+
+    const kept = [...url.searchParams.entries()]
+        .filter(([name]) => {
+            const n = name.toLowerCase();
+            return !TRACKING_PARAMS.has(n) && !LOCALE_PARAMS.has(n) && !TRACKING_PREFIXES.some(p => n.startsWith(p));
+        })
+        .sort(([a], [b]) => a.localeCompare(b));
+    url.search = new URLSearchParams(kept).toString();
+
+    let pathname = url.pathname;
+    const amazon = /^amazon\./.test(url.hostname) && pathname.match(/\/(?:dp|gp\/product)\/([A-Z0-9]{10})/i);
+    const ebay = /^ebay\./.test(url.hostname) && pathname.match(/\/itm\/(?:[^/]+\/)?(\d{9,})/);
+    if (amazon) {
+        pathname = `/dp/${amazon[1].toUpperCase()}`;
+        url.search = '';
+    } else if (ebay) {
+        pathname = `/itm/${ebay[1]}`;
+    }
+    url.pathname = pathname.length > 1 ? pathname.replace(/\/+$/, '') : pathname;
+
+    return url.toString();
+}
+
+function ttlFor(key) {
+    const parts = new URL(key).hostname.split('.');
+    for (let i = 0; i < parts.length - 1; i++) {
+        const ttl = config.CACHE_DOMAIN_TTL_MS[parts.slice(i).join('.')];
+        if (ttl !== undefined) return ttl;
+    }
+    return config.CACHE_TTL_MS;
+}
+
+// === Lookup ===
+
+/**
+ * Cached scrape. Resolves with { result, cache } where cache is HIT | MISS | BYPASS | COALESCED
+ * (OFF when CACHE_MAX_ENTRIES is 0). Rejects like runner.scrape.
+ * options.bypass: skip the lookup (Cache-Control: no-cache). options.budgetMs / options.onEvent go to the runner
+ * (a request that joins a scrape already in flight gets its result, not its events).
+ */
+function scrape(url, options = {}) {
+    if (config.CACHE_MAX_ENTRIES <= 0) {
+        return runner.scrape(url, options).then(result => ({ result, cache: 'OFF' }));
+    }
+    load();
+
+    let key;
+    try {
+        key = canonicalUrl(url);
+    } catch (e) {
+        return runner.scrape(url, options).then(result => ({ result, cache: 'MISS' }));
+    }
+
+    if (!options.bypass) {
+        const cached = get(key);
+        if (cached) {
+            counters.hits++;
+            return Promise.resolve({ result: cached, cache: 'HIT' });
+        }
+    }
+
+    // Someone is already scraping this product: wait for their answer
+    if (inflight.has(key)) {
+        counters.coalesced++;
+        return inflight.get(key).then(result => ({ result, cache: 'COALESCED' }));
+    }
+
+    if (options.bypass) counters.bypassed++;
+    else counters.misses++;
+
+    const run = runner.scrape(url, options)
+        .then(result => {
+            if (result && !result.error_code && !result.partial && result.total_images > 0) set(key, result);
+            return result;
+        })
+        .finally(() => inflight.delete(key));
+    inflight.set(key, run);
+    return run.then(result => ({ result, cache: options.bypass ? 'BYPASS' : 'MISS' }));
+}
+
+function get(key) {
+    const entry = entries.get(key);
+    if (!entry) return null;
+    if (entry.expires_at <= Date.now()) {
+        entries.delete(key);
+        save();
+        return null;
+    }
+    // Most recently used goes to the back of the Map
+    entries.delete(key);
+    entries.set(key, entry);
+    return entry.result;
+}
+
+function set(key, result) {
+    const ttl = ttlFor(key);
+    if (ttl <= 0) return;
+    entries.delete(key);
+    entries.set(key, { result, expires_at: Date.now() + ttl });
+    while (entries.size > config.CACHE_MAX_ENTRIES) {
+        entries.delete(entries.keys().next().value);
+    }
+    save();
+}
+
+function stats() {
+    return {
+        entries: entries.size,
+        max_entries: config.CACHE_MAX_ENTRIES,
+        inflight: inflight.size,
+        persistent: !!config.CACHE_STORE_FILE,
+        ...counters
+    };
+}
+
+function shutdown() {
+    if (saveTimer) {
+        clearTimeout(saveTimer);
+        saveNow();
+    }
+}
+
+// === File Store ===
+
+function load() {
+    if (loaded) return;
+    loaded = true;
+    if (!config.CACHE_STORE_FILE) return;
+
+    let stored;
+    try {
+        stored = JSON.parse(fs.readFileSync(config.CACHE_STORE_FILE, 'utf8'));
+    } catch (e) {
+        if (e.code !== 'ENOENT') logger.error("Failed to load result cache, starting empty", e);
+        return;
+    }
+
+    const now = Date.now();
+    (stored.entries || []).forEach(([key, entry]) => {
+        if (entry.expires_at > now) entries.set(key, entry);
+    });
+    logger.info(`Result cache loaded`, { entries: entries.size });
+}
+
+/**
+ * Writes are batched like the job store: a burst of changes becomes one write.
+ */
+function save() {
+    if (!config.CACHE_STORE_FILE || saveTimer) return;
+    saveTimer = setTimeout(saveNow, 1000);
+}
+
+function saveNow() {
+    saveTimer = null;
+    const file = config.CACHE_STORE_FILE;
+    const tmp = `${file}.tmp`;
+    try {
+        fs.mkdirSync(path.dirname(file), { recursive: true });
+        fs.writeFileSync(tmp, JSON.stringify({ entries: [...entries.entries()] }));
+        fs.renameSync(tmp, file);
+    } catch (e) {
+        logger.error("Failed to save result cache", e);
+    }
+}
+
+module.exports = { scrape, canonicalUrl, stats, shutdown };
@@ -1,7 +1,10 @@
 // api/controller.js
-const { spawn } = require('child_process');
 const config = require('../shared/config');
 const logger = require('../shared/logger');
+const runner = require('./runner');
+const cache = require('./cache');
+const jobs = require('./jobs');
+const { errorBody } = require('./errors');
 
 /**
  * Validates if a string is a valid HTTP/HTTPS URL
@@ -15,12 +18,22 @@ function isValidUrl(string) {
     }
 }
 
+/**
+ * `Cache-Control: no-cache` (or no-store) from the client: skip the result cache lookup
+ */
+function wantsFresh(req) {
+    return /no-cache|no-store/i.test(req.get('Cache-Control') || '');
+}
+
 /**
  * Controller: Scrape URL
- * Handles the logic of calling the Python script.
+ * Validates the request and hands the URL to the scrape runner, through the result cache
+ * (the `X-Cache` response header says HIT, MISS, BYPASS or COALESCED).
+ * Optional `budget_ms`: time budget for the scrape (clamped, see runner.budget).
  */
-exports.scrapeUrl = (req, res) => {
+exports.scrapeUrl = async (req, res) => {
     const { url } = req.body;
+    const budgetMs = runner.budget(req.body.budget_ms);
 
     // 1. Validation
     if (!url || !isValidUrl(url)) {
@@ -30,85 +43,283 @@ exports.scrapeUrl = (req, res) => {
         });
     }
 
+    if (budgetMs === null) {
+        return res.status(400).json({
+            error_code: "INVALID_BUDGET",
+            message: "`budget_ms` must be a number of milliseconds."
+        });
+    }
+
     logger.info(`Received scrape request for: ${url}`);
 
-    // 2. Spawn Python Process
-    const pythonProcess = spawn(config.PYTHON_CMD, [config.SCRAPER_SCRIPT, url]);
-
-    let dataBuffer = '';
-    let errorBuffer = '';
-
-    // Set a timeout to kill the process if it hangs
-    const timeout = setTimeout(() => {
-        logger.error(`Timeout reached for ${url}`);
-        pythonProcess.kill();
-        // If we haven't responded yet, respond now
-        if (!res.headersSent) {
-            res.status(500).json({
-                error_code: "SCRAPER_TIMEOUT",
-                message: "The scraping process took too long and was terminated."
-            });
-        }
-    }, config.TIMEOUT_MS);
+    // 2. Run Scraper (cache, then worker pool or one-off process)
+    let result;
+    try {
+        const cached = await cache.scrape(url, { budgetMs, bypass: wantsFresh(req) });
+        result = cached.result;
+        if (!res.headersSent) res.set('X-Cache', cached.cache);
+    } catch (err) {
+        if (res.headersSent) return;
+        return res.status(500).json(errorBody(err));
+    }
 
-    // 3. Collect Output
-    pythonProcess.stdout.on('data', (data) => {
-        dataBuffer += data.toString();
-    });
+    if (res.headersSent) return;
 
-    pythonProcess.stderr.on('data', (data) => {
-        // We log stderr but don't fail immediately, as some warnings go to stderr
-        errorBuffer += data.toString();
-        // Optionally log every line from python stderr
-        // logger.debug(`[Python Stderr]: ${data}`);
-    });
+    // 3. Check if Python returned an error object itself (handled in python main)
+    if (result.error_code) {
+        return res.status(500).json(result);
+    }
 
-    // 4. Handle Process Exit
-    pythonProcess.on('close', (code) => {
-        clearTimeout(timeout);
+    logger.info(`Scraping successful`, { total: result.total_images });
+    return res.status(200).json(result);
+};
 
-        if (res.headersSent) return;
+/**
+ * Controller: Scrape Stream (opt-in, GET /api/scrape/stream?url=...&budget_ms=...)
+ * Same scrape as /api/scrape, answered as Server-Sent Events while it runs:
+ * `page_loaded`, `agent_started`, `agent_result` (images that passed the judges), then one
+ * `final` (the /api/scrape body plus `cache`) or one `error` (the error body). See progress.js.
+ * A cache hit (or a scrape already in flight for the same product) only sends `final`.
+ * The scrape is not stopped when the client disconnects: other requests may share it.
+ */
+exports.scrapeStream = (req, res) => {
+    const { url } = req.query;
+    const budgetMs = runner.budget(req.query.budget_ms);
 
-        if (code !== 0) {
-            logger.error(`Scraper failed with code ${code}`, { stderr: errorBuffer });
-            return res.status(500).json({
-                error_code: "SCRAPER_FAILED",
-                message: "The scraping process failed.",
-                details: errorBuffer.slice(0, 200) // Return first 200 chars of error for debugging
-            });
+    // 1. Validation (plain JSON errors: the stream has not started yet)
+    if (!url || !isValidUrl(url)) {
+        return res.status(400).json({
+            error_code: "INVALID_URL",
+            message: "The provided URL is not valid. Must start with http:// or https://"
+        });
+    }
+
+    if (budgetMs === null) {
+        return res.status(400).json({
+            error_code: "INVALID_BUDGET",
+            message: "`budget_ms` must be a number of milliseconds."
+        });
+    }
+
+    logger.info(`Received streaming scrape request for: ${url}`);
+
+    // 2. Start Streaming
+    res.status(200);
+    res.setHeader('Content-Type', 'text/event-stream');
+    res.setHeader('Cache-Control', 'no-cache');
+    res.setHeader('Connection', 'keep-alive');
+    res.setHeader('X-Accel-Buffering', 'no'); // nginx: do not buffer the stream
+    res.flushHeaders();
+
+    let closed = false;
+    const send = (event, data) => {
+        if (closed) return;
+        res.write(`event: ${event}\ndata: ${JSON.stringify(data)}\n\n`);
+    };
+
+    // Proxies drop connections that stay silent while a slow agent runs
+    const heartbeat = setInterval(() => {
+        if (!closed) res.write(': keep-alive\n\n');
+    }, config.SSE_HEARTBEAT_MS);
+
+    res.on('close', () => {
+        closed = true;
+        clearInterval(heartbeat);
+    });
+
+    const finish = () => {
+        clearInterval(heartbeat);
+        if (!closed) res.end();
+    };
+
+    // 3. Scrape, forwarding the scraper's events
+    const onEvent = ({ event, ...data }) => send(event, data);
+    cache.scrape(url, { budgetMs, bypass: wantsFresh(req), onEvent }).then(
+        ({ result, cache: status }) => {
+            if (result.error_code) send('error', result);
+            else send('final', { ...result, cache: status });
+            finish();
+        },
+        err => {
+            send('error', errorBody(err));
+            finish();
         }
+    );
+};
 
-        // 5. Parse JSON
-        try {
-            const result = JSON.parse(dataBuffer);
+/**
+ * Controller: Scrape Batch
+ * Fans a list of URLs out to the scraper (at most `concurrency` at a time) and streams
+ * one JSON line per URL (NDJSON) as each one finishes, in completion order.
+ * Every line has the same shape as a single /api/scrape result, plus `source_url`.
+ * `budget_ms` (optional) applies to each URL on its own. URLs go through the result cache too.
+ *
+ * Backpressure: if the client reads slower than we scrape, no new URL is started
+ * until the socket drains. If the client disconnects, the rest of the batch is dropped.
+ */
+exports.scrapeBatch = (req, res) => {
+    const { urls } = req.body;
 
-            // Check if Python returned an error object itself (handled in python main)
-            if (result.error_code) {
-                return res.status(500).json(result);
-            }
+    // 1. Validation
+    if (!Array.isArray(urls) || urls.length === 0) {
+        return res.status(400).json({
+            error_code: "INVALID_BATCH",
+            message: "Body must contain a non-empty `urls` array."
+        });
+    }
 
-            logger.info(`Scraping successful`, { total: result.total_images });
-            return res.status(200).json(result);
+    if (urls.length > config.BATCH_MAX_URLS) {
+        return res.status(400).json({
+            error_code: "BATCH_TOO_LARGE",
+            message: `A batch can contain at most ${config.BATCH_MAX_URLS} URLs.`
+        });
+    }
 
-        } catch (e) {
-            logger.error("Failed to parse Python Output", { data: dataBuffer });
-            return res.status(500).json({
-                error_code: "INVALID_OUTPUT",
-                message: "The scraper did not return valid JSON.",
-                raw_output: dataBuffer.slice(0, 100) // snippet
-            });
+    const budgetMs = runner.budget(req.body.budget_ms);
+    const bypass = wantsFresh(req);
+    if (budgetMs === null) {
+        return res.status(400).json({
+            error_code: "INVALID_BUDGET",
+            message: "`budget_ms` must be a number of milliseconds."
+        });
+    }
+
+    const requested = parseInt(req.body.concurrency, 10) || config.BATCH_CONCURRENCY;
+    const concurrency = Math.max(1, Math.min(requested, config.BATCH_MAX_CONCURRENCY));
+
+    logger.info(`Received batch scrape request`, { total: urls.length, concurrency });
+
+    // 2. Start Streaming
+    res.status(200);
+    res.setHeader('Content-Type', 'application/x-ndjson');
+    res.setHeader('Cache-Control', 'no-cache');
+    res.flushHeaders();
+
+    let next = 0;
+    let running = 0;
+    let done = 0;
+    let aborted = false;
+    let waitingForDrain = false;
+
+    res.on('close', () => {
+        if (done < urls.length) {
+            aborted = true;
+            logger.info(`Batch client disconnected`, { done, total: urls.length });
         }
     });
 
-    // Handle spawn errors (e.g., python not found)
-    pythonProcess.on('error', (err) => {
-        clearTimeout(timeout);
-        if (!res.headersSent) {
-            logger.error("Failed to spawn Python process", err);
-            res.status(500).json({
-                error_code: "INTERNAL_ERROR",
-                message: "Failed to start scraping engine."
+    res.on('drain', () => {
+        waitingForDrain = false;
+        pump();
+    });
+
+    const scrapeOne = (url) => {
+        if (typeof url !== 'string' || !isValidUrl(url)) {
+            return Promise.resolve({
+                source_url: url,
+                error_code: "INVALID_URL",
+                message: "The provided URL is not valid. Must start with http:// or https://"
+            });
+        }
+        return cache.scrape(url, { budgetMs, bypass }).then(
+            ({ result }) => ({ source_url: url, ...result }),
+            err => ({ source_url: url, ...errorBody(err) })
+        );
+    };
+
+    // 3. Keep `concurrency` scrapes in flight while the client keeps up
+    const pump = () => {
+        while (!aborted && !waitingForDrain && running < concurrency && next < urls.length) {
+            const url = urls[next++];
+            running++;
+
+            scrapeOne(url).then(line => {
+                running--;
+                done++;
+                if (aborted) return;
+
+                if (!res.write(JSON.stringify(line) + '\n')) {
+                    waitingForDrain = true;
+                }
+
+                if (done === urls.length) {
+                    logger.info(`Batch complete`, { total: urls.length });
+                    return res.end();
+                }
+                pump();
             });
         }
+    };
+
+    pump();
+};
+
+/**
+ * Public view of a job record
+ */
+function jobView(job) {
+    return {
+        job_id: job.id,
+        status: job.status,
+        url: job.url,
+        budget_ms: job.budget_ms,
+        created_at: job.created_at,
+        started_at: job.started_at,
+        finished_at: job.finished_at,
+        result: job.result,
+        error: job.error
+    };
+}
+
+/**
+ * Controller: Create Job
+ * Queues the URL and answers immediately with a job ID (202). Poll GET /api/jobs/:id for the result.
+ * `budget_ms` (optional) starts counting when the job starts running, not while it waits.
+ */
+exports.createJob = (req, res) => {
+    const { url } = req.body;
+    const budgetMs = runner.budget(req.body.budget_ms);
+
+    if (!url || !isValidUrl(url)) {
+        return res.status(400).json({
+            error_code: "INVALID_URL",
+            message: "The provided URL is not valid. Must start with http:// or https://"
+        });
+    }
+
+    if (budgetMs === null) {
+        return res.status(400).json({
+            error_code: "INVALID_BUDGET",
+            message: "`budget_ms` must be a number of milliseconds."
+        });
+    }
+
+    const job = jobs.submit(url, budgetMs);
+    if (!job) {
+        return res.status(503).json({
+            error_code: "QUEUE_FULL",
+            message: "Too many jobs are waiting. Try again later."
+        });
+    }
+
+    logger.info(`Job queued`, { job_id: job.id, url });
+    return res.status(202).json({
+        job_id: job.id,
+        status: job.status,
+        status_url: `/api/jobs/${job.id}`
     });
 };
+
+/**
+ * Controller: Get Job
+ */
+exports.getJob = (req, res) => {
+    const job = jobs.get(req.params.id);
+    if (!job) {
+        return res.status(404).json({
+            error_code: "JOB_NOT_FOUND",
+            message: "No job with this ID (it may have expired)."
+        });
+    }
+    return res.status(200).json(jobView(job));
+};
@@ -0,0 +1,38 @@
+// api/errors.js
+const logger = require('../shared/logger');
+
+/**
+ * ScrapeError
+ * A failure of the scraping engine itself (timeout, crash, bad output).
+ * `toJSON()` gives the exact body we send back to the client.
+ */
+class ScrapeError extends Error {
+    constructor(code, message, extra = {}) {
+        super(message);
+        this.name = 'ScrapeError';
+        this.code = code;
+        this.extra = extra;
+    }
+
+    toJSON() {
+        return {
+            error_code: this.code,
+            message: this.message,
+            ...this.extra
+        };
+    }
+}
+
+/**
+ * Maps a runner failure to the error body we send back
+ */
+function errorBody(err) {
+    if (err instanceof ScrapeError) return err.toJSON();
+    logger.error("Scraper runner failed", err);
+    return {
+        error_code: "INTERNAL_ERROR",
+        message: "Failed to start scraping engine."
+    };
+}
+
+module.exports = { ScrapeError, errorBody };
@@ -0,0 +1,186 @@
+// api/jobs.js
+const crypto = require('crypto');
+const fs = require('fs');
+const path = require('path');
+const config = require('../shared/config');
+const logger = require('../shared/logger');
+const cache = require('./cache');
+const { errorBody } = require('./errors');
+
+/**
+ * Job Queue
+ * POST /api/jobs answers right away with a job ID; the scrape runs in the background.
+ * - Bounded: at most JOBS_MAX_QUEUED jobs may wait. Beyond that, submit() returns null (caller sends 503).
+ * - Fixed concurrency: JOBS_CONCURRENCY jobs run at a time, so throughput = worker count, not open sockets.
+ * - Optional file store (JOBS_STORE_FILE): queued work survives a restart. Jobs that were running
+ *   when the process died are queued again.
+ * - Finished jobs are kept for JOBS_RESULT_TTL_MS, then forgotten.
+ * - Scrapes go through the result cache (api/cache.js), so a recently scraped product finishes at once.
+ *
+ * Job statuses: queued -> running -> done | failed
+ */
+
+const jobs = new Map();   // id -> job (insertion order = submit order)
+const pending = [];       // ids waiting to run
+let running = 0;
+let started = false;
+let saveTimer = null;
+let pruneTimer = null;
+
+function start() {
+    if (started) return;
+    started = true;
+    load();
+    pruneTimer = setInterval(prune, 60000);
+    pruneTimer.unref();
+    drain();
+}
+
+function shutdown() {
+    clearInterval(pruneTimer);
+    if (saveTimer) {
+        clearTimeout(saveTimer);
+        saveNow();
+    }
+}
+
+/**
+ * Queues a URL. Returns the job, or null when the queue is full.
+ */
+function submit(url, budgetMs = config.SCRAPE_BUDGET_MS) {
+    start();
+    if (pending.length >= config.JOBS_MAX_QUEUED) return null;
+
+    const job = {
+        id: crypto.randomUUID(),
+        url,
+        budget_ms: budgetMs,
+        status: 'queued',
+        created_at: new Date().toISOString(),
+        started_at: null,
+        finished_at: null,
+        result: null,
+        error: null
+    };
+    jobs.set(job.id, job);
+    pending.push(job.id);
+    save();
+    drain();
+    return job;
+}
+
+function get(id) {
+    return jobs.get(id) || null;
+}
+
+function stats() {
+    return {
+        queued: pending.length,
+        running,
+        stored: jobs.size,
+        max_queued: config.JOBS_MAX_QUEUED,
+        concurrency: config.JOBS_CONCURRENCY,
+        persistent: !!config.JOBS_STORE_FILE
+    };
+}
+
+function drain() {
+    while (running < config.JOBS_CONCURRENCY && pending.length > 0) {
+        const job = jobs.get(pending.shift());
+        if (!job) continue;
+        run(job);
+    }
+}
+
+async function run(job) {
+    running++;
+    job.status = 'running';
+    job.started_at = new Date().toISOString();
+    save();
+
+    try {
+        const { result } = await cache.scrape(job.url, { budgetMs: job.budget_ms });
+        if (result.error_code) {
+            job.status = 'failed';
+            job.error = result;
+        } else {
+            job.status = 'done';
+            job.result = result;
+        }
+    } catch (err) {
+        job.status = 'failed';
+        job.error = errorBody(err);
+    }
+
+    job.finished_at = new Date().toISOString();
+    logger.info(`Job ${job.status}`, { job_id: job.id, url: job.url });
+
+    running--;
+    save();
+    drain();
+}
+
+function prune() {
+    const cutoff = Date.now() - config.JOBS_RESULT_TTL_MS;
+    let removed = 0;
+    jobs.forEach((job, id) => {
+        if (job.finished_at && Date.parse(job.finished_at) < cutoff) {
+            jobs.delete(id);
+            removed++;
+        }
+    });
+    if (removed > 0) save();
+}
+
+// === File Store ===
+
+function load() {
+    if (!config.JOBS_STORE_FILE) return;
+
+    let stored;
+    try {
+        stored = JSON.parse(fs.readFileSync(config.JOBS_STORE_FILE, 'utf8'));
+    } catch (e) {
+        if (e.code !== 'ENOENT') logger.error("Failed to load job store, starting empty", e);
+        return;
+    }
+
+    let requeued = 0;
+    (stored.jobs || []).forEach(job => {
+        // Interrupted by the restart: run it again
+        if (job.status === 'running') {
+            job.status = 'queued';
+            job.started_at = null;
+        }
+        jobs.set(job.id, job);
+        if (job.status === 'queued') {
+            pending.push(job.id);
+            requeued++;
+        }
+    });
+    logger.info(`Job store loaded`, { jobs: jobs.size, queued: requeued });
+}
+
+/**
+ * Writes are batched: many state changes in a burst become one write.
+ */
+function save() {
+    if (!config.JOBS_STORE_FILE || saveTimer) return;
+    saveTimer = setTimeout(saveNow, 500);
+}
+
+function saveNow() {
+    saveTimer = null;
+    const file = config.JOBS_STORE_FILE;
+    const tmp = `${file}.tmp`;
+    try {
+        fs.mkdirSync(path.dirname(file), { recursive: true });
+        // Write + rename so a crash mid-write never leaves a half-written store
+        fs.writeFileSync(tmp, JSON.stringify({ jobs: [...jobs.values()] }));
+        fs.renameSync(tmp, file);
+    } catch (e) {
+        logger.error("Failed to save job store", e);
+    }
+}
+
+module.exports = { start, shutdown, submit, get, stats };
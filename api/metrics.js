@@ -0,0 +1,210 @@
+// api/metrics.js
+const config = require('../shared/config');
+
+/**
+ * Metrics (Prometheus text format, served at GET /api/metrics)
+ * No client library: counters and histograms live in memory, gauges are read from the
+ * pool / cache / job stats when Prometheus scrapes.
+ *
+ * - scraper_api_requests_total{method,route,status}: every API request.
+ * - scraper_scrapes_total{domain,outcome}: every scrape that reached the Python engine
+ *   (cache hits are in scraper_cache_*). outcome = success | empty | partial | error.
+ * - scraper_errors_total{code}: SCRAPER_TIMEOUT, SCRAPER_CRASH, BLOCKED_BY_AMAZON_CAPTCHA, ...
+ * - scraper_scrape_duration_seconds{domain} and scraper_strategy_duration_seconds{strategy}:
+ *   latency histograms (queue wait included) per domain and per winning agent (strategy_used).
+ * - `domain` labels are bounded: a configured domain (SCHED_DOMAIN_LIMITS / CACHE_DOMAIN_TTL_MS keys,
+ *   subdomains grouped under it) or `other`. Client URLs never create series of their own.
+ * - scraper_workers / scraper_queue_depth / scraper_domain_* / scraper_worker_rss_bytes: pool sizing.
+ */
+
+const DURATION_BUCKETS = [0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600];
+
+class Counter {
+    constructor(name, help) {
+        this.name = name;
+        this.help = help;
+        this.values = new Map(); // label string -> value
+    }
+
+    inc(labels = {}, value = 1) {
+        const key = labelString(labels);
+        this.values.set(key, (this.values.get(key) || 0) + value);
+    }
+
+    render() {
+        const lines = [`# HELP ${this.name} ${this.help}`, `# TYPE ${this.name} counter`];
+        this.values.forEach((value, key) => lines.push(`${this.name}${key} ${value}`));
+        return lines;
+    }
+}
+
+class Histogram {
+    constructor(name, help, buckets = DURATION_BUCKETS) {
+        this.name = name;
+        this.help = help;
+        this.buckets = buckets;
+        this.series = new Map(); // label string -> { labels, counts, sum, count }
+    }
+
+    observe(labels, value) {
+        const key = labelString(labels);
+        let series = this.series.get(key);
+        if (!series) {
+            series = { labels, counts: this.buckets.map(() => 0), sum: 0, count: 0 };
+            this.series.set(key, series);
+        }
+        this.buckets.forEach((le, i) => {
+            if (value <= le) series.counts[i]++;
+        });
+        series.sum += value;
+        series.count++;
+    }
+
+    render() {
+        const lines = [`# HELP ${this.name} ${this.help}`, `# TYPE ${this.name} histogram`];
+        this.series.forEach((series, key) => {
+            this.buckets.forEach((le, i) => {
+                lines.push(`${this.name}_bucket${labelString({ ...series.labels, le })} ${series.counts[i]}`);
+            });
+            lines.push(`${this.name}_bucket${labelString({ ...series.labels, le: '+Inf' })} ${series.count}`);
+            lines.push(`${this.name}_sum${key} ${round(series.sum)}`);
+            lines.push(`${this.name}_count${key} ${series.count}`);
+        });
+        return lines;
+    }
+}
+
+/**
+ * Values read at render time. Counters kept elsewhere (the cache's) use type 'counter'.
+ */
+function gauge(name, help, samples, type = 'gauge') {
+    const lines = [`# HELP ${name} ${help}`, `# TYPE ${name} ${type}`];
+    samples.forEach(([labels, value]) => lines.push(`${name}${labelString(labels)} ${value}`));
+    return lines;
+}
+
+function labelString(labels) {
+    const entries = Object.entries(labels);
+    if (entries.length === 0) return '';
+    const escape = v => String(v).replace(/\\/g, '\\\\').replace(/"/g, '\\"').replace(/\n/g, '\\n');
+    return `{${entries.map(([k, v]) => `${k}="${escape(v)}"`).join(',')}}`;
+}
+
+function round(n) {
+    return Math.round(n * 1000) / 1000;
+}
+
+// === Registry ===
+
+const apiRequests = new Counter('scraper_api_requests_total', 'API requests by method, route and status code.');
+const scrapes = new Counter('scraper_scrapes_total', 'Scrapes run by the engine, by domain and outcome (success, empty, partial, error).');
+const errors = new Counter('scraper_errors_total', 'Failed or blocked scrapes by error code.');
+const domainDuration = new Histogram('scraper_scrape_duration_seconds', 'Scrape latency (queue wait included) by domain.');
+const strategyDuration = new Histogram('scraper_strategy_duration_seconds', 'Scrape latency by winning agent (strategy_used).');
+
+const LABELED_DOMAINS = new Set([
+    ...Object.keys(config.SCHED_DOMAIN_LIMITS),
+    ...Object.keys(config.CACHE_DOMAIN_TTL_MS)
+]);
+
+function domainLabel(url) {
+    let host;
+    try {
+        host = new URL(url).hostname.toLowerCase();
+    } catch (e) {
+        return 'other';
+    }
+    const parts = host.split('.');
+    for (let i = 0; i < parts.length - 1; i++) {
+        const candidate = parts.slice(i).join('.');
+        if (LABELED_DOMAINS.has(candidate)) return candidate;
+    }
+    return 'other';
+}
+
+/**
+ * One finished engine scrape: the result JSON, or the ScrapeError it failed with.
+ */
+function recordScrape(url, startedAt, result, error) {
+    const domain = domainLabel(url);
+    const seconds = (Date.now() - startedAt) / 1000;
+    domainDuration.observe({ domain }, seconds);
+
+    if (error || !result || result.error_code) {
+        const code = (error && error.code) || (result && result.error_code) || 'INTERNAL_ERROR';
+        scrapes.inc({ domain, outcome: 'error' });
+        errors.inc({ code });
+        return;
+    }
+
+    // Killed scrapes that answered with the images found so far (see progress.js)
+    if (result.partial) {
+        scrapes.inc({ domain, outcome: 'partial' });
+        errors.inc({ code: result.partial_reason });
+        return;
+    }
+
+    strategyDuration.observe({ strategy: result.strategy_used || 'None' }, seconds);
+    scrapes.inc({ domain, outcome: result.total_images > 0 ? 'success' : 'empty' });
+    // Block pages are answered normally, with a note instead of images
+    if (result.note === 'BLOCKED_BY_AMAZON_CAPTCHA') errors.inc({ code: result.note });
+}
+
+/**
+ * Express middleware: counts every request once its response is finished.
+ */
+function middleware(req, res, next) {
+    res.on('finish', () => {
+        const route = req.route ? `${req.baseUrl}${req.route.path}` : 'unmatched';
+        apiRequests.inc({ method: req.method, route, status: res.statusCode });
+    });
+    next();
+}
+
+/**
+ * The /api/metrics body. `stats` = { scraper, cache, jobs } (same objects /api/health shows).
+ */
+function render({ scraper, cache, jobs }) {
+    const workers = scraper.workers || [];
+    const scheduler = scraper.scheduler || {};
+    const lines = [
+        ...apiRequests.render(),
+        ...scrapes.render(),
+        ...errors.render(),
+        ...domainDuration.render(),
+        ...strategyDuration.render(),
+        ...gauge('scraper_workers', 'Scraper worker processes by state.', [
+            [{ state: 'configured' }, scraper.size || 0],
+            [{ state: 'ready' }, scraper.ready || 0],
+            [{ state: 'busy' }, scraper.busy || 0]
+        ]),
+        ...gauge('scraper_slots', 'Scrape slots (workers x pages per worker) and how many are in use.', [
+            [{ state: 'total' }, (scraper.size || 0) * (scraper.capacity || 0)],
+            [{ state: 'running' }, scraper.running || 0]
+        ]),
+        ...gauge('scraper_queue_depth', 'Requests waiting for a scrape slot, by queue.', [
+            [{ queue: 'scheduler' }, scheduler.queued || 0],
+            [{ queue: 'pool' }, scraper.queued || 0],
+            [{ queue: 'jobs' }, jobs.queued]
+        ]),
+        ...gauge('scraper_domain_running', 'Scrapes running per domain (domains with work only).',
+            Object.entries(scheduler.domains || {}).map(([domain, d]) => [{ domain }, d.running])),
+        ...gauge('scraper_domain_queued', 'Scrapes waiting per domain (domains with work only).',
+            Object.entries(scheduler.domains || {}).map(([domain, d]) => [{ domain }, d.queued])),
+        ...gauge('scraper_worker_rss_bytes', 'Browser + worker memory from the last health probe.',
+            workers.filter(w => w.health && w.health.rss_mb !== undefined)
+                .map(w => [{ worker: w.index }, Math.round(w.health.rss_mb * 1024 * 1024)])),
+        ...gauge('scraper_cache_entries', 'Results in the result cache.', [[{}, cache.entries]]),
+        ...gauge('scraper_cache_lookups_total', 'Result cache lookups by result.', [
+            [{ result: 'hit' }, cache.hits],
+            [{ result: 'miss' }, cache.misses],
+            [{ result: 'coalesced' }, cache.coalesced],
+            [{ result: 'bypass' }, cache.bypassed]
+        ], 'counter'),
+        ...gauge('process_resident_memory_bytes', 'Gateway (Node) memory.', [[{}, process.memoryUsage().rss]]),
+        ...gauge('process_uptime_seconds', 'Gateway uptime.', [[{}, Math.round(process.uptime())]])
+    ];
+    return lines.join('\n') + '\n';
+}
+
+module.exports = { recordScrape, middleware, render };
@@ -0,0 +1,50 @@
+// api/progress.js
+
+/**
+ * Scrape Progress
+ * Follows the scraper's progress events for one scrape (see scraper/events.py):
+ * page_loaded, agent_started, agent_result (images that passed the judges) and final.
+ *
+ * - Forwarding: every event goes to `onEvent` (the SSE endpoint) as it arrives.
+ * - Partial Result: the last agent_result with images is kept. When the scraper is killed
+ *   (timeout, crash) `salvage()` turns it into a normal result marked `partial: true`,
+ *   so the client gets what was found instead of an error.
+ */
+class Progress {
+    constructor(url, onEvent = null) {
+        this.url = url;
+        this.onEvent = onEvent;
+        this.partial = null;
+    }
+
+    push(event) {
+        if (event.event === 'agent_result' && Array.isArray(event.images) && event.images.length > 0) {
+            this.partial = event;
+        }
+        if (this.onEvent) {
+            try {
+                this.onEvent(event);
+            } catch (e) {
+                // A listener that broke (client gone) must not break the scrape
+            }
+        }
+    }
+
+    /**
+     * The partial result to answer with instead of `error`, or null when nothing was found yet.
+     */
+    salvage(error) {
+        if (!this.partial) return null;
+        return {
+            source_url: this.url,
+            strategy_used: `${this.partial.agent} (partial)`,
+            total_images: this.partial.images.length,
+            product_images: this.partial.images,
+            note: `PARTIAL_RESULT: ${error.message}`,
+            partial: true,
+            partial_reason: error.code
+        };
+    }
+}
+
+module.exports = Progress;
@@ -2,6 +2,10 @@
 const express = require('express');
 const router = express.Router();
 const controller = require('./controller');
+const runner = require('./runner');
+const cache = require('./cache');
+const jobs = require('./jobs');
+const metrics = require('./metrics');
 
 // GET /api/health
 // Simple check to see if API is alive
@@ -9,12 +13,35 @@ router.get('/health', (req, res) => {
     res.json({
         status: "ok",
         uptime: process.uptime(),
-        timestamp: new Date().toISOString()
+        timestamp: new Date().toISOString(),
+        scraper: runner.stats(),
+        cache: cache.stats(),
+        jobs: jobs.stats()
     });
 });
 
+// GET /api/metrics
+// Prometheus text format: request counts, latency per domain / agent, errors, pool + queue depth, memory
+router.get('/metrics', (req, res) => {
+    res.set('Content-Type', 'text/plain; version=0.0.4; charset=utf-8');
+    res.send(metrics.render({ scraper: runner.stats(), cache: cache.stats(), jobs: jobs.stats() }));
+});
+
 // POST /api/scrape
 // The main worker route
 router.post('/scrape', controller.scrapeUrl);
 
+// GET /api/scrape/stream?url=...
+// Same scrape, streamed as Server-Sent Events (page_loaded, agent_started, agent_result, final)
+router.get('/scrape/stream', controller.scrapeStream);
+
+// POST /api/scrape/batch
+// Many URLs, streamed back as NDJSON (one line per URL)
+router.post('/scrape/batch', controller.scrapeBatch);
+
+// POST /api/jobs        -> { job_id } right away
+// GET  /api/jobs/:id    -> status + result when done
+router.post('/jobs', controller.createJob);
+router.get('/jobs/:id', controller.getJob);
+
 module.exports = router;
@@ -0,0 +1,186 @@
+// api/runner.js
+const { spawn } = require('child_process');
+const readline = require('readline');
+const config = require('../shared/config');
+const logger = require('../shared/logger');
+const WorkerPool = require('./worker_pool');
+const Scheduler = require('./scheduler');
+const metrics = require('./metrics');
+const Progress = require('./progress');
+const { ScrapeError } = require('./errors');
+
+/**
+ * Scrape Runner
+ * The one door to the Python engine. Uses the warm worker pool when it is enabled
+ * (WORKER_POOL_SIZE > 0), otherwise spawns one `scraper.py <url>` process per call.
+ *
+ * Every scrape has a time budget (options.budgetMs, default SCRAPE_BUDGET_MS). The scraper
+ * answers inside it with the best result so far; the process is only killed when it is
+ * still silent SCRAPE_BUDGET_GRACE_MS later (never later than TIMEOUT_MS).
+ *
+ * Every scrape goes through the scheduler first (global + per-domain caps, token buckets,
+ * see scheduler.js); time spent waiting there comes off the budget.
+ *
+ * The scraper streams progress events (see progress.js): `options.onEvent` gets them as they
+ * arrive, and a scrape killed on timeout or crash answers with the last images found, if any.
+ *
+ * Resolves with the scraper's JSON (which may itself carry an `error_code`),
+ * rejects with a ScrapeError when the engine failed.
+ */
+
+let pool = null;
+let scheduler = null;
+
+function start() {
+    if (!scheduler) {
+        const slots = config.WORKER_POOL_SIZE > 0 ? config.WORKER_POOL_SIZE * config.BROWSER_MAX_CONTEXTS : 4;
+        scheduler = new Scheduler(config.SCHED_MAX_CONCURRENCY || slots);
+    }
+    if (pool || config.WORKER_POOL_SIZE <= 0) return;
+    pool = new WorkerPool(config.WORKER_POOL_SIZE);
+    pool.start();
+    logger.info(`Scraper worker pool started`, { size: config.WORKER_POOL_SIZE });
+}
+
+function shutdown() {
+    if (scheduler) scheduler.shutdown();
+    if (pool) pool.shutdown();
+    pool = null;
+    scheduler = null;
+}
+
+function stats() {
+    const scheduling = scheduler ? { scheduler: scheduler.stats() } : {};
+    if (!pool) return { mode: config.WORKER_POOL_SIZE > 0 ? 'pool' : 'process', started: false, ...scheduling };
+    return { mode: 'pool', started: true, ...pool.stats(), ...scheduling };
+}
+
+/**
+ * Clamps a requested budget to what the gateway allows. Returns null when it is not a number.
+ */
+function budget(requested) {
+    if (requested === undefined || requested === null) return config.SCRAPE_BUDGET_MS;
+    const ms = Number(requested);
+    if (!Number.isFinite(ms)) return null;
+    const max = config.TIMEOUT_MS - config.SCRAPE_BUDGET_GRACE_MS;
+    return Math.round(Math.max(config.SCRAPE_MIN_BUDGET_MS, Math.min(ms, max)));
+}
+
+/**
+ * How long we wait for an answer before giving up on the scraper.
+ */
+function killAfter(budgetMs) {
+    return Math.min(config.TIMEOUT_MS, budgetMs + config.SCRAPE_BUDGET_GRACE_MS);
+}
+
+function scrape(url, options = {}) {
+    const budgetMs = options.budgetMs || config.SCRAPE_BUDGET_MS;
+    const startedAt = Date.now();
+    const progress = new Progress(url, options.onEvent);
+    start();
+    const run = scheduler.schedule(url, startedAt + budgetMs, deadline => {
+        const remainingMs = deadline - Date.now();
+        if (config.WORKER_POOL_SIZE > 0) {
+            return pool.run(url, remainingMs, killAfter(remainingMs), progress);
+        }
+        return runProcess(url, remainingMs, progress);
+    });
+    return run.then(result => {
+        logTimings(url, result);
+        metrics.recordScrape(url, startedAt, result);
+        return result;
+    }, err => {
+        metrics.recordScrape(url, startedAt, null, err);
+        throw err;
+    });
+}
+
+/**
+ * One structured record per scrape: where the time went, stage by stage (see scraper/timings.py)
+ */
+function logTimings(url, result) {
+    if (!result || !result.timings) return;
+    logger.info(`Scrape timings`, {
+        url,
+        strategy: result.strategy_used,
+        total_ms: result.timings.total_ms,
+        stages: result.timings.stages
+    });
+}
+
+/**
+ * Legacy mode: one Python process (and one Firefox) per request.
+ * stdout carries one JSON event per line (`scraper.py --events`), the result comes last as `final`.
+ */
+function runProcess(url, budgetMs, progress = new Progress(url)) {
+    return new Promise((resolve, reject) => {
+        const pythonProcess = spawn(config.PYTHON_CMD, [config.SCRAPER_SCRIPT, '--budget-ms', String(budgetMs), '--events', url]);
+
+        let final = null;
+        let rawOutput = '';
+        let errorBuffer = '';
+
+        // Killed or failed: the last images an agent found beat an error
+        let failed = false;
+        const fail = (err) => {
+            if (failed) return;
+            failed = true;
+            const partial = progress.salvage(err);
+            if (partial) {
+                logger.info(`Answering ${url} with a partial result`, { reason: err.code, images: partial.total_images });
+                return resolve(partial);
+            }
+            reject(err);
+        };
+
+        // Set a timeout to kill the process if it hangs
+        const timeout = setTimeout(() => {
+            logger.error(`Timeout reached for ${url}`);
+            pythonProcess.kill();
+            fail(new ScrapeError("SCRAPER_TIMEOUT", "The scraping process took too long and was terminated."));
+        }, killAfter(budgetMs));
+
+        readline.createInterface({ input: pythonProcess.stdout }).on('line', (line) => {
+            let event;
+            try {
+                event = JSON.parse(line);
+            } catch (e) {
+                rawOutput += line;
+                return;
+            }
+            if (event.event === 'final') final = event.result;
+            else progress.push(event);
+        });
+
+        pythonProcess.stderr.on('data', (data) => {
+            // We log stderr but don't fail immediately, as some warnings go to stderr
+            errorBuffer += data.toString();
+        });
+
+        pythonProcess.on('close', (code) => {
+            clearTimeout(timeout);
+
+            if (code !== 0) {
+                logger.error(`Scraper failed with code ${code}`, { stderr: errorBuffer });
+                return fail(new ScrapeError("SCRAPER_FAILED", "The scraping process failed.", {
+                    details: errorBuffer.slice(0, 200) // Return first 200 chars of error for debugging
+                }));
+            }
+
+            if (final) return resolve(final);
+            logger.error("Failed to parse Python Output", { data: rawOutput });
+            fail(new ScrapeError("INVALID_OUTPUT", "The scraper did not return valid JSON.", {
+                raw_output: rawOutput.slice(0, 100) // snippet
+            }));
+        });
+
+        // Handle spawn errors (e.g., python not found)
+        pythonProcess.on('error', (err) => {
+            clearTimeout(timeout);
+            logger.error("Failed to spawn Python process", err);
+            reject(new ScrapeError("INTERNAL_ERROR", "Failed to start scraping engine."));
+        });
+    });
+}
+
+module.exports = { start, shutdown, stats, scrape, budget };
@@ -0,0 +1,203 @@
+// api/scheduler.js
+const config = require('../shared/config');
+const logger = require('../shared/logger');
+const { ScrapeError } = require('./errors');
+
+/**
+ * Scrape Scheduler
+ * Admission control in front of the scraper (runner.scrape), so a burst on one shop neither
+ * launches a browser per request nor gets us served captchas.
+ * - Global Cap: at most `maxConcurrency` scrapes run at once.
+ * - Domain Cap: at most SCHED_DOMAIN_CONCURRENCY per domain (SCHED_DOMAIN_LIMITS overrides).
+ * - Token Bucket: each start on a domain takes a token; tokens refill at `rate` per second up to `burst`.
+ * - Fair Queue: one FIFO per domain, served round-robin, so a burst on one domain only delays that domain.
+ * - Idle domains (nothing running or queued, bucket full again) are dropped: a fresh entry is identical,
+ *   so the table only holds domains with recent traffic.
+ *
+ * A scrape still waiting when its deadline is close (less than SCRAPE_MIN_BUDGET_MS left) fails with
+ * SCRAPER_TIMEOUT; the task gets the deadline so it can hand what is left of the budget to the scraper.
+ */
+class Scheduler {
+    constructor(maxConcurrency) {
+        this.maxConcurrency = Math.max(1, maxConcurrency);
+        this.running = 0;
+        this.domains = new Map(); // key -> { limits, running, tokens, refilledAt, queue }
+        this.ring = [];           // Domain keys with waiting scrapes, in round-robin order
+        this.cursor = 0;
+        this.wakeTimer = null;
+        this.closed = false;
+    }
+
+    /**
+     * Runs `task(deadline)` when the URL's domain and the global cap allow it.
+     * Resolves / rejects with the task's outcome.
+     */
+    schedule(url, deadline, task) {
+        return new Promise((resolve, reject) => {
+            if (this.closed) {
+                return reject(new ScrapeError("INTERNAL_ERROR", "Scraper pool is shutting down."));
+            }
+            const domain = this._domain(url);
+            const entry = { task, deadline, resolve, reject, timer: null };
+
+            entry.timer = setTimeout(() => {
+                const waiting = domain.queue.indexOf(entry);
+                if (waiting === -1) return;
+                domain.queue.splice(waiting, 1);
+                if (domain.queue.length === 0) {
+                    this._leaveRing(domain.key);
+                    this._prune();
+                }
+                logger.error(`Scrape waited too long for a slot: ${url}`);
+                reject(new ScrapeError("SCRAPER_TIMEOUT", "The scrape waited too long for a free slot and was dropped."));
+            }, Math.max(0, deadline - Date.now() - config.SCRAPE_MIN_BUDGET_MS));
+
+            domain.queue.push(entry);
+            if (!this.ring.includes(domain.key)) this.ring.push(domain.key);
+            this._pump();
+        });
+    }
+
+    stats() {
+        const domains = {};
+        this.domains.forEach((d, key) => {
+            if (d.running || d.queue.length) {
+                domains[key] = { running: d.running, queued: d.queue.length, tokens: Math.floor(this._refill(d)) };
+            }
+        });
+        return {
+            max_concurrency: this.maxConcurrency,
+            running: this.running,
+            queued: this.ring.reduce((n, key) => n + this.domains.get(key).queue.length, 0),
+            domains
+        };
+    }
+
+    shutdown() {
+        this.closed = true;
+        clearTimeout(this.wakeTimer);
+        this.domains.forEach(d => {
+            d.queue.splice(0).forEach(entry => {
+                clearTimeout(entry.timer);
+                entry.reject(new ScrapeError("INTERNAL_ERROR", "Scraper pool is shutting down."));
+            });
+        });
+        this.ring = [];
+    }
+
+    _domain(url) {
+        let host = 'invalid';
+        try {
+            host = new URL(url).hostname.toLowerCase().replace(/^www\./, '');
+        } catch (e) {}
+
+        // Configured domains group their subdomains (m.amazon.in -> amazon.in)
+        const parts = host.split('.');
+        let key = host;
+        let limits = {};
+        for (let i = 0; i < parts.length - 1; i++) {
+            const candidate = parts.slice(i).join('.');
+            if (config.SCHED_DOMAIN_LIMITS[candidate]) {
+                key = candidate;
+                limits = config.SCHED_DOMAIN_LIMITS[candidate];
+                break;
+            }
+        }
+
+        if (!this.domains.has(key)) {
+            const resolved = {
+                concurrency: limits.concurrency || config.SCHED_DOMAIN_CONCURRENCY,
+                rate: limits.rate || config.SCHED_DOMAIN_RATE,
+                burst: limits.burst || config.SCHED_DOMAIN_BURST
+            };
+            this.domains.set(key, { key, limits: resolved, running: 0, tokens: resolved.burst, refilledAt: Date.now(), queue: [] });
+        }
+        return this.domains.get(key);
+    }
+
+    _refill(domain) {
+        const now = Date.now();
+        domain.tokens = Math.min(domain.limits.burst, domain.tokens + (now - domain.refilledAt) / 1000 * domain.limits.rate);
+        domain.refilledAt = now;
+        return domain.tokens;
+    }
+
+    /**
+     * Starts waiting scrapes, one per domain per turn of the ring, until nothing more may start.
+     * When only the token buckets hold things back, wakes up when the next token is due.
+     */
+    _pump() {
+        let nextTokenMs = Infinity;
+        let started = true;
+        while (started && this.running < this.maxConcurrency && this.ring.length > 0) {
+            started = false;
+            nextTokenMs = Infinity;
+            for (let turn = 0; turn < this.ring.length && this.running < this.maxConcurrency; turn++) {
+                const index = (this.cursor + turn) % this.ring.length;
+                const domain = this.domains.get(this.ring[index]);
+                if (domain.running >= domain.limits.concurrency) continue;
+                if (this._refill(domain) < 1) {
+                    nextTokenMs = Math.min(nextTokenMs, (1 - domain.tokens) / domain.limits.rate * 1000);
+                    continue;
+                }
+                domain.tokens -= 1;
+                this._start(domain, domain.queue.shift());
+                started = true;
+                // The next turn starts after the domain just served
+                this.cursor = (index + 1) % this.ring.length;
+                if (domain.queue.length === 0) this._leaveRing(domain.key);
+                break;
+            }
+        }
+
+        this._prune();
+
+        clearTimeout(this.wakeTimer);
+        this.wakeTimer = null;
+        if (this.ring.length > 0 && this.running < this.maxConcurrency && nextTokenMs !== Infinity) {
+            this.wakeTimer = setTimeout(() => this._pump(), Math.ceil(nextTokenMs));
+        }
+    }
+
+    _prune() {
+        this.domains.forEach((d, key) => {
+            if (d.running === 0 && d.queue.length === 0 && this._refill(d) >= d.limits.burst) {
+                this.domains.delete(key);
+            }
+        });
+    }
+
+    _leaveRing(key) {
+        const index = this.ring.indexOf(key);
+        if (index === -1) return;
+        this.ring.splice(index, 1);
+        // Keep pointing at the same next domain
+        if (index < this.cursor) this.cursor--;
+        if (this.cursor >= this.ring.length) this.cursor = 0;
+    }
+
+    _start(domain, entry) {
+        clearTimeout(entry.timer);
+        this.running++;
+        domain.running++;
+
+        const finish = () => {
+            this.running--;
+            domain.running--;
+            this._pump();
+        };
+
+        let run;
+        try {
+            run = Promise.resolve(entry.task(entry.deadline));
+        } catch (e) {
+            run = Promise.reject(e);
+        }
+        run.then(
+            result => { finish(); entry.resolve(result); },
+            err => { finish(); entry.reject(err); }
+        );
+    }
+}
+
+module.exports = Scheduler;
@@ -3,16 +3,20 @@ const express = require('express');
 const config = require('../shared/config');
 const logger = require('../shared/logger');
 const routes = require('./routes');
+const runner = require('./runner');
+const cache = require('./cache');
+const jobs = require('./jobs');
+const metrics = require('./metrics');
 
 const app = express();
 
 // Middleware: Parse JSON bodies
-app.use(express.json());
+app.use(express.json({ limit: config.JSON_BODY_LIMIT }));
 
 // Middleware: CORS (Manual Logic)
 app.use((req, res, next) => {
     res.header("Access-Control-Allow-Origin", "*");
-    res.header("Access-Control-Allow-Headers", "Origin, X-Requested-With, Content-Type, Accept");
+    res.header("Access-Control-Allow-Headers", "Origin, X-Requested-With, Content-Type, Accept, Cache-Control");
     res.header("Access-Control-Allow-Methods", "GET, POST, OPTIONS");
     if (req.method === 'OPTIONS') {
         return res.sendStatus(200);
@@ -26,6 +30,9 @@ app.use((req, res, next) => {
     next();
 });
 
+// Middleware: Request Metrics (GET /api/metrics)
+app.use(metrics.middleware);
+
 // Mount Routes
 app.use('/api', routes);
 
@@ -36,7 +43,11 @@ app.get('/', (req, res) => {
         status: "Running",
         endpoints: {
             health: "GET /api/health",
-            scrape: "POST /api/scrape"
+            metrics: "GET /api/metrics",
+            scrape: "POST /api/scrape",
+            stream: "GET /api/scrape/stream?url=...",
+            batch: "POST /api/scrape/batch",
+            jobs: "POST /api/jobs, GET /api/jobs/:id"
         },
         version: "2.0 (Backend Only)"
     });
@@ -62,7 +73,22 @@ app.use((err, req, res, next) => {
 });
 
 // Start Server
-app.listen(config.PORT, () => {
+const server = app.listen(config.PORT, () => {
     logger.info(`API Gateway listening on http://localhost:${config.PORT}`);
     logger.info(`Mode: Production-Ready`);
+    // Warm up the scraper workers before the first request arrives
+    runner.start();
+    // Resume jobs left in the store by the previous run
+    jobs.start();
+});
+
+// Graceful Shutdown (don't leave Firefox processes behind)
+['SIGINT', 'SIGTERM'].forEach(signal => {
+    process.on(signal, () => {
+        logger.info(`Received ${signal}, shutting down`);
+        jobs.shutdown();
+        cache.shutdown();
+        runner.shutdown();
+        server.close(() => process.exit(0));
+    });
 });
@@ -0,0 +1,280 @@
+// api/worker_pool.js
+const { spawn } = require('child_process');
+const readline = require('readline');
+const config = require('../shared/config');
+const logger = require('../shared/logger');
+const { ScrapeError } = require('./errors');
+const Progress = require('./progress');
+
+/**
+ * Worker Pool
+ * Keeps N long-lived `scraper.py --worker` processes alive, each with a warm Firefox.
+ * Jobs are written to a worker's stdin as one JSON line and the answer comes back as one JSON line.
+ * Each worker runs up to BROWSER_MAX_CONTEXTS jobs at once (async engine, one browser).
+ *
+ * Each job carries a time budget. The budget clock starts when the job is queued here, so the
+ * worker gets what is left of it at dispatch and answers inside it (see scraper/deadline.py).
+ * A job that runs past its timeout fails with SCRAPER_TIMEOUT and is cancelled inside the worker;
+ * a worker that does not confirm the cancel is killed and respawned.
+ * Workers stream progress events per job (see progress.js): a job that times out or whose worker
+ * dies answers with the last images an agent found, when there are any, instead of the error.
+ * Idle workers are probed every WORKER_HEALTH_INTERVAL_MS; a failed probe also means respawn.
+ */
+class WorkerPool {
+    constructor(size) {
+        this.size = size;
+        this.capacity = Math.max(1, config.BROWSER_MAX_CONTEXTS);
+        this.workers = [];
+        this.queue = [];
+        this.nextJobId = 1;
+        this.closed = false;
+        this.healthTimer = null;
+    }
+
+    start() {
+        for (let i = 0; i < this.size; i++) {
+            this.workers.push(this._spawnWorker(i, 0));
+        }
+        this.healthTimer = setInterval(() => this._probeIdleWorkers(), config.WORKER_HEALTH_INTERVAL_MS);
+        this.healthTimer.unref();
+    }
+
+    /**
+     * Queues a URL and resolves with the scraper's JSON result.
+     * The budget and the timeout both cover the whole life of the job (queue wait + scrape).
+     * `progress` (a Progress) gets the job's events as they arrive.
+     */
+    run(url, budgetMs = config.SCRAPE_BUDGET_MS, timeoutMs = config.TIMEOUT_MS, progress = null) {
+        return new Promise((resolve, reject) => {
+            if (this.closed) {
+                return reject(new ScrapeError("INTERNAL_ERROR", "Scraper pool is shutting down."));
+            }
+
+            const job = {
+                id: String(this.nextJobId++), url, resolve, reject, worker: null, settled: false,
+                deadline: Date.now() + budgetMs, progress: progress || new Progress(url)
+            };
+
+            job.timer = setTimeout(() => {
+                logger.error(`Timeout reached for ${url}`);
+                this._settle(job, new ScrapeError("SCRAPER_TIMEOUT", "The scraping process took too long and was terminated."));
+
+                const waiting = this.queue.indexOf(job);
+                if (waiting !== -1) return this.queue.splice(waiting, 1);
+                if (job.worker) this._cancel(job);
+            }, timeoutMs);
+
+            this.queue.push(job);
+            this._dispatch();
+        });
+    }
+
+    stats() {
+        return {
+            size: this.size,
+            capacity: this.capacity,
+            ready: this.workers.filter(w => w.ready).length,
+            busy: this.workers.filter(w => w.jobs.size > 0).length,
+            running: this.workers.reduce((n, w) => n + w.jobs.size, 0),
+            queued: this.queue.length,
+            workers: this.workers.map(w => ({
+                index: w.index,
+                pid: w.proc.pid,
+                ready: w.ready,
+                running: w.jobs.size,
+                health: w.health
+            }))
+        };
+    }
+
+    shutdown() {
+        this.closed = true;
+        clearInterval(this.healthTimer);
+        this.queue.splice(0).forEach(job => {
+            this._settle(job, new ScrapeError("INTERNAL_ERROR", "Scraper pool is shutting down."));
+        });
+        this.workers.forEach(w => {
+            w.proc.stdin.end();
+            w.proc.kill();
+        });
+    }
+
+    _dispatch() {
+        while (this.queue.length > 0) {
+            // Least-loaded ready worker with a free slot
+            const worker = this.workers
+                .filter(w => w.ready && w.jobs.size < this.capacity)
+                .sort((a, b) => a.jobs.size - b.jobs.size)[0];
+            if (!worker) return;
+
+            const job = this.queue.shift();
+            worker.jobs.set(job.id, job);
+            job.worker = worker;
+            this._send(worker, { id: job.id, url: job.url, budget_ms: Math.max(0, job.deadline - Date.now()), events: true });
+        }
+    }
+
+    _send(worker, message) {
+        worker.proc.stdin.write(JSON.stringify(message) + '\n');
+    }
+
+    _cancel(job) {
+        const worker = job.worker;
+        this._send(worker, { id: `cancel-${job.id}`, cmd: 'cancel', target: job.id });
+        // Slot stays taken until the worker confirms; no confirmation = stuck worker
+        job.killTimer = setTimeout(() => {
+            logger.error(`Scraper worker ${worker.index} did not cancel job ${job.id}, killing it`);
+            worker.proc.kill();
+        }, config.WORKER_HEALTH_TIMEOUT_MS);
+    }
+
+    _settle(job, error, result) {
+        if (job.settled) return;
+        job.settled = true;
+        clearTimeout(job.timer);
+        const partial = error && job.progress.salvage(error);
+        if (partial) {
+            logger.info(`Answering ${job.url} with a partial result`, { reason: error.code, images: partial.total_images });
+            job.resolve(partial);
+        } else if (error) job.reject(error);
+        else job.resolve(result);
+    }
+
+    _release(worker, job) {
+        clearTimeout(job.killTimer);
+        worker.jobs.delete(job.id);
+        job.worker = null;
+        this._dispatch();
+    }
+
+    _probeIdleWorkers() {
+        this.workers.filter(w => w.ready && w.jobs.size === 0 && !w.probe).forEach(worker => {
+            const probe = { id: `health-${this.nextJobId++}` };
+            probe.timer = setTimeout(() => {
+                logger.error(`Scraper worker ${worker.index} did not answer health probe`);
+                worker.proc.kill();
+            }, config.WORKER_HEALTH_TIMEOUT_MS);
+            worker.probe = probe;
+            this._send(worker, { id: probe.id, cmd: 'health' });
+        });
+    }
+
+    _spawnWorker(index, failures) {
+        const worker = {
+            index, proc: null, ready: false, jobs: new Map(), probe: null,
+            failures, stderrTail: '', dead: false, health: null
+        };
+        const proc = spawn(config.PYTHON_CMD, [config.SCRAPER_SCRIPT, '--worker'], {
+            env: {
+                ...process.env,
+                SCRAPER_MAX_CONTEXTS: String(config.BROWSER_MAX_CONTEXTS),
+                SCRAPER_PAGES_PER_CONTEXT: String(config.BROWSER_PAGES_PER_CONTEXT),
+                SCRAPER_JOBS_PER_BROWSER: String(config.BROWSER_JOBS_PER_BROWSER),
+                SCRAPER_MAX_RSS_MB: String(config.BROWSER_MAX_RSS_MB),
+                SCRAPER_ARBITER: config.SCRAPER_ARBITER,
+                SCRAPER_ROUTING_DB: config.ROUTING_DB_FILE,
+                SCRAPER_SESSION_DIR: config.SESSION_DIR,
+                SCRAPER_SESSION_TTL_MS: String(config.SESSION_TTL_MS),
+                SCRAPER_SESSION_SLOTS: String(config.SESSION_SLOTS),
+                SCRAPER_RELOAD_BUDGET: String(config.RELOAD_BUDGET),
+                SCRAPER_FASTPATH: config.SCRAPER_FASTPATH,
+                SCRAPER_PROBE: config.IMAGE_PROBE,
+                SCRAPER_DEDUP: config.IMAGE_DEDUP,
+                SCRAPER_MIN_IMAGE_WIDTH: String(config.MIN_IMAGE_WIDTH),
+                SCRAPER_MIN_IMAGE_HEIGHT: String(config.MIN_IMAGE_HEIGHT)
+            }
+        });
+        worker.proc = proc;
+
+        readline.createInterface({ input: proc.stdout }).on('line', (line) => this._onLine(worker, line));
+
+        proc.stderr.on('data', (data) => {
+            // Keep only the tail: enough to explain a crash without growing forever
+            worker.stderrTail = (worker.stderrTail + data.toString()).slice(-2000);
+        });
+
+        proc.on('exit', (code) => this._onExit(worker, code));
+
+        // Spawn errors (e.g., python not found)
+        proc.on('error', (err) => {
+            logger.error("Failed to spawn Python worker", err);
+            this._onExit(worker, null, new ScrapeError("INTERNAL_ERROR", "Failed to start scraping engine."));
+        });
+
+        return worker;
+    }
+
+    _onLine(worker, line) {
+        let message;
+        try {
+            message = JSON.parse(line);
+        } catch (e) {
+            logger.debug(`[Worker ${worker.index}] Ignoring non-protocol output`, { line: line.slice(0, 100) });
+            return;
+        }
+
+        if (message.event === 'ready') {
+            worker.ready = true;
+            worker.failures = 0;
+            logger.info(`Scraper worker ${worker.index} ready`, { pid: message.pid });
+            return this._dispatch();
+        }
+
+        if (message.health) worker.health = message.health;
+
+        if (worker.probe && message.id === worker.probe.id) {
+            clearTimeout(worker.probe.timer);
+            worker.probe = null;
+            if (!message.health || !message.health.ok) {
+                logger.error(`Scraper worker ${worker.index} failed health probe`, { health: message.health });
+                worker.proc.kill();
+            }
+            return;
+        }
+
+        const job = worker.jobs.get(message.id);
+        if (!job) {
+            return logger.debug(`[Worker ${worker.index}] Unexpected message`, message);
+        }
+
+        if (message.event) {
+            const { id, ...event } = message;
+            if (!job.settled) job.progress.push(event);
+            return;
+        }
+
+        // `cancelled` only confirms a timeout we already answered
+        if (!message.cancelled) this._settle(job, null, message.result);
+        this._release(worker, job);
+    }
+
+    _onExit(worker, code, error) {
+        if (worker.dead) return;
+        worker.dead = true;
+        worker.ready = false;
+        if (worker.probe) clearTimeout(worker.probe.timer);
+
+        if (worker.jobs.size > 0) {
+            logger.error(`Scraper worker ${worker.index} exited with code ${code}`, { stderr: worker.stderrTail });
+            worker.jobs.forEach(job => {
+                clearTimeout(job.killTimer);
+                this._settle(job, error || new ScrapeError("SCRAPER_FAILED", "The scraping process failed.", {
+                    details: worker.stderrTail.slice(-200)
+                }));
+            });
+            worker.jobs.clear();
+        }
+
+        if (this.closed) return;
+
+        // Back off when a worker keeps dying before it ever gets ready
+        const failures = worker.failures + 1;
+        const delay = Math.min(config.WORKER_RESPAWN_DELAY_MS * 2 ** (failures - 1), 30000);
+        setTimeout(() => {
+            if (this.closed) return;
+            this.workers[worker.index] = this._spawnWorker(worker.index, failures);
+        }, delay);
+    }
+}
+
+module.exports = WorkerPool;
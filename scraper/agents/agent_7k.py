@@ -14,247 +14,215 @@ STRATEGIES:
 5. Strict Luxury Filtering (Level 7)
 """
 
-from playwright.sync_api import Page
 import re
 import urllib.parse
 import sys
 
+try:
+    from readiness import wait_for_quiet_async
+except ImportError:
+    sys.path.append('scraper')
+    from readiness import wait_for_quiet_async
+
+from agents.harvest import harvest_async, source_matches_async, invalidate, srcset_last
+from normalize import normalize
+from tokens import JUNK
+from recovery import recover_async, MIN_YIELD
+
 NAME = "AGENT-7K"
 
-def run_agent_7k(page: Page):
+MIN_SIZE = 450 # Strict Luxury Requirement (Level 7)
+VIEWPORT_LIMIT = 2000 # Limit scan to top area (Level 2)
+
+# === STRATEGY: VISUAL HERO LOCK-ON ===
+# Scores the "Hero" product image that is visible to a human, from the shared harvest snapshot
+# (document + open shadow roots, Level 4).
+def is_visible(node):
+    if node["hidden"]:
+        return False
+    top, _, width, height = node["rect"]
+    # Must be in top viewport and have size
+    return width > 0 and height > 0 and top < VIEWPORT_LIMIT and top + height > 0
+
+def visual_candidates(snapshot):
+    candidates = []
+    seen = set()
+    base = snapshot["base"]
+    center_x = snapshot["viewport"][0] / 2
+
+    def add(url, score, kind):
+        if not url or url.startswith('data:') or url in seen:
+            return
+        seen.add(url)
+        candidates.append((score, {'src': url, 'method': f'js_visual_{kind}'}))
+
+    for in_shadow in (False, True):
+        nodes = [n for n in snapshot["nodes"] if n["shadow"] == in_shadow and is_visible(n)]
+
+        # A. IMG TAGS
+        for img in nodes:
+            if img["tag"] != "img":
+                continue
+            top, left, width, height = img["rect"]
+
+            # Strict Size Filter
+            w = img["natural"][0] or width
+            h = img["natural"][1] or height
+            if w < MIN_SIZE and h < MIN_SIZE:
+                continue
+
+            # Scoring: Hero Lock-on (Level 2)
+            dist_from_center = abs((left + width / 2) - center_x)
+            score = (width * height) / (dist_from_center + 1)
+
+            # Boost keywords
+            id_class = (img["id"] + img["cls"]).lower()
+            if 'main' in id_class or 'hero' in id_class or 'product' in id_class:
+                score *= 2.0
+
+            # Source Selection
+            data = img["data"]
+            src = data.get("zoomImage") or data.get("zoomSrc") or img["current_src"] or img["src"]
+
+            # Handle srcset locally if possible to get best fit (simple logic: take last one)
+            if img["srcset"]:
+                src = srcset_last(img["srcset"])
+
+            # Resolve relative URLs (Critical for LV)
+            if src:
+                src = urllib.parse.urljoin(base, src)
+
+            add(src, score, 'img')
+
+        # B. BACKGROUND IMAGES (Level 3)
+        # Critical for luxury sites that use div backgrounds
+        for el in nodes:
+            if not el["bg"]:
+                continue
+            _, _, width, height = el["rect"]
+            # Must be substantial size
+            if width < MIN_SIZE and height < MIN_SIZE:
+                continue
+            add(urllib.parse.urljoin(base, el["bg"]), width * height * 0.8, 'bg')
+
+    # Return strictly sorted by Visual Score
+    candidates.sort(key=lambda c: -c[0])
+    return [c for _, c in candidates]
+
+# Specific selectors for H&M's new gallery structure
+HM_SELECTORS = [
+    ".product-detail-main-image-container img",
+    ".product-detail-thumbnails img",
+    ".product-gallery img",
+    "figure.pdp-image-template img",
+    ".product-detail-images img"
+]
+
+def is_fashion_giant(url):
+    return "hm.com" in url or "zara.com" in url or "uniqlo.com" in url
+
+def wants_regex_scan(url):
+    return any(d in url for d in ["hm.com", "zara.com", "amazon", "amzn"])
+
+def wants_retry(url, candidates):
+    # Only retry if initial visual scan yielded few results
+    return ("amazon" in url or "flipkart" in url) and len(candidates) < MIN_YIELD
+
+async def run_agent_7k_async(page):
     """
     EXECUTING AGENT-7K V3 (ENTERPRISE LUXURY)
     """
-    
-    # === STRATEGY: VISUAL HERO LOCK-ON (JS) ===
-    # Scans for the "Hero" product image that is visible to a human.
-    
-    visual_payload = '''() => {
-        const CANDIDATES = [];
-        const SEEN = new Set();
-        const MIN_SIZE = 450; // Strict Luxury Requirement (Level 7)
-        const VIEWPORT_LIMIT = 2000; // Limit scan to top area (Level 2)
-        
-        // Helper: Is Visible?
-        const isVisible = (el) => {
-            if (!el) return false;
-            const style = window.getComputedStyle(el);
-            if (style.display === 'none' || style.visibility === 'hidden' || style.opacity === '0') return false;
-            const rect = el.getBoundingClientRect();
-            // Must be in top viewport and have size
-            return rect.width > 0 && rect.height > 0 && rect.top < VIEWPORT_LIMIT && rect.bottom > 0;
-        };
-
-        // Helper: Get Shadow Roots (Level 4 - Safe Open Mode Only)
-        const getAllShadows = (root) => {
-            const all = [];
-            try {
-                const walker = document.createTreeWalker(root, NodeFilter.SHOW_ELEMENT, null, false);
-                while(walker.nextNode()) {
-                    const node = walker.currentNode;
-                    if (node.shadowRoot) {
-                        all.push(node.shadowRoot);
-                        all.push(...getAllShadows(node.shadowRoot));
-                    }
-                }
-            } catch(e) {}
-            return all;
-        };
-        
-        // Helper: Add Candidate
-        const add = (url, score, type) => {
-            if (!url) return;
-            if (url.startsWith('data:')) return; 
-            if (SEEN.has(url)) return;
-            
-            SEEN.add(url);
-            CANDIDATES.push({ url, score, type });
-        };
-
-        // 1. SCAN VISIBLE DOM (Document + Open Shadows)
-        const roots = [document, ...getAllShadows(document.body)];
-        const centerX = window.innerWidth / 2;
-        
-        roots.forEach(root => {
-            // A. IMG TAGS
-            root.querySelectorAll('img').forEach(img => {
-                if (!isVisible(img)) return;
-                
-                const rect = img.getBoundingClientRect();
-                
-                // Strict Size Filter
-                const w = img.naturalWidth || rect.width;
-                const h = img.naturalHeight || rect.height;
-                if (w < MIN_SIZE && h < MIN_SIZE) return; 
-
-                // Scoring: Hero Lock-on (Level 2)
-                const area = rect.width * rect.height;
-                const distFromCenter = Math.abs((rect.left + rect.width / 2) - centerX);
-                const visualProminence = area / (distFromCenter + 1); 
-                
-                // Boost keywords
-                let score = visualProminence;
-                const idClass = (img.id + img.className || "").toLowerCase();
-                if (idClass.includes('main') || idClass.includes('hero') || idClass.includes('product')) {
-                    score *= 2.0;
-                }
-
-                // Source Selection
-                let src = img.getAttribute('data-zoom-image') || 
-                          img.getAttribute('data-zoom-src') || 
-                          img.currentSrc || 
-                          img.src;
-                
-                // Handle srcset locally if possible to get best fit
-                if (img.srcset) {
-                     const parts = img.srcset.split(',');
-                     // simple logic: take last one
-                     src = parts[parts.length - 1].trim().split(' ')[0];
-                }
-                
-                // Resolve relative URLs (Critical for LV)
-                if (src) {
-                    try {
-                        src = new URL(src, document.baseURI).href;
-                    } catch(e) {}
-                }
-
-                add(src, score, 'img');
-            });
-
-            // B. BACKGROUND IMAGES (Level 3)
-            // Critical for luxury sites that use div backgrounds
-            root.querySelectorAll('*').forEach(el => {
-                if (!isVisible(el)) return;
-                const style = window.getComputedStyle(el);
-                const bg = style.backgroundImage;
-                
-                if (bg && bg.startsWith('url(')) {
-                    const rect = el.getBoundingClientRect();
-                    // Must be substantial size
-                    if (rect.width < MIN_SIZE && rect.height < MIN_SIZE) return;
-                    
-                    const match = bg.match(/url\\(['"]?(.*?)['"]?\\)/);
-                    if (match && match[1]) {
-                         let bgUrl = match[1];
-                         try {
-                             bgUrl = new URL(bgUrl, document.baseURI).href;
-                         } catch(e) {}
-                         add(bgUrl, rect.width * rect.height * 0.8, 'bg');
-                    }
-                }
-            });
-        });
-        
-        // Return strictly sorted by Visual Score
-        return CANDIDATES.sort((a, b) => b.score - a.score).map(c => ({ src: c.url, method: `js_visual_${c.type}` }));
-    }'''
+    candidates = []
 
     try:
         # Run Visual Engine
-        js_candidates = page.evaluate(visual_payload)
-        candidates.extend(js_candidates)
+        candidates.extend(visual_candidates(await harvest_async(page)))
 
         # ------------------------------------------------------------------
         # STRATEGY 4: H&M / ZARA / UNIQLO SPECIFIC (The "Scroll & Harvest" Maneuver)
         # ------------------------------------------------------------------
         # H&M specifically lazy loads heavily. We must force scroll.
-        if "hm.com" in page.url or "zara.com" in page.url or "uniqlo.com" in page.url:
+        if is_fashion_giant(page.url):
             print(f"[{NAME}] Detected Fashion Giant. Initiating deep scroll...", file=sys.stderr)
             try:
                 # Scroll down repeatedly to trigger lazy loading
                 for _ in range(5):
-                    page.evaluate("window.scrollBy(0, 800)")
-                    page.wait_for_timeout(500)
-                
+                    await page.evaluate("window.scrollBy(0, 800)")
+                    await wait_for_quiet_async(page)
+                # Lazy-loaded DOM changed: later agents need a fresh snapshot
+                invalidate(page)
+
                 # H&M Specific: Click "Load more" if present (often in gallery)
                 try:
-                    page.click('button:has-text("Load more")', timeout=1000)
-                except:
+                    await page.click('button:has-text("Load more")', timeout=1000)
+                except Exception:
                     pass
-                    
-                # Specific selectors for H&M's new gallery structure
-                hm_selectors = [
-                    ".product-detail-main-image-container img",
-                    ".product-detail-thumbnails img",
-                    ".product-gallery img",
-                    "figure.pdp-image-template img",
-                    ".product-detail-images img"
-                ]
-                for sel in hm_selectors:
-                    elements = page.query_selector_all(sel)
-                    for el in elements:
-                        src = el.get_attribute('src')
+
+                for sel in HM_SELECTORS:
+                    for src in await page.eval_on_selector_all(sel, "els => els.map(e => e.getAttribute('src'))"):
                         if src:
                             candidates.append({'src': src, 'method': 'hm_special_dom'})
-                            
+
             except Exception as e:
                 print(f"[{NAME}] Scroll maneuver errors: {e}", file=sys.stderr)
 
         # ------------------------------------------------------------------
         # STRATEGY 5: REGEX SCANNER (The "Source Code Bypass") - H&M / ZARA / AMAZON
         # ------------------------------------------------------------------
-        if any(d in page.url for d in ["hm.com", "zara.com", "amazon", "amzn"]):
+        if wants_regex_scan(page.url):
             print(f"[{NAME}] Initiating Regex Source Scan...", file=sys.stderr)
             try:
-                content = page.content()
-                # Find all jpg/png/webp URLs
-                regex_matches = re.findall(r'(https?://[^"\s>]+\.(?:jpg|jpeg|png|webp)\?[^"\s]*)', content)
-                
-                # Loose regex for Amazon specifically (often ends in .jpg without params in JSON)
-                if "amazon" in page.url:
-                    amazon_matches = re.findall(r'(https?://m\.media-amazon\.com/images/I/[^"\s>]+\.jpg)', content)
-                    regex_matches.extend(amazon_matches)
-
-                for m in regex_matches:
-                    clean_m = m
-                    
-                    # Amazon Clean
-                    if "amazon" in page.url and "media-amazon" in m:
-                        # Remove definition params to get max res
-                        clean_m = re.sub(r'\._S[A-Z0-9]+_\.', '.', m)
-                        candidates.append({'src': clean_m, 'method': 'regex_scan_amazon'})
-                        
-                    # H&M Clean
-                    elif "hm.com" in page.url and ("product" in m or "dam" in m):
-                        clean_m = re.sub(r'\?imwidth=\d+', '?imwidth=2500', m)
-                        candidates.append({'src': clean_m, 'method': 'regex_scan_hm'})
-
-                    # Zara Clean
-                    elif "zara.com" in page.url:
-                        candidates.append({'src': clean_m, 'method': 'regex_scan_zara'})
-
+                candidates.extend(regex_scan(await source_matches_async(page, scan_patterns(page.url)), page.url))
             except Exception as e:
                 print(f"[{NAME}] Regex scan error: {e}", file=sys.stderr)
 
         # ------------------------------------------------------------------
         # STRATEGY 6: AMAZON / FLIPKART RETRY (The "Double Tap")
         # ------------------------------------------------------------------
-        # Only retry if initial visual scan yielded few results
-        if ("amazon" in page.url or "flipkart" in page.url) and len(candidates) < 2:
-            print(f"[{NAME}] Low yield on Retail Giant. Attempting Reload & Retry...", file=sys.stderr)
-            try:
-                page.reload(wait_until="domcontentloaded")
-                page.wait_for_timeout(4000) # Increased to 4s
-                # Quick re-scan for common Amazon/Flipkart selectors
-                imgs = page.query_selector_all("#landingImage, #imgTagWrapperId img, .a-dynamic-image")
-                for i in imgs:
-                    src = i.get_attribute('src') or i.get_attribute('data-old-hires')
-                    if src: candidates.append({'src': src, 'method': 'amazon_retry'})
-            except Exception as e:
-                 print(f"[{NAME}] Amazon/Flipkart retry error: {e}", file=sys.stderr)
+        # Cheap rungs first (wait, scroll, page source); a reload only as the last one (see recovery.py)
+        if wants_retry(page.url, candidates):
+            print(f"[{NAME}] Low yield on Retail Giant. Climbing the recovery ladder...", file=sys.stderr)
+            candidates.extend(await recover_async(page, candidates))
 
         # === LEVEL 5 & 7: SAFE NORMALIZATION & STRICT FILTERING ===
         final_urls = process_luxury_images(candidates, page.url)
-        
+
         if final_urls:
             return final_urls, "Agent 7K (Enterprise Luxury)"
-        
+
     except Exception as e:
-        print(f"[{NAME}] Error in run_agent_7k: {e}", file=sys.stderr)
+        print(f"[{NAME}] Error in run_agent_7k_async: {e}", file=sys.stderr)
 
     return [], ""
 
+# Find all jpg/png/webp URLs (with a query string)
+IMAGE_URL_REGEX = re.compile(r'(https?://[^"\s>]+\.(?:jpg|jpeg|png|webp)\?[^"\s]*)')
+# Loose regex for Amazon specifically (often ends in .jpg without params in JSON)
+AMAZON_IMAGE_REGEX = re.compile(r'(https?://m\.media-amazon\.com/images/I/[^"\s>]+\.jpg)')
+
+def scan_patterns(page_url):
+    if "amazon" in page_url:
+        return [IMAGE_URL_REGEX, AMAZON_IMAGE_REGEX]
+    return [IMAGE_URL_REGEX]
+
+def regex_scan(regex_matches, page_url):
+    """
+    STRATEGY 5 core: image URLs pulled straight out of the page source (harvest.source_matches
+    with scan_patterns), kept per site.
+    """
+    candidates = []
+
+    # Max res for each CDN comes later, in process_luxury_images (see normalize.py)
+    for m in regex_matches:
+        if "amazon" in page_url and "media-amazon" in m:
+            candidates.append({'src': m, 'method': 'regex_scan_amazon'})
+        elif "hm.com" in page_url and ("product" in m or "dam" in m):
+            candidates.append({'src': m, 'method': 'regex_scan_hm'})
+        elif "zara.com" in page_url:
+            candidates.append({'src': m, 'method': 'regex_scan_zara'})
+
+    return candidates
+
 def process_luxury_images(candidates, base_url):
     """
     Normalizes images SAFELY and applies STRICT luxury filtering.
@@ -262,23 +230,6 @@ def process_luxury_images(candidates, base_url):
     clean_list = []
     seen = set()
     
-    # EXPANDED JUNK TERMS (STRICT FILTER LEVEL 7)
-    JUNK_TERMS = [
-        'base64', 'icon', 'logo', 'button', 'star', 'rating', 'avatar', 
-        'sprite', 'blank', 'transparent', 'gif', 'loader', 'spinner',
-        'cookielaw', 'tracking', 'pixel', 'facebook', 'twitter', 
-        'instagram', 'pinterest', 'banner', 'campaign', 'editorial',
-        'social', 'thumb', 'profile', 'promo', 'advert', 'flag', 'review',
-        'arrow', 'chevron', 'plus', 'minus', 'zoom', 'close', 'cookie',
-        'footer', 'header', 'cart', 'bag', 'wishlist', 'search', 'menu',
-        'share', 'print', 'download', 'play', 'pause', 'video', 'audio',
-        'placeholder', 'default', 'empty', 'no-image', 'missing', 'broken',
-        'chart', 'guide', 'measure', 'sizing', 'fit', 'infographic'
-    ]
-    
-    # TERMS INDICATING SIGNED/SECURE URLS (DO NOT TOUCH)
-    SECURITY_PARAMS = ['sig', 'signature', 'token', 'auth', 'key', 'hmac', 'expires', 'timestamp']
-
     for c in candidates:
         u = c.get('src')
         if not u: continue
@@ -295,53 +246,16 @@ def process_luxury_images(candidates, base_url):
             except Exception:
                 continue # Skip if cannot resolve securely
 
-        lower_u = u.lower()
-        
-        # 3. Strict Junk Filter
-        if any(j in lower_u for j in JUNK_TERMS):
+        # 3. Strict Junk Filter (tokens.JUNK_TERMS, matched as whole URL words)
+        if JUNK.matches(u):
             continue
             
         # 4. Extension Check
         if any(u.endswith(ext) for ext in ['.svg', '.ico', '.gif']):
             continue
 
-        # 5. SAFE Normalization (Level 5)
-        # Check if URL is signed/sensitive
-        is_sensitive = any(p in lower_u for p in SECURITY_PARAMS)
-        
-        if not is_sensitive:
-            # Safe to Normalize
-            
-            # Amazon
-            if 'amazon.' in lower_u or 'media-amazon.com' in lower_u:
-                u = re.sub(r'\._S[A-Z0-9]+_\.', '.', u)
-            
-            # Myntra (Visual extraction is usually good, but just in case)
-            if 'assets.myntassets.com' in lower_u:
-                 # Ensure http/https
-                 pass
-                 
-            # Flipkart safe upscale
-            if 'rukminim1.flixcart.com' in lower_u:
-                u = re.sub(r'/image/\d+/\d+/', '/image/1080/1080/', u)
-            
-            # Shopify safe cleanup
-            if 'cdn.shopify.com' in lower_u:
-                u = re.sub(r'_(\d+x\d+|small|medium|large|grande|compact|crop_center)(\.[a-zA-Z0-9]+)', r'\2', u)
-                u = re.sub(r'\?v=\d+', '', u)
-                
-            # H&M
-            if 'hm.com' in lower_u:
-                u = re.sub(r'\?imwidth=\d+', '', u)
-                
-            # Zara
-            if 'zara.' in lower_u:
-                 u = re.sub(r'[?&]w=\d+', '', u)
-        
-        else:
-            # SENSITIVE URL DETECTED: KEEP ORIGINAL
-            # Do NOT strip params, do NOT change anything.
-            pass
+        # 5. SAFE Normalization (Level 5): CDN max-res rules, signed URLs untouched (see normalize.py)
+        u = normalize(u)
 
         if u not in seen and u.startswith('http'):
             clean_list.append(u)
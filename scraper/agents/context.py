@@ -10,94 +10,63 @@ Strategy:
 4. Score images based on DOM proximity to Title.
 """
 
-from playwright.sync_api import Page
-import re
 import sys
 
-def run_context_agent(page: Page):
+from agents.harvest import harvest_async, page_images, is_clean, unique
+
+# Containers whose images are "Related", "Upsell", "Recommendations"
+BAD_KEYWORDS = ['related', 'recommend', 'suggest', 'like', 'similar', 'footer', 'nav', 'header', 'promo']
+
+async def run_context_agent_async(page):
     """
     Returns: (list_of_urls, note) or (None, reason)
     """
     print("[Agent 2] Context Analysis started...", file=sys.stderr)
-    
+
+    return score_context(await harvest_async(page))
+
+def score_context(snapshot):
     # 1. Identify Product Title
     # Try H1 first, then H2 with class "product" or "title"
-    title_text = page.evaluate('''() => {
-        let h1 = document.querySelector('h1');
-        if (h1 && h1.innerText.length > 5) return h1.innerText.trim();
-        
-        let h2s = Array.from(document.querySelectorAll('h2, .product-title, .pdp-title'));
-        if (h2s.length > 0) return h2s[0].innerText.trim();
-        return "";
-    }''')
-    
+    title_text = snapshot["title_text"]
+
     if not title_text:
         return [], "Context: No Product Title found to anchor search."
 
     print(f"[Agent 2] Anchoring on title: '{title_text}'", file=sys.stderr)
 
     # 2. Extract & Score
-    # We execute complex logic in browser to traverse DOM
-    candidates = page.evaluate(f'''() => {{
-        const titleText = "{title_text.replace('"', '')}";
-        const h1 = document.querySelector('h1') || document.querySelector('h2');
-        if (!h1) return [];
-
-        const allImgs = Array.from(document.querySelectorAll('img'));
-        const candidates = [];
-
-        // Helper: Check if element is inside a "bad" container
-        function isClean(el) {{
-            const badKeywords = ['related', 'recommend', 'suggest', 'like', 'similar', 'footer', 'nav', 'header', 'promo'];
-            let curr = el;
-            while (curr && curr !== document.body) {{
-                if (curr.id && badKeywords.some(k => curr.id.toLowerCase().includes(k))) return false;
-                if (curr.className && typeof curr.className === 'string' && badKeywords.some(k => curr.className.toLowerCase().includes(k))) return false;
-                
-                // Specific Check for "You May Also Like" headers
-                curr = curr.parentElement;
-            }}
-            return true;
-        }}
-
-        allImgs.forEach(img => {{
-            if (!img.src || img.src.includes('svg') || img.src.includes('base64')) return;
-            if (img.naturalWidth < 400 || img.naturalHeight < 400) return; // Min size 400x400 for Context
-            
-            // Filter out strict noise
-            if (!isClean(img)) return;
-
-            // Score by vertical distance from H1
-            // We want images that start roughly at same Y as H1, or slightly below.
-            const h1Rect = h1.getBoundingClientRect();
-            const imgRect = img.getBoundingClientRect();
-
-            // Distance metric: simple dy
-            const dy = Math.abs(imgRect.top - h1Rect.top);
-            
-            // If image is WAY below H1 (e.g. 2000px), it's potentially related/reviews
-            if (imgRect.top > h1Rect.top + 2000) return; 
-
-            // Priority: Images visible in initial viewport or just below
-            candidates.push({{
-                src: img.currentSrc || img.src,
-                score: dy, // Lower is better (closer to title)
-                width: img.naturalWidth
-            }});
-        }});
-
-        // Sort by proximity (score asc) and size (width desc)
-        candidates.sort((a, b) => a.score - b.score);
-
-        // Dedupe
-        const unique = new Set();
-        return candidates.map(c => c.src).filter(url => {{
-            if (unique.has(url)) return false;
-            unique.add(url);
-            return true;
-        }});
-    }}''')
+    return finish_context(context_candidates(snapshot), title_text)
+
+def context_candidates(snapshot):
+    anchor_top = snapshot["anchor_top"]
+    if anchor_top is None:
+        return []
+
+    candidates = []
+    for img in page_images(snapshot):
+        src = img["src"]
+        if not src or 'svg' in src or 'base64' in src: continue
+        if img["natural"][0] < 400 or img["natural"][1] < 400: continue # Min size 400x400 for Context
+
+        # Filter out strict noise
+        if not is_clean(img, BAD_KEYWORDS): continue
+
+        # Score by vertical distance from H1
+        # We want images that start roughly at same Y as H1, or slightly below.
+        top = img["rect"][0]
+
+        # If image is WAY below H1 (e.g. 2000px), it's potentially related/reviews
+        if top > anchor_top + 2000: continue
+
+        candidates.append((abs(top - anchor_top), img["current_src"] or src))
+
+    # Sort by proximity (lower is better - closer to title)
+    candidates.sort(key=lambda c: c[0])
+
+    return unique(src for _, src in candidates)
 
+def finish_context(candidates, title_text):
     if candidates:
         # Limit to top 8 images to avoid clutter
         final_list = candidates[:8]
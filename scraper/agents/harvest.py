@@ -0,0 +1,383 @@
+# scraper/agents/harvest.py
+"""
+DOM HARVEST (SHARED SNAPSHOT)
+-----------------------------
+Purpose: Walk the page ONCE and hand every agent the same compact snapshot,
+instead of each agent running its own full-document `page.evaluate`.
+
+One traversal (document + open shadow roots) collects:
+1. Nodes: every <img>, every large element with a CSS background image, and every element
+   matched by a named selector in MARKS. Each node carries rect, natural size, src/currentSrc/srcset,
+   data-* attributes, visibility flags and the "bad container" keywords found on it or its ancestors.
+2. Page Context: document.title, H1 text, the title anchor position, viewport size, base URI.
+3. Galleries: visibility + image count for each GALLERY_SELECTORS entry, plus the images of
+   the container each visible gallery maps to (Agent 1).
+4. Data Blobs: Shopify product JSON scripts, JSON-LD, `window.meta.product.images`, Shopify detection.
+
+Agents then score the snapshot in pure Python (see `score_*` in each agent).
+The snapshot is cached per page; call `invalidate(page)` after anything that changes the DOM
+(scroll-to-load, reload).
+
+Page Source: agents that hunt URLs in the source (AJIO 1117w, 7K regex scan, recovery) call
+`source_matches_async(page, patterns)`. The regexes run INSIDE the page over script text and attribute
+values, so only the matches cross the CDP pipe, never the multi-MB document.
+"""
+
+import asyncio
+import re
+import weakref
+
+# === GALLERY SELECTORS (Agent 1) ===
+# Ordered by priority
+GALLERY_SELECTORS = [
+    # Specific Sites (AJIO)
+    '.img-container .rilrtl-lazy-img',
+    '.slick-track',
+
+    # General
+    '.product-gallery', '#product-gallery',
+    '[data-testid="product-gallery"]',
+    '.product-images', '.product-media',
+
+    # Libraries
+    '.swiper-container', '.swiper-wrapper',
+    '.slick-slider',
+    '.owl-stage',
+
+    # Specific Sites
+    '.product__media-gallery',
+    '.pdp-gallery',
+    '[class*="Gallery"]',
+    '[class*="Carousel"]'
+]
+
+SEMANTIC_REGION = 'section[aria-label*="gallery"], div[aria-label*="gallery"], [role="region"][aria-label*="product images"]'
+
+# === NAMED SELECTORS (Specialist Agents) ===
+# name -> CSS selector. The snapshot lists matching node indices per name, in document order.
+MARKS = {
+    # Agent 4 (Myntra)
+    "myntra_grid": '.image-grid-image',
+    # Agent 5 (eBay)
+    "ebay_carousel": '.ux-image-carousel-item img, .ux-image-filmstrip-carousel-item img',
+    "ebay_active": '.ux-image-carousel-item.active.image img',
+    "ebay_zoom": 'img[data-zoom-src]',
+    # Agent 5 (Amazon)
+    "amazon_landing": '#landingImage',
+    "amazon_front": '#imgBlkFront',
+    "amazon_alt": '#altImages ul li img, #imageBlock .a-button-text img',
+    # Agent 5 (Flipkart) - Common flipkart product classes
+    "flipkart": 'img._396cs4, img._2r_T1I, img.q6DClP',
+    # Agent 6 (Shopify DOM), one per selector to keep their priority order
+    "shopify_photo": '.product-single__photo',
+    "shopify_media": '.product__media-item img',
+    "shopify_gallery": '.product-gallery__image',
+    "shopify_card": '.grid__item .product-card__image',
+    "shopify_thumb": '[data-product-single-thumbnail]',
+}
+
+# Union of the "related / noise container" keywords used by Agent 2 and Agent 3
+BAD_KEYWORDS = [
+    'related', 'recommend', 'suggest', 'like', 'similar', 'footer',
+    'nav', 'header', 'promo', 'instagram', 'social'
+]
+
+BG_MIN_SIZE = 450 # Smallest background element any agent looks at (7K)
+BG_TOP_LIMIT = 2000
+
+HARVEST_JS = '''({marks, badKeywords, galleries, region, bgMinSize, bgTopLimit}) => {
+    const nodes = [];
+    const index = new Map();     // element -> node index
+    const badCache = new Map();  // element -> bad keywords on it or any ancestor (below <body>)
+
+    const badHits = (el) => {
+        if (!el || el === document.body) return [];
+        if (badCache.has(el)) return badCache.get(el);
+        const id = (el.id || '').toLowerCase();
+        const cls = typeof el.className === 'string' ? el.className.toLowerCase() : '';
+        const own = badKeywords.filter(k => id.includes(k) || cls.includes(k));
+        const inherited = badHits(el.parentElement);
+        const hits = own.length ? [...new Set([...own, ...inherited])] : inherited;
+        badCache.set(el, hits);
+        return hits;
+    };
+
+    const bgUrl = (style) => {
+        const bg = style.backgroundImage;
+        if (!bg || !bg.startsWith('url(')) return null;
+        const match = bg.match(/url\\(['"]?(.*?)['"]?\\)/);
+        return match && match[1] ? match[1] : null;
+    };
+
+    const record = (el, shadow) => {
+        if (index.has(el)) return index.get(el);
+        const rect = el.getBoundingClientRect();
+        const style = window.getComputedStyle(el);
+        const parent = el.parentElement;
+        nodes.push({
+            tag: el.tagName.toLowerCase(),
+            id: el.id || '',
+            cls: typeof el.className === 'string' ? el.className : '',
+            src: el.src || '',
+            current_src: el.currentSrc || '',
+            srcset: el.getAttribute('srcset') || '',
+            data: {...el.dataset},
+            natural: [el.naturalWidth || 0, el.naturalHeight || 0],
+            rect: [rect.top, rect.left, rect.width, rect.height],
+            hidden: style.display === 'none' || style.visibility === 'hidden' || style.opacity === '0',
+            display_none: style.display === 'none',
+            bg: bgUrl(style),
+            parent_href: parent && parent.tagName === 'A' ? (parent.href || '') : '',
+            related: !!el.closest('.related-products'),
+            bad: badHits(el),
+            shadow
+        });
+        index.set(el, nodes.length - 1);
+        return nodes.length - 1;
+    };
+
+    // 1. ONE TRAVERSAL: document first, then open shadow roots
+    const roots = [[document, false]];
+    for (let r = 0; r < roots.length; r++) {
+        const [root, shadow] = roots[r];
+        const walker = document.createTreeWalker(root, NodeFilter.SHOW_ELEMENT);
+        while (walker.nextNode()) {
+            const el = walker.currentNode;
+            if (el.shadowRoot) roots.push([el.shadowRoot, true]);
+            if (el.tagName === 'IMG') {
+                record(el, shadow);
+                continue;
+            }
+            // Layout box first (cheap); computed style only for big, near-the-top elements
+            const rect = el.getBoundingClientRect();
+            if (rect.width < bgMinSize && rect.height < bgMinSize) continue;
+            if (rect.top >= bgTopLimit || rect.bottom <= 0) continue;
+            if (bgUrl(window.getComputedStyle(el))) record(el, shadow);
+        }
+    }
+
+    // 2. NAMED SELECTORS
+    const marked = {};
+    Object.entries(marks).forEach(([name, selector]) => {
+        marked[name] = Array.from(document.querySelectorAll(selector)).map(el => record(el, false));
+    });
+
+    // 3. GALLERIES (Playwright-style visibility: non-empty box, not visibility:hidden)
+    const isShown = (el) => {
+        if (!el) return false;
+        const r = el.getBoundingClientRect();
+        return r.width > 0 && r.height > 0 && window.getComputedStyle(el).visibility !== 'hidden';
+    };
+    const containers = {};
+    const galleryView = galleries.map(([selector, countInside, containerSelector]) => {
+        let first = null;
+        try { first = document.querySelector(selector); } catch (e) {}
+        const visible = isShown(first);
+        const count = !visible ? 0 : (countInside ? first.querySelectorAll('img').length : document.querySelectorAll(selector).length);
+        if (count > 0 && !(containerSelector in containers)) {
+            let container = null;
+            try { container = document.querySelector(containerSelector); } catch (e) {}
+            if (!container) container = document.querySelector('.slick-track');
+            containers[containerSelector] = !container ? null : {
+                is_gallery: container.classList.contains('slick-track') ||
+                            container.classList.contains('swiper-wrapper') ||
+                            (container.id || '').includes('gallery'),
+                nodes: Array.from(container.querySelectorAll('img')).map(img => record(img, false))
+            };
+        }
+        return {selector, visible, count};
+    });
+
+    const regionEl = document.querySelector(region);
+    const regionView = {
+        visible: isShown(regionEl),
+        nodes: regionEl ? Array.from(regionEl.querySelectorAll('img')).map(img => record(img, false)) : []
+    };
+
+    // 4. PAGE CONTEXT
+    const h1 = document.querySelector('h1');
+    let titleText = '';
+    if (h1 && h1.innerText.length > 5) {
+        titleText = h1.innerText.trim();
+    } else {
+        const h2 = document.querySelector('h2, .product-title, .pdp-title');
+        if (h2) titleText = h2.innerText.trim();
+    }
+    const anchor = h1 || document.querySelector('h2');
+
+    // 5. DATA BLOBS
+    const productJson = [];
+    document.querySelectorAll('script[type="application/json"]').forEach(s => {
+        const text = s.textContent || '';
+        if ((s.id || '').toLowerCase().includes('product') || text.includes('"images":')) productJson.push(text);
+    });
+    const jsonLd = Array.from(document.querySelectorAll('script[type="application/ld+json"]')).map(s => s.textContent || '');
+    const meta = window.meta && window.meta.product && window.meta.product.images;
+
+    // Shopify without window.Shopify: assets from the Shopify CDN (or the shop's own /cdn/shop/ path).
+    // Checked on script / stylesheet hosts and a few selectors, not by serializing the document.
+    const shopify = !!window.Shopify;
+    let shopifySource = false;
+    if (!shopify) {
+        const hosts = new Set();
+        document.querySelectorAll('script[src], link[href]').forEach(el => {
+            try { hosts.add(new URL(el.src || el.href, document.baseURI).hostname); } catch (e) {}
+        });
+        shopifySource = [...hosts].some(h => h === 'cdn.shopify.com' || h.endsWith('.myshopify.com')) ||
+            !!document.querySelector('img[src*="cdn.shopify.com"], img[src*="/cdn/shop/"], script[src*="/cdn/shop/"], link[href*="/cdn/shop/"]');
+    }
+
+    return {
+        url: window.location.href,
+        base: document.baseURI,
+        title: document.title || "",
+        h1: h1 ? h1.innerText.trim() : "",
+        title_text: titleText,
+        anchor_top: anchor ? anchor.getBoundingClientRect().top : null,
+        viewport: [window.innerWidth, window.innerHeight],
+        nodes,
+        marks: marked,
+        galleries: galleryView,
+        containers,
+        region: regionView,
+        product_json: productJson,
+        json_ld: jsonLd,
+        meta_images: Array.isArray(meta) ? meta : [],
+        shopify,
+        shopify_source: shopifySource
+    };
+}'''
+
+def gallery_target(selector):
+    """
+    Returns (count_inside, container_selector):
+    container selectors count the <img> inside the first match, image selectors count themselves.
+    """
+    if 'img' not in selector and 'rilrtl' not in selector:
+        return True, selector
+    container_selector = selector.split(' ')[0] if ' ' in selector else selector
+    if 'rilrtl' in selector: container_selector = '.slick-track'
+    return False, container_selector
+
+HARVEST_ARGS = {
+    "marks": MARKS,
+    "badKeywords": BAD_KEYWORDS,
+    "galleries": [[sel, *gallery_target(sel)] for sel in GALLERY_SELECTORS],
+    "region": SEMANTIC_REGION,
+    "bgMinSize": BG_MIN_SIZE,
+    "bgTopLimit": BG_TOP_LIMIT,
+}
+
+# page -> {"snapshot": task, ("matches", ...): task}. Weak keys: closed pages drop out on their own.
+_cache = weakref.WeakKeyDictionary()
+
+async def harvest_async(page):
+    """
+    The page snapshot (one page.evaluate per page until invalidated).
+    """
+    return await _shared_async(page, "snapshot", lambda: page.evaluate(HARVEST_JS, HARVEST_ARGS))
+
+async def _shared_async(page, key, fetch):
+    """
+    Async cache read. Agents running side by side (parallel arbiter) share one in-flight fetch;
+    a failed fetch is forgotten so the next caller tries again.
+    """
+    entry = _cache.setdefault(page, {})
+    if key not in entry:
+        task = asyncio.ensure_future(fetch())
+
+        def forget_failure(t):
+            if (t.cancelled() or t.exception() is not None) and entry.get(key) is t:
+                entry.pop(key)
+
+        task.add_done_callback(forget_failure)
+        entry[key] = task
+    # Shielded: one caller cut by its deadline does not cancel the fetch for the others
+    return await asyncio.shield(entry[key])
+
+# Runs each regex over inline script / style / noscript text and every attribute value.
+# One match per hit: the first group when the pattern has one (like re.findall), else the whole match.
+# The patterns hunt URLs, so text without "http" in it is skipped.
+SOURCE_SCAN_JS = '''(patterns) => {
+    const regexes = patterns.map(([source, flags]) => new RegExp(source, flags));
+    const found = regexes.map(() => []);
+    const scan = (text) => {
+        regexes.forEach((re, i) => {
+            for (const m of text.matchAll(re)) found[i].push(m.length > 1 ? m[1] : m[0]);
+        });
+    };
+    document.querySelectorAll('script, style, noscript').forEach(el => {
+        const text = el.textContent;
+        if (text && text.indexOf('http') !== -1) scan(text);
+    });
+    const all = document.getElementsByTagName('*');
+    for (let i = 0; i < all.length; i++) {
+        const attrs = all[i].attributes;
+        for (let j = 0; j < attrs.length; j++) {
+            // Written out as in the HTML (name="value"), so patterns made for the source still match
+            if (attrs[j].value.indexOf('http') !== -1) scan(`${attrs[j].name}="${attrs[j].value}"`);
+        }
+    }
+    return found.flat();
+}'''
+
+def scan_args(patterns):
+    """
+    Compiled Python regexes -> [source, JS flags]. Patterns must use syntax both engines share
+    and have at most one group.
+    """
+    return [[p.pattern, 'gi' if p.flags & re.IGNORECASE else 'g'] for p in patterns]
+
+async def source_matches_async(page, patterns):
+    """
+    Every match of `patterns` (compiled regexes) in the page source, pattern by pattern.
+    Memoized per page and pattern list until invalidated.
+    """
+    key = ("matches",) + tuple(p.pattern for p in patterns)
+    return await _shared_async(page, key, lambda: page.evaluate(SOURCE_SCAN_JS, scan_args(patterns)))
+
+def invalidate(page):
+    """
+    Forget the snapshot and source matches of a page whose DOM just changed (scroll, click, reload).
+    """
+    _cache.pop(page, None)
+
+# === SNAPSHOT HELPERS ===
+
+def marked(snapshot, name):
+    return [snapshot["nodes"][i] for i in snapshot["marks"].get(name, [])]
+
+def page_images(snapshot):
+    """
+    The <img> nodes `document.querySelectorAll('img')` would return (no shadow DOM), in document order.
+    """
+    return [n for n in snapshot["nodes"] if n["tag"] == "img" and not n["shadow"]]
+
+def is_clean(node, keywords):
+    return not any(k in node["bad"] for k in keywords)
+
+def srcset_last(srcset):
+    """
+    Last srcset entry (usually the largest).
+    """
+    parts = srcset.split(',')
+    return parts[-1].strip().split(' ')[0]
+
+def srcset_widest(srcset):
+    """
+    srcset entry with the biggest `w` descriptor (first one on ties).
+    """
+    candidates = []
+    for s in srcset.split(','):
+        parts = s.strip().split()
+        url = parts[0] if parts else ''
+        width = 0
+        if len(parts) > 1 and parts[1].endswith('w'):
+            match = re.match(r'\d+', parts[1])
+            width = int(match.group()) if match else 0
+        candidates.append((url, width))
+    candidates.sort(key=lambda c: -c[1])
+    return candidates[0][0] if candidates else ''
+
+def unique(urls):
+    return list(dict.fromkeys(urls))
@@ -11,11 +11,16 @@ Logic:
 3. Clean URL to generate High-Res version.
 """
 
-from playwright.sync_api import Page
-import re
 import sys
 
-def run_myntra_agent(page: Page):
+from agents.harvest import harvest_async, marked
+from normalize import normalize_all
+
+def background_images(snapshot):
+    # `.image-grid-image` divs -> url from their computed background-image
+    return [div["bg"] for div in marked(snapshot, "myntra_grid") if div["bg"]]
+
+async def run_myntra_agent_async(page):
     """
     Returns: (list_of_urls, strategy_note) or ([], "")
     """
@@ -25,46 +30,15 @@ def run_myntra_agent(page: Page):
 
     # print("[Agent 4] Running Myntra Background-Image strategy...", file=sys.stderr)
 
-    # Evaluate JS to find background images
-    images = page.evaluate('''() => {
-        const gridImages = Array.from(document.querySelectorAll('.image-grid-image'));
-        
-        return gridImages.map(div => {
-            const style = window.getComputedStyle(div);
-            const bg = style.backgroundImage;
-            
-            if (bg && bg.startsWith('url')) {
-                // Extract URL from url("...")
-                const match = bg.match(/url\\(["']?(.*?)["']?\\)/);
-                if (match && match[1]) {
-                    return match[1];
-                }
-            }
-            return null;
-        }).filter(url => url !== null);
-    }''')
+    return finish_myntra(background_images(await harvest_async(page)))
 
+def finish_myntra(images):
     if not images:
         return [], "Myntra Agent found no background images."
 
-    # Process URLs for High-Res
-    high_res_images = []
-    for url in images:
-        # Myntra URL format: https://assets.myntassets.com/h_720,q_90,w_540/v1/...
-        # We want to maximize quality.
-        
-        # Strategy 1: Replace resolution params with higher ones
-        # Common: h_1440,q_90,w_1080 is often supported
-        new_url = re.sub(r'h_\d+,q_\d+,w_\d+', 'h_1440,q_90,w_1080', url)
-        
-        # Strategy 2: If that fails (conceptually), we assume it works or keep original if regex fails.
-        # Actually, sometimes removing them works too, but h_1440 is safer for layout.
-        
-        high_res_images.append(new_url)
+    # High-Res: h_720,q_90,w_540 -> h_1440,q_90,w_1080 (see normalize.py)
+    final_images = normalize_all(images)
 
-    # Filter unique
-    final_images = list(dict.fromkeys(high_res_images))
-    
     if final_images:
         return final_images, "Agent 4 (Myntra Background)"
     
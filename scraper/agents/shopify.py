@@ -12,125 +12,82 @@ Logic:
 4. Maximize resolution (Shopify CDN links usually have `_1024x1024` or similar, we want `master` or strip resolution).
 """
 
-from playwright.sync_api import Page
 import json
-import re
 import sys
 
-def run_shopify_agent(page: Page):
+from agents.harvest import harvest_async, marked, srcset_last, unique
+from normalize import normalize_all
+
+# 2. STRATEGY A: Product JSON (Gold Standard)
+# Most Shopify themes dump the full product data in a JSON script tag.
+# The harvest keeps script[type="application/json"] blobs whose id mentions "product" or that contain "images".
+def product_json_images(snapshot):
+    candidates = []
+
+    for text in snapshot["product_json"]:
+        try:
+            data = json.loads(text)
+        except Exception:
+            continue
+        if not isinstance(data, dict):
+            continue
+
+        # Check standard Shopify Product JSON structure
+        if isinstance(data.get("images"), list):
+            for img in data["images"]:
+                # img can be string or object
+                if isinstance(img, str): candidates.append(img)
+                elif isinstance(img, dict) and img.get("src"): candidates.append(img["src"])
+        if isinstance(data.get("media"), list):
+            for m in data["media"]:
+                if not isinstance(m, dict): continue
+                preview = m.get("preview_image")
+                if isinstance(preview, dict) and preview.get("src"): candidates.append(preview["src"])
+                elif m.get("src"): candidates.append(m["src"])
+
+    # Try Meta object (window.meta.product.images)
+    candidates.extend(u for u in snapshot["meta_images"] if isinstance(u, str))
+
+    return candidates
+
+# 3. STRATEGY B: DOM Extraction (Specific Classes)
+# Common Shopify classes, in priority order (see harvest.MARKS)
+DOM_MARKS = ["shopify_photo", "shopify_media", "shopify_gallery", "shopify_card", "shopify_thumb"]
+
+def dom_images(snapshot):
+    candidates = []
+    for name in DOM_MARKS:
+        for img in marked(snapshot, name):
+            if img["data"].get("src"): candidates.append(img["data"]["src"])
+            # Get last item in srcset (usually largest)
+            elif img["srcset"]: candidates.append(srcset_last(img["srcset"]))
+            elif img["src"]: candidates.append(img["src"])
+    return unique(candidates)
+
+async def run_shopify_agent_async(page):
     """
     Returns: (list_of_urls, strategy_note) or ([], "")
     """
+    return score_shopify(await harvest_async(page))
+
+def score_shopify(snapshot):
     # 1. Detection: Is this Shopify?
-    # We can check global variable window.Shopify
-    is_shopify = page.evaluate("!!window.Shopify")
-    
-    if not is_shopify:
-        # Check source for cdn.shopify.com
-        content = page.content()
-        if "cdn.shopify.com" not in content and "myshopify" not in content:
-            return [], "" # Not Shopify
-            
+    # window.Shopify, or cdn.shopify.com / myshopify in the source (checked in-page by the harvest)
+    if not snapshot["shopify"] and not snapshot["shopify_source"]:
+        return [], "" # Not Shopify
+
     # print("[Agent 6] Running Shopify logic...", file=sys.stderr)
 
-    # 2. STRATEGY A: Product JSON (Gold Standard)
-    # Most Shopify themes dump the full product data in a JSON script tag.
-    # Look for ids like ProductJson-..., product-json, or just search all script tags for a structure.
-    
-    images_from_json = page.evaluate('''() => {
-        const candidates = [];
-        
-        // Try to find product json
-        const scripts = Array.from(document.querySelectorAll('script[type="application/json"]'));
-        for (const s of scripts) {
-            try {
-                if (s.id.toLowerCase().includes('product') || s.innerText.includes('"images":')) {
-                    const data = JSON.parse(s.innerText);
-                    // Check standard Shopify Product JSON structure
-                    if (data.images && Array.isArray(data.images)) {
-                        data.images.forEach(img => {
-                             // img can be string or object
-                             if (typeof img === 'string') candidates.push(img);
-                             else if (img.src) candidates.push(img.src);
-                        });
-                    }
-                    if (data.media && Array.isArray(data.media)) {
-                        data.media.forEach(m => {
-                            if (m.preview_image && m.preview_image.src) candidates.push(m.preview_image.src);
-                            else if (m.src) candidates.push(m.src);
-                        });
-                    }
-                }
-            } catch(e) {}
-        }
-        
-        // Try Meta object
-        if (window.meta && window.meta.product && window.meta.product.images) {
-             window.meta.product.images.forEach(img => candidates.push(img));
-        }
-
-        return candidates;
-    }''')
-    
+    images_from_json = product_json_images(snapshot)
     if images_from_json:
         return clean_shopify_urls(images_from_json), "Agent 6 (Shopify JSON)"
 
-    # 3. STRATEGY B: DOM Extraction (Specific Classes)
-    # Common Shopify classes
-    dom_images = page.evaluate('''() => {
-        const candidates = [];
-        const selectors = [
-            '.product-single__photo', 
-            '.product__media-item img', 
-            '.product-gallery__image',
-            '.grid__item .product-card__image',
-            '[data-product-single-thumbnail]'
-        ];
-        
-        selectors.forEach(sel => {
-            document.querySelectorAll(sel).forEach(img => {
-                if (img.dataset.src) candidates.push(img.dataset.src);
-                else if (img.srcset) {
-                     // Get last item in srcset (usually largest)
-                     const parts = img.srcset.split(',');
-                     const last = parts[parts.length-1].trim().split(' ')[0];
-                     candidates.push(last);
-                }
-                else if (img.src) candidates.push(img.src);
-            });
-        });
-        
-        return [...new Set(candidates)];
-    }''')
-    
-    if dom_images:
-        return clean_shopify_urls(dom_images), "Agent 6 (Shopify DOM)"
+    dom = dom_images(snapshot)
+    if dom:
+        return clean_shopify_urls(dom), "Agent 6 (Shopify DOM)"
 
     return [], ""
 
 def clean_shopify_urls(urls):
-    clean = []
-    for u in urls:
-        if not u: continue
-        # Handle protocol-relative //cdn.shopify...
-        if u.startswith('//'):
-            u = 'https:' + u
-            
-        # Shopify High-Res Logic:
-        # URL often: .../products/my-image_small.jpg?v=...
-        # We want: .../products/my-image.jpg (Master) or .../products/my-image_2048x2048.jpg
-        # Safest is to remove the size suffix _100x100, _small, _large, etc. BUT keep the ID/Name.
-        # Actually in Shopify, removing the underscore-size usually gives original.
-        
-        # Regex to strip size params like _1024x1024 or _large
-        # Pattern match: (_[0-9]+x[0-9]+)|(_small)|(_medium)|(_large)|(_compact) 
-        # occurring before the extension.
-        
-        # Simple cleanup: remove everything after ?v= (version) to keep it clean? No, version is fine.
-        # Remove size:
-        
-        new_u = re.sub(r'(_\d+x\d+)|(_small)|(_medium)|(_large)|(_compact)|(_grande)', '', u)
-        
-        clean.append(new_u)
-        
-    return list(dict.fromkeys(clean)) # unique
+    # Size suffixes (_1024x1024, _small, _grande...) stripped for the master image (see normalize.py)
+    return normalize_all(urls)
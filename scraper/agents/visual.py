@@ -12,74 +12,53 @@ Strategy:
    - If multiple images found, they usually share dimensions or path patterns.
 """
 
-from playwright.sync_api import Page
 import sys
 
-def run_visual_agent(page: Page):
+from agents.harvest import harvest_async, page_images, is_clean, unique
+
+BAD_KEYWORDS = ['related', 'recommend', 'suggest', 'footer', 'nav', 'header', 'instagram', 'social']
+
+def visual_candidates(snapshot):
+    viewport_width = snapshot["viewport"][0]
+    candidates = []
+
+    for img in page_images(snapshot):
+        src = img["src"]
+        if not src or 'svg' in src: continue
+        if not is_clean(img, BAD_KEYWORDS): continue
+
+        top, left, width, height = img["rect"]
+
+        # 1. Must be in top 1500px (Immediate Product Area)
+        if top > 1500: continue
+
+        # 2. Must be VISIBLE
+        if width == 0 or height == 0 or img["display_none"]: continue
+
+        # 3. Must be LARGE (Product images are usually the biggest things in the top fold)
+        if width < 450 or height < 450: continue
+
+        # 4. Center Bias
+        # Distance from horizontal center
+        deviation = abs(left + width / 2 - viewport_width / 2)
+
+        # Big & Center = High Score
+        candidates.append(((width * height) - (deviation * 10), img["current_src"] or src))
+
+    # Sort desc by score
+    candidates.sort(key=lambda c: -c[0])
+
+    return unique(src for _, src in candidates)
+
+async def run_visual_agent_async(page):
     """
     Returns: (list_of_urls, note) or ([], "")
     """
     print("[Agent 3] Visual Analysis started...", file=sys.stderr)
-    
-    candidates = page.evaluate('''() => {
-        const candidates = [];
-        const imgs = Array.from(document.querySelectorAll('img'));
-        const viewportHeight = window.innerHeight;
-        const viewportWidth = window.innerWidth;
-        
-        // Helper: Is clean?
-        function isClean(el) {
-            const badKeywords = ['related', 'recommend', 'suggest', 'footer', 'nav', 'header', 'instagram', 'social'];
-            let curr = el;
-            while (curr && curr !== document.body) {
-                if (curr.id && badKeywords.some(k => curr.id.toLowerCase().includes(k))) return false;
-                if (curr.className && typeof curr.className === 'string' && badKeywords.some(k => curr.className.toLowerCase().includes(k))) return false;
-                curr = curr.parentElement;
-            }
-            return true;
-        }
-
-        imgs.forEach(img => {
-            if (!img.src || img.src.includes('svg')) return;
-            if (!isClean(img)) return;
-
-            const rect = img.getBoundingClientRect();
-            
-            // 1. Must be in top 1500px (Immediate Product Area)
-            if (rect.top > 1500) return;
-            
-            // 2. Must be VISIBLE
-            if (rect.width === 0 || rect.height === 0 || window.getComputedStyle(img).display === 'none') return;
-            
-            // 3. Must be LARGE (Product images are usually the biggest things in the top fold)
-            if (rect.width < 450 || rect.height < 450) return;
-
-            // 4. Center Bias
-            // Distance from horizontal center
-            const centerX = rect.left + rect.width / 2;
-            const deviation = Math.abs(centerX - (viewportWidth / 2));
-            
-            candidates.push({
-                src: img.currentSrc || img.src,
-                width: rect.width,
-                height: rect.height,
-                score: (rect.width * rect.height) - (deviation * 10), // Big & Center = High Score
-                rect: rect
-            });
-        });
-
-        // Sort desc by score
-        candidates.sort((a, b) => b.score - a.score);
-
-        // Dedupe
-        const unique = new Set();
-        return candidates.map(c => c.src).filter(url => {
-            if (unique.has(url)) return false;
-            unique.add(url);
-            return true;
-        });
-    }''')
-    
+
+    return finish_visual(visual_candidates(await harvest_async(page)))
+
+def finish_visual(candidates):
     if candidates:
         final_list = candidates[:5]
         return final_list, f"Visual: Found {len(final_list)} large images in top viewport."
@@ -0,0 +1,406 @@
+# scraper/bench/bench.py
+"""
+OFFLINE EXTRACTION BENCHMARK
+----------------------------
+Runs the scraper against saved product pages, with zero live traffic, so speed AND accuracy
+regressions show up before a deploy.
+
+How it works:
+1. Fixtures: `fixtures/<name>.html` (the saved page) + `fixtures/<name>.json`:
+   {"url": real product URL, "expected": [correct image URLs], "images": [[url substring, w, h], ...]}
+2. Local Stand-In: a context-level route serves the HTML at its REAL URL (so every domain
+   check behaves like production), answers image requests with generated PNGs of the
+   configured size (so naturalWidth checks work), and 404s everything else.
+3. Stages per fixture:
+   - cascade: the full `scrape_page` pipeline (7K -> E-commerce -> Shopify -> Structural -> ...),
+     followed by its per-stage timings (goto, readiness, harvest, agent_*, judge_*).
+   - load + <agent>: each agent alone on a freshly loaded page.
+4. Report: wall time, Playwright protocol calls (one call = one round-trip to the browser),
+   precision / recall against `expected`. URLs are compared without query string by default.
+5. Offline Checks: before any page, the junk word lists (tokens.py) are checked against TOKEN_CASES,
+   real product images that must pass and junk that must not, and the routing table (routing.py)
+   is replayed on a scratch database (check_routing), and the CDN thumb rules (normalize.py) are
+   checked against THUMB_CASES. A wrong verdict fails the run.
+
+Usage:
+    python scraper/bench/bench.py
+    python scraper/bench/bench.py --only amazon,ebay --repeat 3 --json bench.json
+    python scraper/bench/bench.py --checks-only
+"""
+
+import argparse
+import asyncio
+import contextvars
+import inspect
+import json
+import os
+import statistics
+import tempfile
+import struct
+import sys
+import time
+import zlib
+from urllib.parse import urlsplit, urlunsplit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playwright.async_api import async_playwright
+
+from engine import scrape_page, launch_browser, USER_AGENT, ARBITER_MODES
+from resource_policy import ResourcePolicy
+from readiness import wait_until_ready_async
+from timings import Timings
+from tokens import NOISE, JUNK
+from routing import RoutingTable, MIN_RUNS
+from normalize import thumbnail
+from agents.agent_7k import run_agent_7k_async
+from agents.ecommerce import run_ecommerce_agent_async
+from agents.shopify import run_shopify_agent_async
+from agents.structural import run_structural_agent_async
+from agents.context import run_context_agent_async
+from agents.visual import run_visual_agent_async
+from agents.myntra import run_myntra_agent_async
+
+NAME = "BENCH"
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+AGENTS = [
+    ("Agent 7K", run_agent_7k_async),
+    ("Agent 5 (E-commerce)", run_ecommerce_agent_async),
+    ("Agent 6 (Shopify)", run_shopify_agent_async),
+    ("Agent 1 (Structural)", run_structural_agent_async),
+    ("Agent 2 (Context)", run_context_agent_async),
+    ("Agent 3 (Visual)", run_visual_agent_async),
+    ("Agent 4 (Myntra)", run_myntra_agent_async),
+]
+
+# (url, noise judge rejects, Agent 7K junk filter rejects)
+TOKEN_CASES = [
+    # Opaque Amazon image IDs: letters and digits mixed, never words
+    ("https://m.media-amazon.com/images/I/81nAd8U1lWS._SL1500_.jpg", False, False),
+    ("https://m.media-amazon.com/images/I/51e1oFIT9wn._AC_SX679_.jpg", False, False),
+    ("https://m.media-amazon.com/images/I/81cGifQPEvw._SL1500_.jpg", False, False),
+    ("https://cdn.shop.com/files/starter-kit.jpg", False, False),
+    ("https://cdn.shop.com/files/leather-bag_1200x.jpg", False, False),
+    ("https://cdn.shop.com/img/icon48.png", True, True),
+    ("https://cdn.shop.com/img/star-rating.png", True, True),
+    ("https://cdn.shop.com/img/ad-300x250.jpg", True, True),
+    ("https://cdn.shop.com/img/productThumb.jpg", False, True),
+    ("https://cdn.shop.com/img/size-chart.png", False, True),
+]
+
+# (url, its ~100 px rendition or None): the query is never rewritten, dots in it included
+THUMB_CASES = [
+    ("https://cdn.shopify.com/s/files/1/tee_large.jpg?v=1.5", "https://cdn.shopify.com/s/files/1/tee_100x.jpg?v=1.5"),
+    ("https://shop.example.com/cdn/shop/files/tee.png", "https://shop.example.com/cdn/shop/files/tee_100x.png"),
+    ("https://m.media-amazon.com/images/I/81nAd8U1lWS._AC_SX679_.jpg", "https://m.media-amazon.com/images/I/81nAd8U1lWS._SL100_.jpg"),
+    ("https://i.ebayimg.com/images/g/abc/s-l500.jpg", "https://i.ebayimg.com/images/g/abc/s-l140.jpg"),
+    ("https://cdn.example.com/images/tee.jpg", None),
+]
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.avif')
+DEFAULT_IMAGE_SIZE = (1200, 1500)
+
+# === PROTOCOL CALL COUNTER ===
+# Counts client -> browser messages sent while a stage is being measured.
+# Route handling for the stand-in runs outside the stage context and is not counted.
+_stage = contextvars.ContextVar("bench_stage", default=None)
+
+class ProtocolCounter:
+    def __init__(self):
+        self.counts = {}
+        self.installed = False
+
+    def install(self):
+        try:
+            from playwright._impl._connection import Channel
+        except ImportError:
+            print(f"[{NAME}] Playwright internals changed; protocol calls will not be counted.", file=sys.stderr)
+            return
+        for method in ("send", "send_return_as_dict", "send_no_reply"):
+            original = getattr(Channel, method, None)
+            if original:
+                setattr(Channel, method, self._wrap(original))
+        self.installed = True
+
+    def _wrap(self, original):
+        counter = self
+        if inspect.iscoroutinefunction(original):
+            async def wrapped(self, *args, **kwargs):
+                counter._hit()
+                return await original(self, *args, **kwargs)
+        else:
+            def wrapped(self, *args, **kwargs):
+                counter._hit()
+                return original(self, *args, **kwargs)
+        return wrapped
+
+    def _hit(self):
+        stage = _stage.get()
+        if stage is not None:
+            self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    async def measure(self, stage, coro):
+        """
+        Runs coro as `stage`. Returns (result, wall_ms, protocol_calls).
+        """
+        token = _stage.set(stage)
+        self.counts[stage] = 0
+        start = time.perf_counter()
+        try:
+            result = await coro
+        finally:
+            _stage.reset(token)
+        wall_ms = (time.perf_counter() - start) * 1000
+        return result, wall_ms, (self.counts.pop(stage) if self.installed else None)
+
+# === LOCAL STAND-IN ===
+
+_png_cache = {}
+
+def make_png(width, height):
+    """
+    Solid grey PNG of the given size (stdlib only; cached per size).
+    """
+    key = (width, height)
+    if key not in _png_cache:
+        row = b'\x00' + b'\x99' * width # filter byte + grey pixels
+        raw = zlib.compress(row * height, 9)
+        def chunk(kind, data):
+            return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+        _png_cache[key] = (b'\x89PNG\r\n\x1a\n'
+                           + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+                           + chunk(b'IDAT', raw)
+                           + chunk(b'IEND', b''))
+    return _png_cache[key]
+
+def without_fragment(url):
+    return url.split('#', 1)[0]
+
+def image_size(fixture, url):
+    for fragment, width, height in fixture.get("images", []):
+        if fragment in url:
+            return width, height
+    return DEFAULT_IMAGE_SIZE
+
+def stand_in(fixture):
+    """
+    Route handler serving one fixture at its real URL. Nothing ever reaches the network.
+    """
+    page_url = without_fragment(fixture["url"])
+
+    async def handle(route):
+        request = route.request
+        url = without_fragment(request.url)
+        try:
+            if url == page_url:
+                await route.fulfill(status=200, content_type="text/html; charset=utf-8", body=fixture["html"])
+            elif request.resource_type == "image" or urlsplit(url).path.lower().endswith(IMAGE_EXTENSIONS):
+                width, height = image_size(fixture, url)
+                await route.fulfill(status=200, content_type="image/png", body=make_png(width, height))
+            else:
+                await route.fulfill(status=404, body="")
+        except Exception:
+            # Page closed while the request was in flight
+            pass
+
+    return handle
+
+# === SCORING ===
+
+def normalize(url, exact=False):
+    if exact:
+        return url
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, '', ''))
+
+def accuracy(found, expected, exact=False):
+    found_set = {normalize(u, exact) for u in found}
+    expected_set = {normalize(u, exact) for u in expected}
+    hits = len(found_set & expected_set)
+    precision = hits / len(found_set) if found_set else None
+    recall = hits / len(expected_set) if expected_set else None
+    return precision, recall
+
+def load_fixtures(directory, only=None):
+    fixtures = []
+    for file in sorted(os.listdir(directory)):
+        name, ext = os.path.splitext(file)
+        if ext != '.json' or (only and name not in only):
+            continue
+        with open(os.path.join(directory, file), encoding='utf-8') as f:
+            fixture = json.load(f)
+        with open(os.path.join(directory, name + '.html'), encoding='utf-8') as f:
+            fixture["html"] = f.read()
+        fixture["name"] = name
+        fixtures.append(fixture)
+    return fixtures
+
+def check_filters():
+    """
+    Number of TOKEN_CASES the word lists get wrong (each one is printed).
+    """
+    wrong = 0
+    for url, noise, junk in TOKEN_CASES:
+        for label, matcher, expected in (("noise", NOISE, noise), ("junk", JUNK, junk)):
+            if matcher.matches(url) != expected:
+                wrong += 1
+                verdict = f"rejected ('{matcher.find(url)}')" if not expected else "kept"
+                print(f"[{NAME}] Filter case failed: {label} {verdict} {url}", file=sys.stderr)
+    return wrong
+
+def check_routing():
+    """
+    Number of routing verdicts that are wrong (each one is printed). Parallel arbiter, MIN_RUNS scrapes:
+    agent_6 wins every time, agent_1 is accepted every time but loses on priority, agent_2 finds nothing.
+    """
+    wrong = 0
+    with tempfile.TemporaryDirectory() as directory:
+        table = RoutingTable(os.path.join(directory, "routing.sqlite"))
+        url = "https://shop.example.com/p/1"
+        for _ in range(MIN_RUNS):
+            table.record(url, {"agent_6": 100, "agent_1": 120, "agent_2": 90}, "agent_6", {"agent_6", "agent_1"})
+        route = table.route(url)
+        table.close()
+    for agent, allowed in (("agent_6", True), ("agent_1", True), ("agent_2", False)):
+        if route.allows(agent) != allowed:
+            wrong += 1
+            print(f"[{NAME}] Routing case failed: {agent} {'skipped' if allowed else 'kept'} ({route})", file=sys.stderr)
+    return wrong
+
+def check_thumbs():
+    """
+    Number of THUMB_CASES the thumb rules get wrong (each one is printed).
+    """
+    wrong = 0
+    for url, expected in THUMB_CASES:
+        small = thumbnail(url)
+        if small != expected:
+            wrong += 1
+            print(f"[{NAME}] Thumb case failed: {url} -> {small} (expected {expected})", file=sys.stderr)
+    return wrong
+
+# === STAGES ===
+
+async def run_cascade(browser, fixture, counter, arbiter=None):
+    context = await browser.new_context(viewport=None, user_agent=USER_AGENT)
+    await context.route("**/*", stand_in(fixture))
+    try:
+        page = await context.new_page()
+        timings = Timings()
+        result, wall_ms, calls = await counter.measure("cascade", scrape_page(page, fixture["url"], timings, arbiter=arbiter))
+        rows = [{"stage": "cascade", "ms": wall_ms, "calls": calls,
+                 "images": result.get("product_images", []), "strategy": result.get("strategy_used")}]
+        # Where the cascade time went (no protocol counts per sub-stage)
+        for name, ms in timings.stages.items():
+            rows.append({"stage": f"  {name}", "ms": ms, "calls": None, "images": None, "strategy": None})
+        return rows
+    finally:
+        await context.close()
+
+async def run_agent(browser, fixture, counter, label, agent):
+    context = await browser.new_context(viewport=None, user_agent=USER_AGENT)
+    await context.route("**/*", stand_in(fixture))
+    try:
+        page = await context.new_page()
+
+        async def load():
+            await ResourcePolicy(fixture["url"]).install(page)
+            await page.goto(fixture["url"], wait_until='domcontentloaded', timeout=60000)
+            await wait_until_ready_async(page, fixture["url"])
+
+        _, load_ms, load_calls = await counter.measure("load", load())
+        (images, note), wall_ms, calls = await counter.measure(label, agent(page))
+        return [
+            {"stage": f"load ({label})", "ms": load_ms, "calls": load_calls, "images": None, "strategy": None},
+            {"stage": label, "ms": wall_ms, "calls": calls, "images": images or [], "strategy": note},
+        ]
+    finally:
+        await context.close()
+
+async def bench_fixture(browser, fixture, counter, args):
+    runs = []
+    for _ in range(args.repeat):
+        rows = await run_cascade(browser, fixture, counter, args.arbiter)
+        if not args.cascade_only:
+            for label, agent in AGENTS:
+                rows.extend(await run_agent(browser, fixture, counter, label, agent))
+        runs.append(rows)
+
+    # Median wall time / calls across repeats; accuracy from the first run (deterministic fixtures)
+    report = []
+    for i, row in enumerate(runs[0]):
+        ms = statistics.median(r[i]["ms"] for r in runs)
+        calls = row["calls"]
+        if calls is not None:
+            calls = statistics.median(r[i]["calls"] for r in runs)
+        precision, recall = (None, None)
+        if row["images"] is not None:
+            precision, recall = accuracy(row["images"], fixture["expected"], args.exact)
+        report.append({
+            "fixture": fixture["name"], "stage": row["stage"], "ms": round(ms, 1), "calls": calls,
+            "found": None if row["images"] is None else len(row["images"]),
+            "precision": precision, "recall": recall, "strategy": row["strategy"]
+        })
+    return report
+
+def print_report(report):
+    def fmt(value, pattern):
+        return "-" if value is None else pattern.format(value)
+
+    header = f"{'fixture':<10} {'stage':<32} {'ms':>9} {'calls':>6} {'found':>6} {'prec':>6} {'recall':>6}  strategy"
+    print(header)
+    print("-" * len(header))
+    for r in report:
+        print(f"{r['fixture']:<10} {r['stage']:<32} {r['ms']:>9.1f} {fmt(r['calls'], '{:.0f}'):>6} "
+              f"{fmt(r['found'], '{}'):>6} {fmt(r['precision'], '{:.2f}'):>6} {fmt(r['recall'], '{:.2f}'):>6}  {r['strategy'] or ''}")
+
+async def main(args):
+    wrong = check_filters()
+    print(f"[{NAME}] Filter cases: {len(TOKEN_CASES) * 2 - wrong}/{len(TOKEN_CASES) * 2} verdicts right", file=sys.stderr)
+    routing_wrong = check_routing()
+    print(f"[{NAME}] Routing cases: {3 - routing_wrong}/3 verdicts right", file=sys.stderr)
+    wrong += routing_wrong
+    thumbs_wrong = check_thumbs()
+    print(f"[{NAME}] Thumb cases: {len(THUMB_CASES) - thumbs_wrong}/{len(THUMB_CASES)} verdicts right", file=sys.stderr)
+    wrong += thumbs_wrong
+    if args.checks_only:
+        return 1 if wrong else 0
+
+    only = set(args.only.split(',')) if args.only else None
+    fixtures = load_fixtures(args.fixtures, only)
+    if not fixtures:
+        print(f"[{NAME}] No fixtures found in {args.fixtures}", file=sys.stderr)
+        return 1
+
+    counter = ProtocolCounter()
+    counter.install()
+
+    report = []
+    async with async_playwright() as p:
+        browser = await launch_browser(p)
+        try:
+            for fixture in fixtures:
+                print(f"[{NAME}] {fixture['name']} ({fixture['url']})", file=sys.stderr)
+                report.extend(await bench_fixture(browser, fixture, counter, args))
+        finally:
+            await browser.close()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 1 if wrong else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline extraction benchmark (fixtures served locally).")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Fixture directory (<name>.html + <name>.json)")
+    parser.add_argument("--only", help="Comma-separated fixture names, e.g. amazon,ebay")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per fixture; wall time is the median")
+    parser.add_argument("--cascade-only", action="store_true", help="Skip the per-agent stages")
+    parser.add_argument("--exact", action="store_true", help="Compare URLs including the query string")
+    parser.add_argument("--arbiter", choices=ARBITER_MODES, help="How the cascade runs its fallback agents (default: SCRAPER_ARBITER)")
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    parser.add_argument("--checks-only", action="store_true", help="Only run the offline checks: word lists, routing, thumb rules (no browser)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,273 @@
+# scraper/browser_pool.py
+"""
+BROWSER POOL (MEMORY-BOUNDED)
+-----------------------------
+Owns the Firefox instance of a long-lived worker and keeps its memory in check.
+Long-running Firefox leaks, so nothing here lives forever.
+
+Policy:
+1. Max Concurrency: At most N pages are open at the same time (extra callers wait).
+2. Context Recycling: A context serves K pages, then it is closed (K=1 = fresh context per job).
+   A page leased with a saved session (storage_state) gets a context of its own, closed after the job.
+3. Browser Restart: After M jobs, or when the browser's RSS passes a ceiling (drains in-flight pages first).
+4. Health Probe: Browser connected + a blank page can still run JS.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+
+try:
+    from timings import Timings
+except ImportError:
+    sys.path.append('scraper')
+    from timings import Timings
+
+NAME = "BROWSER_POOL"
+
+def process_tree_rss_mb(root_pid=None):
+    """
+    Resident memory (MB) of every process below `root_pid` (Playwright driver + Firefox).
+    Reads /proc directly so it needs no extra dependency. Returns 0 where /proc does not exist.
+    """
+    root_pid = root_pid or os.getpid()
+    try:
+        pids = [int(d) for d in os.listdir('/proc') if d.isdigit()]
+    except OSError:
+        return 0
+
+    children = {}
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                # The command name may contain spaces/parens, so split after the last ')'
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            children.setdefault(ppid, []).append(pid)
+        except (OSError, IndexError, ValueError):
+            continue
+
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    total = 0
+    stack = list(children.get(root_pid, []))
+    while stack:
+        pid = stack.pop()
+        stack.extend(children.get(pid, []))
+        try:
+            with open(f'/proc/{pid}/statm') as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+
+    return round(total / (1024 * 1024), 1)
+
+class BrowserPool:
+    def __init__(self, playwright, launch, context_options=None, max_concurrency=1,
+                 pages_per_context=1, jobs_per_browser=100, max_rss_mb=1500):
+        """
+        playwright = async Playwright instance
+        launch = async callable(playwright) -> Browser (so the pool can relaunch it)
+        """
+        self.playwright = playwright
+        self.launch = launch
+        self.context_options = context_options or {}
+        self.max_concurrency = max_concurrency
+        self.pages_per_context = pages_per_context
+        self.jobs_per_browser = jobs_per_browser
+        self.max_rss_mb = max_rss_mb
+
+        self.browser = None
+        self.generation = 0      # Bumped on every launch; leases from an older browser are never reused
+        self.idle = []           # [context, pages_served, generation] ready for reuse
+        self.active = 0
+        self.jobs_since_launch = 0
+        self.total_jobs = 0
+        self.restarts = 0
+
+        self._slots = asyncio.Semaphore(max_concurrency)
+        # Guards the counters and the restart / relaunch flags only. Launching Firefox, creating and
+        # closing contexts happen OUTSIDE it: a slow relaunch must not block releases of healthy pages.
+        # New leases wait here while the browser drains for a restart or is being relaunched.
+        self._state = asyncio.Condition()
+        self._restart_reason = None
+        self._relaunching = False
+
+    @asynccontextmanager
+    async def page(self, timings=None, storage_state=None):
+        """
+        Leases a fresh page (waits while all `max_concurrency` slots are busy).
+        The context it lives in is recycled or closed on release; with `storage_state` (cookies +
+        localStorage, see sessions.py) it is a new context opened with that state and never recycled,
+        so one domain's session never leaks into another's scrape. When the browser hits its
+        job or memory ceiling, new leases wait until in-flight pages finish and Firefox is restarted.
+        With `timings`, records queue_wait, browser_launch / context_create (only when they happen) and page_create.
+        """
+        timings = timings or Timings()
+        waited = time.perf_counter()
+        async with self._slots:
+            # Reserve: a slot, and an idle context if there is one
+            async with self._state:
+                relaunch = await self._claim_browser()
+                timings.add("queue_wait", (time.perf_counter() - waited) * 1000)
+                lease = self.idle.pop() if self.idle and not storage_state and not relaunch else None
+                self.active += 1
+
+            # Work: launch / context creation, lock released
+            try:
+                if relaunch:
+                    with timings.stage("browser_launch"):
+                        await self._relaunch()
+                if lease is None:
+                    with timings.stage("context_create"):
+                        options = dict(self.context_options, storage_state=storage_state) if storage_state else self.context_options
+                        context = await self.browser.new_context(**options)
+                    lease = [context, self.pages_per_context if storage_state else 0, self.generation]
+            except BaseException:
+                async with self._state:
+                    self.active -= 1
+                    self._state.notify_all()
+                raise
+
+            page = None
+            try:
+                with timings.stage("page_create"):
+                    page = await lease[0].new_page()
+                yield page
+            finally:
+                lease[1] += 1
+                await self._release(lease, page)
+                async with self._state:
+                    self.active -= 1
+                    self.jobs_since_launch += 1
+                    self.total_jobs += 1
+                    restart = self._due_restart()
+                    self._state.notify_all()
+                if restart:
+                    try:
+                        await self._relaunch(restart)
+                    except Exception as e:
+                        # The next lease launches it again
+                        print(f"[{NAME}] Browser restart failed: {e}", file=sys.stderr)
+
+    async def health(self, probe=False):
+        """
+        Cheap counters by default. probe=True also checks that the browser can still run JS.
+        """
+        connected = bool(self.browser and self.browser.is_connected())
+        status = {
+            "ok": connected,
+            "connected": connected,
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "idle_contexts": len(self.idle),
+            "jobs_since_launch": self.jobs_since_launch,
+            "total_jobs": self.total_jobs,
+            "browser_restarts": self.restarts,
+            "rss_mb": process_tree_rss_mb()
+        }
+        if probe:
+            status["ok"] = await self._probe()
+        return status
+
+    async def close(self):
+        await self._close_browser()
+
+    async def _probe(self):
+        try:
+            async with self._state:
+                relaunch = await self._claim_browser()
+            if relaunch:
+                await self._relaunch()
+            context = await self.browser.new_context()
+            try:
+                page = await context.new_page()
+                return await page.evaluate("() => 1 + 1") == 2
+            finally:
+                await context.close()
+        except Exception as e:
+            print(f"[{NAME}] Health probe failed: {e}", file=sys.stderr)
+            return False
+
+    async def _claim_browser(self):
+        """
+        Under the lock: waits out a pending restart / relaunch. True when the browser is missing or
+        dead and the caller now owns its relaunch (it must call _relaunch, outside the lock).
+        """
+        await self._state.wait_for(lambda: self._restart_reason is None and not self._relaunching)
+        if self.browser and self.browser.is_connected():
+            return False
+        self._relaunching = True
+        return True
+
+    def _due_restart(self):
+        """
+        Under the lock, after a release: the restart reason when the browser hit a ceiling and this was
+        the last page out (the caller then owns the restart), else None.
+        """
+        if self._restart_reason is None:
+            if self.jobs_since_launch >= self.jobs_per_browser:
+                self._restart_reason = f"{self.jobs_since_launch} jobs served"
+            else:
+                rss = process_tree_rss_mb()
+                if self.max_rss_mb and rss > self.max_rss_mb:
+                    self._restart_reason = f"RSS {rss}MB > {self.max_rss_mb}MB"
+
+        # Drain first: only the last page out restarts the browser
+        if self._restart_reason and self.active == 0 and not self._relaunching:
+            self._relaunching = True
+            return self._restart_reason
+        return None
+
+    async def _relaunch(self, reason=None):
+        """
+        Outside the lock: closes the old browser (if any) and launches a new one, then publishes it.
+        New leases wait on `_relaunching` meanwhile; releases of in-flight pages go on.
+        """
+        browser = None
+        try:
+            if reason:
+                print(f"[{NAME}] Restarting browser ({reason})...", file=sys.stderr)
+            elif self.browser:
+                print(f"[{NAME}] Browser disconnected. Relaunching...", file=sys.stderr)
+            if self.browser:
+                await self._close_browser()
+                self.restarts += 1
+            browser = await self.launch(self.playwright)
+        finally:
+            async with self._state:
+                self.browser = browser
+                if browser:
+                    self.generation += 1
+                    self.jobs_since_launch = 0
+                self._restart_reason = None
+                self._relaunching = False
+                self._state.notify_all()
+
+    async def _release(self, lease, page):
+        context, served, generation = lease
+        try:
+            if page:
+                await page.close()
+            if (served < self.pages_per_context and self._restart_reason is None and not self._relaunching
+                    and generation == self.generation):
+                self.idle.append(lease)
+                return
+            await context.close()
+        except Exception:
+            # Browser went away mid-job; the next lease relaunches it
+            pass
+
+    async def _close_browser(self):
+        idle, self.idle = self.idle, []
+        browser, self.browser = self.browser, None
+        for context, _, _ in idle:
+            try:
+                await context.close()
+            except Exception:
+                pass
+        if browser:
+            try:
+                await browser.close()
+            except Exception:
+                pass
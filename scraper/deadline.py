@@ -0,0 +1,108 @@
+# scraper/deadline.py
+"""
+DEADLINE SCHEDULER
+------------------
+One time budget per scrape (engine.TOTAL_BUDGET_MS, or `budget_ms` sent by the API).
+The scrape always answers inside it, with whatever it has found so far.
+
+How the budget is spent:
+1. Time Slice: a stage may use the time left MINUS what the stages after it are expected to need
+   (`reserve_ms`), so one slow agent cannot starve the rest of the cascade. It always gets at
+   least its own expected cost: earlier (higher priority) stages win when time is short.
+2. Skip: an optional stage (agent) whose expected cost is more than the time left is not started.
+3. Cut: a stage that overruns its slice is cancelled.
+Both raise DeadlineExceeded; the engine moves on to the next agent that still fits.
+
+Expected costs start from EXPECTED_COST_MS and follow what this process actually measures
+(moving average of the stage timings of finished scrapes, see observe()).
+"""
+
+import asyncio
+import time
+
+# Starting guesses (ms). Cascade agents only score the harvest snapshot in Python, so they are cheap;
+# Agent 7K may scroll, read the page source or reload.
+EXPECTED_COST_MS = {
+    "stabilize": 300,
+    "block_check": 50,
+    "harvest": 500,
+    "agent_7k": 2000,
+    "probe": 300, # Ranged GETs of the judged images (probe.py)
+    "dedup": 400, # ~100 px CDN renditions + header range reads (like probe), tiny decodes (dedup.py)
+}
+DEFAULT_COST_MS = 100
+
+SMOOTHING = 0.2 # Weight of the newest measurement in the moving average
+
+_learned = {}
+
+def expected_cost(stage):
+    return _learned.get(stage, EXPECTED_COST_MS.get(stage, DEFAULT_COST_MS))
+
+def reserve_for(stages):
+    """
+    Time to keep aside for `stages` that still have to run.
+    """
+    return sum(expected_cost(s) for s in stages)
+
+def observe(stages):
+    """
+    Feeds the stage timings of a finished scrape ({"goto": 1820.4, ...}) into the expected costs.
+    """
+    for stage, ms in stages.items():
+        previous = _learned.get(stage)
+        _learned[stage] = ms if previous is None else previous + SMOOTHING * (ms - previous)
+
+class DeadlineExceeded(Exception):
+    def __init__(self, stage, reason):
+        super().__init__(f"{stage} {reason}")
+        self.stage = stage
+        self.reason = reason
+
+class Deadline:
+    def __init__(self, budget_ms):
+        self.budget_ms = budget_ms
+        self.started = time.perf_counter()
+        self.skipped = []
+        self.cut = []
+
+    def remaining_ms(self):
+        return max(0.0, self.budget_ms - (time.perf_counter() - self.started) * 1000)
+
+    def expired(self):
+        return self.remaining_ms() <= 0
+
+    def slice_ms(self, reserve_ms=0):
+        return max(0.0, self.remaining_ms() - reserve_ms)
+
+    async def run(self, stage, coro, reserve_ms=0, required=False, timings=None):
+        """
+        Awaits `coro` inside its time slice.
+        Optional stages are skipped up front when their expected cost does not fit;
+        required ones (load, harvest) always start and are only cut.
+        With `timings`, the time spent is recorded under `stage` (skipped stages record nothing).
+        """
+        remaining = self.remaining_ms()
+        cost = expected_cost(stage)
+        if not required and cost > remaining:
+            coro.close()
+            self.skipped.append(stage)
+            raise DeadlineExceeded(stage, "skipped")
+        slice_ms = min(remaining, max(cost, remaining - reserve_ms))
+        started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(coro, slice_ms / 1000)
+        except asyncio.TimeoutError:
+            self.cut.append(stage)
+            raise DeadlineExceeded(stage, "cut")
+        finally:
+            if timings is not None:
+                timings.add(stage, (time.perf_counter() - started) * 1000)
+
+    def as_dict(self):
+        return {
+            "budget_ms": self.budget_ms,
+            "remaining_ms": round(self.remaining_ms(), 1),
+            "skipped": self.skipped,
+            "cut": self.cut
+        }
@@ -0,0 +1,156 @@
+# scraper/dedup.py
+"""
+NEAR-DUPLICATE IMAGE DEDUP (PERCEPTUAL HASH)
+--------------------------------------------
+The agents dedupe by exact URL only. Galleries serve the same photo at several sizes or from
+several CDN hosts, and those reach the output as separate images. This stage looks at the pixels:
+
+1. Hash: the image is never downloaded in full. Its CDN's ~100 px rendition (normalize.thumbnail:
+   Amazon `_SL100_`, Shopify `_100x`, ...) is fetched over the shared keep-alive pool,
+   DEDUP_CONCURRENCY at a time, and turned into a 64-bit dHash: 9x8 grayscale, one bit per
+   "left pixel brighter than right pixel".
+2. Size: the real width x height comes from the image header (probe.py ranged GET, a few KB).
+3. Group: images whose hashes differ in at most MAX_DISTANCE bits AND whose aspect ratios match
+   (within ASPECT_TOLERANCE) are the same photo. Product shots on a plain white background hash
+   close together, so the threshold is tight and a different crop never merges.
+4. Keep: the highest-resolution member of each group, at the position of the group's first image.
+
+Hashes are cached per URL (in memory, HASH_CACHE_SIZE entries), so a gallery we have seen before
+costs nothing. Images without a thumb rule, or that cannot be fetched or decoded, are kept as they are.
+Needs Pillow; without it (or with SCRAPER_DEDUP=off) results are returned unchanged.
+"""
+
+import asyncio
+import io
+import os
+import sys
+from collections import OrderedDict
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    from normalize import thumbnail
+    from probe import ImageProbe
+except ImportError:
+    sys.path.append('scraper')
+    from normalize import thumbnail
+    from probe import ImageProbe
+
+NAME = "DEDUP"
+
+DEDUP_ENABLED = os.environ.get("SCRAPER_DEDUP", "on").lower() not in ("off", "0", "false")
+if DEDUP_ENABLED and Image is None:
+    print(f"[{NAME}] Pillow is not installed; near-duplicate dedup is disabled.", file=sys.stderr)
+    DEDUP_ENABLED = False
+
+HASH_SIZE = 8          # 8x8 = 64-bit hash
+MAX_DISTANCE = 4       # Hamming distance (of 64 bits) still counted as the same photo
+ASPECT_TOLERANCE = 0.03
+MAX_THUMB_BYTES = 256 * 1024
+DEDUP_CONCURRENCY = 4  # Matches http_pool.MAX_IDLE_PER_HOST
+HASH_TIMEOUT_S = 5
+HASH_CACHE_SIZE = 5000
+
+def dhash(data):
+    """
+    Returns the 64-bit hash of encoded image bytes; raises on undecodable data.
+    """
+    image = Image.open(io.BytesIO(data))
+    # JPEG: let the decoder scale down by up to 8x instead of decoding every pixel
+    image.draft("L", (HASH_SIZE * 4, HASH_SIZE * 4))
+    small = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+def distance(a, b):
+    return bin(a ^ b).count("1")
+
+def same_shape(a, b):
+    """
+    True when two (width, height) sizes have the same aspect ratio, or either is unknown.
+    """
+    if not a or not b or not a[1] or not b[1]:
+        return True
+    ratio_a, ratio_b = a[0] / a[1], b[0] / b[1]
+    return abs(ratio_a - ratio_b) <= ASPECT_TOLERANCE * max(ratio_a, ratio_b)
+
+class ImageDedup:
+    """
+    dedup = ImageDedup(http_pool, probe)
+    images = await dedup.dedupe(images)
+    """
+    def __init__(self, pool, probe=None, concurrency=DEDUP_CONCURRENCY):
+        self.pool = pool
+        self.probe = probe or ImageProbe(pool)
+        self.slots = asyncio.Semaphore(concurrency)
+        self.cache = OrderedDict() # url -> (hash, (width, height) or None)
+
+    async def thumb_hash(self, small):
+        """
+        dHash of the small rendition, or None when it cannot be fetched or decoded.
+        """
+        async with self.slots:
+            try:
+                response = await self.pool.get_async(small, HASH_TIMEOUT_S, max_bytes=MAX_THUMB_BYTES)
+                if response.status != 200 or len(response.body) >= MAX_THUMB_BYTES:
+                    return None
+                return await asyncio.to_thread(dhash, response.body)
+            except Exception:
+                return None
+
+    async def fingerprint(self, url):
+        """
+        (hash, (width, height) or None) or None when the image has no small rendition or it
+        cannot be fetched or decoded.
+        """
+        if url in self.cache:
+            self.cache.move_to_end(url)
+            return self.cache[url]
+        if not url.startswith(('http://', 'https://')):
+            return None
+        small = thumbnail(url)
+        if not small:
+            return None
+        bits, (_, size) = await asyncio.gather(self.thumb_hash(small), self.probe.measure(url))
+        if bits is None:
+            return None
+        found = (bits, size)
+        self.cache[url] = found
+        if len(self.cache) > HASH_CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return found
+
+    async def dedupe(self, urls):
+        """
+        One image per group of near-duplicates: the biggest one, in the group's first position.
+        """
+        if len(urls) < 2:
+            return list(urls)
+        prints = await asyncio.gather(*(self.fingerprint(u) for u in urls))
+
+        groups = [] # [hash and size of first member, [(pixels, url), ...]] in first-seen order
+        for url, found in zip(urls, prints):
+            if not found:
+                groups.append([None, [(0, url)]])
+                continue
+            bits, size = found
+            pixels = size[0] * size[1] if size else 0
+            group = next((g for g in groups if g[0] is not None
+                          and distance(g[0][0], bits) <= MAX_DISTANCE and same_shape(g[0][1], size)), None)
+            if group:
+                group[1].append((pixels, url))
+            else:
+                groups.append([found, [(pixels, url)]])
+
+        kept = [max(members, key=lambda m: m[0])[1] for _, members in groups]
+        if len(kept) < len(urls):
+            print(f"[{NAME}] {len(urls)} images -> {len(kept)} after near-duplicate dedup.", file=sys.stderr)
+        return kept
@@ -0,0 +1,509 @@
+# scraper/engine.py
+"""
+ASYNC SCRAPE ENGINE
+-------------------
+Drives many product pages at once from ONE Firefox (asyncio + Playwright async API).
+Each URL still gets its own browser context; the BrowserPool semaphore caps how many run together.
+
+- Engine.scrape(url, budget_ms, events): One URL -> response dict (the same JSON `scraper.py <url>` prints), inside the time budget.
+  Tries the browser-free fast path (fastpath.py) first; the browser only runs when it finds nothing.
+  Near-duplicate images in the result are merged (dedup.py).
+  The browser context reuses the domain's saved cookies / localStorage (sessions.py).
+  Progress (page loaded, each agent's judged images) goes to `events` as it happens (events.py).
+- Engine.scrape_many(urls): Yields results as they finish, `concurrency` pages in flight.
+- scrape_page(page, url, timings, deadline): The agent cascade itself (7K -> E-commerce -> Shopify -> Structural -> Context -> Visual -> Myntra).
+"""
+
+import asyncio
+import os
+import sys
+from playwright.async_api import async_playwright
+
+NAME = "MAIN_ORCHESTRATOR"
+
+# Agents
+try:
+    from agents.structural import run_structural_agent_async
+    from agents.context import run_context_agent_async
+    from agents.visual import run_visual_agent_async
+    from agents.myntra import run_myntra_agent_async
+    from agents.ecommerce import run_ecommerce_agent_async
+    from agents.shopify import run_shopify_agent_async
+    from agents.agent_7k import run_agent_7k_async
+    from judges import final_judgment
+    from browser_pool import BrowserPool
+    from resource_policy import ResourcePolicy
+    from readiness import wait_until_ready_async, wait_for_quiet_async, profile_for as readiness_profile
+    from agents.harvest import harvest_async
+    from timings import Timings
+    from deadline import Deadline, DeadlineExceeded, expected_cost, reserve_for, observe
+    from routing import RoutingTable, Route, domain_of, ENABLED as ROUTING_ENABLED
+    from http_pool import HttpPool
+    from fastpath import fast_scrape, FASTPATH_ENABLED, TIMEOUT_MS as FASTPATH_TIMEOUT_MS
+    from probe import ImageProbe, PROBE_ENABLED
+    from dedup import ImageDedup, DEDUP_ENABLED
+    from sessions import SessionStore, ENABLED as SESSIONS_ENABLED
+    from events import SILENT
+except ImportError:
+    sys.path.append('scraper')
+    from agents.structural import run_structural_agent_async
+    from agents.context import run_context_agent_async
+    from agents.visual import run_visual_agent_async
+    from agents.myntra import run_myntra_agent_async
+    from agents.ecommerce import run_ecommerce_agent_async
+    from agents.shopify import run_shopify_agent_async
+    from agents.agent_7k import run_agent_7k_async
+    from judges import final_judgment
+    from browser_pool import BrowserPool
+    from resource_policy import ResourcePolicy
+    from readiness import wait_until_ready_async, wait_for_quiet_async, profile_for as readiness_profile
+    from agents.harvest import harvest_async
+    from timings import Timings
+    from deadline import Deadline, DeadlineExceeded, expected_cost, reserve_for, observe
+    from routing import RoutingTable, Route, domain_of, ENABLED as ROUTING_ENABLED
+    from http_pool import HttpPool
+    from fastpath import fast_scrape, FASTPATH_ENABLED, TIMEOUT_MS as FASTPATH_TIMEOUT_MS
+    from probe import ImageProbe, PROBE_ENABLED
+    from dedup import ImageDedup, DEDUP_ENABLED
+    from sessions import SessionStore, ENABLED as SESSIONS_ENABLED
+    from events import SILENT
+
+# Config
+TOTAL_BUDGET_MS = 570000 # 9.5 minutes (Leave buffer for Node timeout). Default when the API sends no budget_ms.
+NAV_TIMEOUT_MS = 60000
+SESSION_SAVE_TIMEOUT_MS = 2000 # Reading cookies back is quick; a hung browser must not hold the answer
+
+# How the fallback agents (after 7K) are run:
+# - cascade: one after another, each waits for the previous one to fail (default)
+# - parallel: all at once, the highest-priority accepted result wins (same answer, worst case ~ slowest agent)
+# - latency: all at once, the first accepted result wins
+ARBITER_MODES = ("cascade", "parallel", "latency")
+ARBITER_MODE = os.environ.get("SCRAPER_ARBITER", "cascade")
+if ARBITER_MODE not in ARBITER_MODES:
+    ARBITER_MODE = "cascade"
+
+# Browser Pool Limits (the Node gateway sets these, see shared/config.js)
+# MAX_CONTEXTS is also how many URLs one process scrapes at the same time.
+MAX_CONTEXTS = int(os.environ.get("SCRAPER_MAX_CONTEXTS", "1"))
+PAGES_PER_CONTEXT = int(os.environ.get("SCRAPER_PAGES_PER_CONTEXT", "1"))
+JOBS_PER_BROWSER = int(os.environ.get("SCRAPER_JOBS_PER_BROWSER", "100"))
+MAX_BROWSER_RSS_MB = int(os.environ.get("SCRAPER_MAX_RSS_MB", "1500"))
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+HTTP_HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9"
+}
+
+# Fallback cascade, in priority order: (label, agent, judge name)
+CASCADE = [
+    ("Agent 6 (Shopify)", run_shopify_agent_async, "Agent 6"),
+    ("Agent 1 (Structural)", run_structural_agent_async, "Agent 1"),
+    ("Agent 2 (Context)", run_context_agent_async, "Agent 2"),
+    ("Agent 3 (Visual)", run_visual_agent_async, "Agent 3"),
+    ("Agent 4 (Myntra)", run_myntra_agent_async, "Agent 4"),
+]
+
+async def launch_browser(p):
+    # === FIREFOX LAUNCH (HEADLESS) ===
+    # Firefox Headless bypasses AJIO rules that block Chrome Headless.
+    # This is "Production Ready" (Invisible).
+    return await p.firefox.launch(
+        headless=True,
+        args=[
+            "--no-remote",
+            "--disable-dev-shm-usage", # Critical for Docker OOM
+            "--disable-background-networking",
+            "--disable-gpu"
+        ]
+    )
+
+async def stabilize_page(page):
+    try:
+        await page.mouse.move(100, 100)
+        await wait_for_quiet_async(page)
+    except Exception:
+        pass
+
+async def extract_page_context(page):
+    # First harvest of the page: every agent after this scores the same snapshot
+    snapshot = await harvest_async(page)
+    return {"title": snapshot["title"], "h1": snapshot["h1"], "url": snapshot["url"]}
+
+def stage_key(judge_name):
+    # "Agent 6" -> "agent_6", "Agent 7K" -> "agent_7k"
+    return judge_name.lower().replace(' ', '_')
+
+async def judged_agent(page, page_ctx, agent, judge_name, timings, deadline, runs, reserve_ms=0, probe=None, events=SILENT, hits=None):
+    """
+    One cascade step: the agent, the judges, then (with `probe`) the real image sizes.
+    Returns (judged_images, agent_note); ([], "") when the agent found nothing, was rejected,
+    or did not fit the deadline.
+    An agent that ran to the end is added to `runs` ({stage key: ms}, for the routing table)
+    and reported as an `agent_result` event; one whose images were accepted also to `hits`.
+    """
+    key = stage_key(judge_name)
+    events.send("agent_started", agent=judge_name)
+    try:
+        candidates, agent_note = await deadline.run(key, agent(page), reserve_ms, timings=timings)
+    except DeadlineExceeded:
+        return [], ""
+    runs[key] = timings.stages[key]
+    if not candidates:
+        events.send("agent_result", agent=judge_name, candidates=0, images=[])
+        return [], ""
+    with timings.stage(f"judge_{key}"):
+        judged = final_judgment(page_ctx, list(candidates), judge_name)
+    if judged and probe:
+        try:
+            judged = await deadline.run("probe", probe.filter(judged), reserve_ms, timings=timings)
+        except DeadlineExceeded:
+            pass # No time to measure: keep what the judges approved
+    if judged and hits is not None:
+        hits.add(key)
+    events.send("agent_result", agent=judge_name, candidates=len(candidates), images=judged)
+    return judged, agent_note
+
+async def run_cascade(page, page_ctx, cascade, timings, deadline, runs, probe=None, events=SILENT):
+    """
+    Sequential arbiter: one agent at a time, in priority order, until one is accepted.
+    Returns (images, label, note) or None.
+    """
+    keys = [stage_key(judge_name) for _, _, judge_name in cascade]
+    for i, (label, agent, judge_name) in enumerate(cascade):
+        judged, agent_note = await judged_agent(page, page_ctx, agent, judge_name, timings, deadline, runs, reserve_for(keys[i + 1:]), probe, events)
+        if judged:
+            return judged, label, agent_note
+    return None
+
+async def run_parallel(page, page_ctx, cascade, timings, deadline, runs, latency_first=False, probe=None, events=SILENT, hits=None):
+    """
+    Parallel arbiter: all agents start at once on the same page (and the same harvest snapshot).
+    - parallel: the accepted result of the highest-priority agent (same answer as run_cascade).
+    - latency: the first accepted result to come back (ties go to the higher priority).
+    Returns (images, label, note) or None. Agents still running are cancelled.
+    `hits` collects every agent whose images were accepted, including the ones that lost on priority.
+    """
+    # Insertion order = priority order
+    tasks = {}
+    for label, agent, judge_name in cascade:
+        task = asyncio.ensure_future(judged_agent(page, page_ctx, agent, judge_name, timings, deadline, runs, probe=probe, events=events, hits=hits))
+        # Losers may fail after we stopped listening
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        tasks[task] = label
+
+    try:
+        if not latency_first:
+            for task, label in tasks.items():
+                judged, agent_note = await task
+                if judged:
+                    return judged, label, agent_note
+            return None
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in [t for t in tasks if t in done]:
+                judged, agent_note = task.result()
+                if judged:
+                    return judged, tasks[task], agent_note
+        return None
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+# Stages after the load, in order (see deadline.reserve_for). Navigation only reserves the
+# required ones (block check + harvest); the readiness wait also leaves room for the rest.
+AFTER_LOAD = ["stabilize", "block_check", "harvest", "agent_7k"]
+REQUIRED_AFTER_LOAD = ["block_check", "harvest"]
+
+async def scrape_page(page, target_url, timings=None, deadline=None, arbiter=None, routing=None, runs=None, probe=None, events=SILENT):
+    """
+    Runs the full agent cascade on a fresh page and returns the response dict.
+    Stage durations go into `timings` (see timings.py); the caller attaches them to the result.
+    Every stage runs inside `deadline` (see deadline.py): agents that no longer fit are skipped
+    and the best result found so far is returned before the budget runs out.
+    `arbiter` (default ARBITER_MODE) picks how the fallback agents are run, see ARBITER_MODES.
+    `routing` (a routing.RoutingTable) reorders / prunes the agents per domain and learns from the outcome;
+    without it every domain gets the default order.
+    `runs` seeds the routing outcome with stages that ran before the page (the fast path).
+    `probe` (a probe.ImageProbe) drops judged images that are really thumbnails (see probe.py).
+    `events` (an events.ScrapeEvents) gets page_loaded / agent_started / agent_result as they happen.
+    """
+    timings = timings or Timings()
+    deadline = deadline or Deadline(TOTAL_BUDGET_MS)
+    arbiter = arbiter or ARBITER_MODE
+
+    # Init Response
+    response = {
+        "source_url": target_url,
+        "strategy_used": "None",
+        "total_images": 0,
+        "product_images": [],
+        "note": ""
+    }
+
+    # Load (fonts, media, trackers and - per domain - images never leave the browser)
+    policy = await ResourcePolicy(target_url).install(page)
+    try:
+        nav_ms = min(NAV_TIMEOUT_MS, deadline.slice_ms(reserve_for(REQUIRED_AFTER_LOAD)))
+        if nav_ms <= 0:
+            response["note"] = "Deadline reached before navigation."
+            return response
+        with timings.stage("goto"):
+            await page.goto(target_url, wait_until='domcontentloaded', timeout=nav_ms)
+        # Readiness never waits past the time the rest of the scrape needs
+        cap_ms = min(readiness_profile(target_url)["cap_ms"], deadline.slice_ms(reserve_for(AFTER_LOAD)))
+        with timings.stage("readiness"):
+            ready = await wait_until_ready_async(page, target_url, cap_ms=cap_ms)
+        print(f"[{NAME}] Page ready ({ready}).", file=sys.stderr)
+        events.send("page_loaded", url=page.url, ready=ready, ms=round(timings.stages["goto"] + timings.stages["readiness"], 1))
+    except Exception as e:
+        response["note"] = f"Navigation Failed: {str(e)[:50]}"
+        return response
+    finally:
+        policy.log()
+
+    try:
+        await deadline.run("stabilize", stabilize_page(page), reserve_for(REQUIRED_AFTER_LOAD), timings=timings)
+    except DeadlineExceeded:
+        pass
+
+    # Quick Post-Load Check (Blocking Detection)
+    try:
+        page_title = await deadline.run("block_check", page.title(), reserve_for(["harvest"]), required=True, timings=timings)
+    except DeadlineExceeded:
+        response["note"] = "Deadline reached during block_check."
+        return response
+    if "Access Denied" in page_title or "Robot Check" in page_title or "CAPTCHA" in page_title:
+        response["note"] = "BLOCKED_BY_AMAZON_CAPTCHA"
+        return response
+
+    # === CONTEXT ===
+    try:
+        page_ctx = await deadline.run("harvest", extract_page_context(page), required=True, timings=timings)
+    except DeadlineExceeded:
+        response["note"] = "Deadline reached during harvest."
+        return response
+
+    cascade = list(CASCADE)
+
+    # SPECIALIST CHECK (Agent 5 - E-commerce Priority)
+    # Run FIRST if domain matches to ensure High-Res Specialist logic is used.
+    is_ecommerce = any(d in target_url.lower() for d in ['amazon', 'ebay', 'flipkart'])
+    if is_ecommerce:
+        cascade.insert(0, ("Agent 5 (E-commerce)", run_ecommerce_agent_async, "Agent 5"))
+
+    # ROUTING: winners on this domain first, agents that never get images accepted here are skipped (see routing.py)
+    route = routing.route(target_url) if routing else Route(domain_of(target_url))
+    cascade = route.arrange(cascade, key=lambda step: stage_key(step[2]))
+    if route.wins or route.skip or route.explore:
+        print(f"[{NAME}] Route {route}", file=sys.stderr)
+
+    cascade_keys = [stage_key(judge_name) for _, _, judge_name in cascade]
+    runs = dict(runs or {})
+
+    # === AGENT PIPELINE ===
+
+    # 0. AGENT-7K (ELITE EXTRACTOR) - HIGH PRIORITY
+    # Runs alone (it scrolls and reloads). Its slice leaves room for the fallback agents:
+    # all of them in a row, or the slowest one when they run side by side.
+    if arbiter == "cascade" or not cascade_keys:
+        reserve_ms = reserve_for(cascade_keys)
+    else:
+        reserve_ms = max(expected_cost(key) for key in cascade_keys)
+    candidates = []
+    if route.allows("agent_7k"):
+        events.send("agent_started", agent="Agent 7K")
+        try:
+            candidates, agent_note = await deadline.run("agent_7k", run_agent_7k_async(page), reserve_ms, timings=timings)
+            runs["agent_7k"] = timings.stages["agent_7k"]
+            events.send("agent_result", agent="Agent 7K", candidates=len(candidates), images=candidates)
+        except DeadlineExceeded as e:
+            print(f"[{NAME}] Agent 7K {e.reason} (deadline).", file=sys.stderr)
+    if candidates:
+        # TRUST AGENT 7K (Enterprise Luxury Mode - Visual Trust)
+        print(f"[{NAME}] Agent 7K success! Found {len(candidates)} images.", file=sys.stderr)
+        if routing:
+            routing.record(target_url, runs, "agent_7k")
+        return {"source_url": target_url, "product_images": candidates, "total_images": len(candidates), "strategy_used": "Agent 7K (Enterprise Luxury)"}
+
+    # --- FALLBACK: STANDARD CASCADE (Agents 1-6) ---
+    print(f"[{NAME}] Agent 7K yielded no visual results. Engaging Tactical Cascade (Agents 1-6, {arbiter})...", file=sys.stderr)
+
+    hits = set()
+    if arbiter == "cascade":
+        best = await run_cascade(page, page_ctx, cascade, timings, deadline, runs, probe, events)
+    else:
+        best = await run_parallel(page, page_ctx, cascade, timings, deadline, runs, latency_first=(arbiter == "latency"), probe=probe, events=events, hits=hits)
+
+    final_images, strategy, note = best or ([], "None", "All agents failed.")
+
+    if routing:
+        winner = next((stage_key(judge_name) for label, _, judge_name in cascade if label == strategy), None)
+        routing.record(target_url, runs, winner, hits)
+
+    if not final_images and (deadline.skipped or deadline.cut):
+        note = f"All agents failed (deadline: skipped {', '.join(deadline.skipped + deadline.cut)})."
+
+    # === FINAL OUTPUT ===
+    response["strategy_used"] = strategy
+    response["total_images"] = len(final_images)
+    response["product_images"] = final_images
+    response["note"] = note
+
+    return response
+
+class Engine:
+    """
+    async with Engine(concurrency=8) as engine:
+        result = await engine.scrape(url)
+        async for result in engine.scrape_many(urls): ...
+    """
+
+    def __init__(self, concurrency=MAX_CONTEXTS):
+        self.concurrency = max(1, concurrency)
+        self.playwright = None
+        self.pool = None
+        self.routing = RoutingTable() if ROUTING_ENABLED else None
+        self.http = HttpPool(headers=HTTP_HEADERS) if FASTPATH_ENABLED or PROBE_ENABLED or DEDUP_ENABLED else None
+        self.probe = None
+        self.dedup = None
+        self.sessions = SessionStore() if SESSIONS_ENABLED else None
+
+    async def __aenter__(self):
+        if PROBE_ENABLED:
+            self.probe = ImageProbe(self.http)
+        if DEDUP_ENABLED:
+            self.dedup = ImageDedup(self.http, self.probe)
+        self.playwright = await async_playwright().start()
+        self.pool = BrowserPool(
+            self.playwright,
+            launch_browser,
+            # Real User Agent to bypass basic blocking
+            context_options={"viewport": None, "user_agent": USER_AGENT},
+            max_concurrency=self.concurrency,
+            pages_per_context=PAGES_PER_CONTEXT,
+            jobs_per_browser=JOBS_PER_BROWSER,
+            max_rss_mb=MAX_BROWSER_RSS_MB
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.pool.close()
+        await self.playwright.stop()
+        if self.routing:
+            self.routing.close()
+        if self.http:
+            self.http.close()
+
+    async def scrape(self, target_url, budget_ms=None, events=SILENT):
+        """
+        Scrapes one URL on a page leased from the pool (waits for a free slot).
+        The budget (default TOTAL_BUDGET_MS) starts once the page is leased; the API already
+        takes its own queue time off the budget it sends.
+        Progress goes to `events` (see events.py); the caller sends the final result itself.
+        Exceptions propagate; callers decide how to report them.
+        """
+        timings = Timings()
+        budget_ms = TOTAL_BUDGET_MS if budget_ms is None else budget_ms
+
+        # FAST PATH: one HTTP GET, no browser (see fastpath.py). The browser gets what is left of the budget.
+        deadline = Deadline(budget_ms)
+        result, runs = await self._fast_path(target_url, timings, budget_ms)
+        if not result:
+            # Warm session: the domain's cookies from an earlier scrape (see sessions.py)
+            session = self.sessions.checkout(target_url) if self.sessions else None
+            async with self.pool.page(timings, storage_state=session.state if session else None) as page:
+                deadline = Deadline(budget_ms - timings.stages.get("fastpath", 0))
+                result = await scrape_page(page, target_url, timings, deadline, routing=self.routing, runs=runs, probe=self.probe, events=events)
+                if session:
+                    await self._keep_session(session, page, result, timings)
+
+        # One image per photo: same picture at several sizes / on several hosts (see dedup.py)
+        if self.dedup and result["total_images"] > 1:
+            try:
+                result["product_images"] = await deadline.run("dedup", self.dedup.dedupe(result["product_images"]), timings=timings)
+                result["total_images"] = len(result["product_images"])
+            except DeadlineExceeded:
+                pass
+
+        result["timings"] = timings.as_dict()
+        result["deadline"] = deadline.as_dict()
+        observe(timings.stages)
+        return result
+
+    async def scrape_many(self, urls, budget_ms=None):
+        """
+        Yields one result per URL in completion order, so a slow page never holds back the fast ones.
+        A crash on one URL becomes that URL's SCRAPER_CRASH result instead of failing the batch.
+        """
+        tasks = [asyncio.ensure_future(self._scrape_safe(u, budget_ms)) for u in urls]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    async def _fast_path(self, target_url, timings, budget_ms):
+        """
+        Returns (result, None) when the static HTML was enough, else (None, runs for the routing table).
+        Domains where it never wins stop trying it (routing.MIN_RUNS), except on exploration scrapes.
+        """
+        if not self.http or not FASTPATH_ENABLED:
+            return None, None
+        route = self.routing.route(target_url) if self.routing else Route(domain_of(target_url))
+        if not route.allows("fastpath"):
+            return None, None
+
+        timeout_ms = min(FASTPATH_TIMEOUT_MS, budget_ms // 4)
+        if timeout_ms <= 0:
+            return None, None
+        with timings.stage("fastpath"):
+            try:
+                result, reason = await asyncio.wait_for(fast_scrape(self.http, target_url, timeout_ms, self.probe), timeout_ms / 1000)
+            except asyncio.TimeoutError:
+                result, reason = None, "Timed out"
+            except Exception as e:
+                # Parse / extract / probe errors: the browser cascade still gets the page
+                result, reason = None, f"Error: {str(e)[:80]}"
+        runs = {"fastpath": timings.stages["fastpath"]}
+
+        if result:
+            print(f"[{NAME}] Fast path success! Found {result['total_images']} images without the browser.", file=sys.stderr)
+            if self.routing:
+                self.routing.record(target_url, runs, "fastpath")
+            return result, None
+        print(f"[{NAME}] Fast path gave up ({reason}). Opening the browser...", file=sys.stderr)
+        return None, runs
+
+    async def _keep_session(self, session, page, result, timings):
+        """
+        Saves the context's cookies for the next scrape of the domain, or discards a blocked session.
+        Failed navigations keep the session as it was: they say nothing about the cookies.
+        """
+        note = result.get("note") or ""
+        if note == "BLOCKED_BY_AMAZON_CAPTCHA":
+            self.sessions.burn(session)
+            return
+        if note.startswith("Navigation Failed") or note.startswith("Deadline reached before"):
+            return
+        with timings.stage("session_save"):
+            try:
+                state = await asyncio.wait_for(page.context.storage_state(), SESSION_SAVE_TIMEOUT_MS / 1000)
+            except Exception as e:
+                print(f"[{NAME}] Could not read session state: {str(e)[:80]}", file=sys.stderr)
+                return
+            self.sessions.save(session, state)
+
+    async def health(self, probe=False):
+        return await self.pool.health(probe=probe)
+
+    async def _scrape_safe(self, target_url, budget_ms=None):
+        try:
+            return await self.scrape(target_url, budget_ms)
+        except Exception as e:
+            return {"source_url": target_url, "error_code": "SCRAPER_CRASH", "message": str(e)}
@@ -0,0 +1,33 @@
+# scraper/events.py
+"""
+SCRAPE EVENTS
+-------------
+Progress of one scrape, sent as it happens instead of only at the end, one JSON object per line:
+    {"event": "page_loaded", "url": "https://...", "ready": "network_idle", "ms": 2310.4}
+    {"event": "agent_started", "agent": "Agent 7K"}
+    {"event": "agent_result", "agent": "Agent 7K", "candidates": 0, "images": []}
+    {"event": "agent_started", "agent": "Agent 1"}
+    {"event": "agent_result", "agent": "Agent 1", "candidates": 14, "images": ["https://..."]}
+    {"event": "final", "result": {...same JSON as without events...}}
+
+`agent_result.images` are the images that passed the judges (and the probe); an agent whose
+result is not empty is the answer the scrape would give if it stopped right there. The gateway
+keeps the last one, so a scrape killed on timeout still answers with what it found.
+
+Transports (scraper.py): `--events` on the CLI prints the lines above; in worker mode each line
+carries the job id and the final answer stays the usual {"id", "result"} line.
+"""
+
+class ScrapeEvents:
+    def __init__(self, emit=None):
+        """
+        emit = callable(dict), called once per event. Without it every send() is a no-op.
+        """
+        self.emit = emit
+
+    def send(self, event, **data):
+        if self.emit:
+            self.emit({"event": event, **data})
+
+# Shared no-op instance for scrapes nobody listens to
+SILENT = ScrapeEvents()
@@ -0,0 +1,376 @@
+# scraper/fastpath.py
+"""
+FAST PATH (NO BROWSER)
+----------------------
+Many product pages already ship their images in the server-rendered HTML. For those, one plain
+HTTP GET (http_pool.py) + an HTML parse in Python replaces the whole Firefox scrape.
+
+How it works:
+1. GET: the page, with the same User-Agent as the browser (pooled keep-alive connections).
+2. Static Snapshot: the HTML is parsed into the SAME shape as the in-page harvest
+   (agents/harvest.py) for the fields that do not need a layout engine: MARKS matches with
+   src / srcset / data-* / inline background, product JSON scripts, JSON-LD, Shopify detection,
+   title and H1. So the agents' own scoring functions run on it unchanged.
+3. Extraction, in cascade priority order, each through final_judgment (and the image probe):
+   - Agent 5 (Amazon data-old-hires / data-a-dynamic-image, eBay zoom, Flipkart classes)
+   - Agent 6 (Shopify product JSON, then Shopify DOM classes)
+   - Agent 1 (AJIO -1117Wx1400H- source pattern)
+   - Agent 4 (Myntra grid, when the background is inline)
+   - JSON-LD Product.image (schema.org, any site)
+4. Bail Out -> browser: non-HTML or error status, block / captcha page, JS shell
+   (almost no text, no images, an app mount point), or nothing found.
+
+FASTPATH_ENABLED (SCRAPER_FASTPATH=off disables) and the routing table decide when it is tried.
+"""
+
+import json
+import os
+import re
+import sys
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+try:
+    from judges import final_judgment
+    from agents.harvest import MARKS
+    from agents.ecommerce import (
+        pick_platform, ebay_candidates, amazon_candidates, flipkart_candidates,
+        finish_ebay, finish_amazon, finish_flipkart
+    )
+    from agents.shopify import score_shopify
+    from agents.structural import ajio_matches, filter_ajio
+    from agents.myntra import background_images, finish_myntra
+except ImportError:
+    sys.path.append('scraper')
+    from judges import final_judgment
+    from agents.harvest import MARKS
+    from agents.ecommerce import (
+        pick_platform, ebay_candidates, amazon_candidates, flipkart_candidates,
+        finish_ebay, finish_amazon, finish_flipkart
+    )
+    from agents.shopify import score_shopify
+    from agents.structural import ajio_matches, filter_ajio
+    from agents.myntra import background_images, finish_myntra
+
+NAME = "FAST_PATH"
+
+FASTPATH_ENABLED = os.environ.get("SCRAPER_FASTPATH", "on").lower() not in ("off", "0", "false")
+TIMEOUT_MS = 8000
+
+BLOCK_MARKERS = [
+    'access denied', 'robot check', 'captcha', 'are you a robot', 'pardon our interruption',
+    'request unsuccessful', 'attention required', 'px-captcha', 'verify you are human'
+]
+SHELL_MOUNTS = ['id="root"', 'id="__next"', 'id="app"', 'id="__nuxt"', 'id="mountRoot"']
+SHELL_MAX_TEXT = 500 # Visible text characters below which a page with a mount point is a JS shell
+
+# === MINI SELECTOR ENGINE ===
+# Enough CSS for MARKS: tag, #id, .class, [attr] compounds, descendant combinator, comma lists.
+COMPOUND = re.compile(r'^([a-z0-9]*)((?:[#.][\w-]+|\[[\w-]+\])*)$', re.I)
+
+def compile_selector(selector):
+    """
+    'a.x b#y, c' -> [[part, part], [part]]; part = (tag, id, classes, attrs). None when unsupported.
+    """
+    compiled = []
+    for chain in selector.split(','):
+        parts = []
+        for compound in chain.split():
+            match = COMPOUND.match(compound)
+            if not match:
+                return None
+            tag, rest = match.group(1).lower(), match.group(2)
+            ids = re.findall(r'#([\w-]+)', rest)
+            classes = re.findall(r'\.([\w-]+)', rest)
+            attrs = re.findall(r'\[([\w-]+)\]', rest)
+            parts.append((tag, ids[0] if ids else None, classes, attrs))
+        compiled.append(parts)
+    return compiled
+
+def part_matches(part, element):
+    tag, el_id, classes, attrs = part
+    if tag and element["tag"] != tag:
+        return False
+    if el_id and element["attrs"].get("id") != el_id:
+        return False
+    if classes and not set(classes) <= element["classes"]:
+        return False
+    return all(a in element["attrs"] for a in attrs)
+
+def chain_matches(chain, element, ancestors):
+    if not part_matches(chain[-1], element):
+        return False
+    # Descendant combinator: remaining parts match ancestors, nearest first
+    i = len(chain) - 2
+    for ancestor in reversed(ancestors):
+        if i < 0:
+            break
+        if part_matches(chain[i], ancestor):
+            i -= 1
+    return i < 0
+
+STATIC_MARKS = {name: compile_selector(sel) for name, sel in MARKS.items()}
+
+# === STATIC SNAPSHOT ===
+
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+BG_URL = re.compile(r'''background(?:-image)?\s*:[^;]*url\(\s*['"]?(.*?)['"]?\s*\)''', re.I)
+
+DATA_KEY = re.compile(r'-([a-z])')
+
+def dataset(attrs):
+    # data-old-hires -> oldHires (same keys as element.dataset)
+    return {DATA_KEY.sub(lambda m: m.group(1).upper(), name[5:]): value
+            for name, value in attrs.items() if name.startswith('data-')}
+
+class StaticHarvest(HTMLParser):
+    def __init__(self, base_url):
+        super().__init__(convert_charrefs=True)
+        self.base = base_url
+        self.stack = []
+        self.nodes = []
+        self.marks = {name: [] for name in MARKS}
+        self.product_json = []
+        self.json_ld = []
+        self.title = ""
+        self.h1 = ""
+        self.text_chars = 0
+        self.img_count = 0
+        self._script = None   # (kind, id, chunks) while inside a <script>
+        self._capture = None  # "title" | "h1" while inside one
+        self._skip_text = 0   # inside <style> / <noscript> / non-data <script>
+
+    def handle_starttag(self, tag, attr_list):
+        attrs = {name.lower(): (value or "") for name, value in attr_list}
+        element = {"tag": tag, "attrs": attrs, "classes": set(attrs.get("class", "").split())}
+
+        if tag == "base" and attrs.get("href"):
+            self.base = urljoin(self.base, attrs["href"])
+        if tag == "img":
+            self.img_count += 1
+
+        matched = [name for name, chains in STATIC_MARKS.items()
+                   if chains and any(chain_matches(c, element, self.stack) for c in chains)]
+        if matched:
+            self.nodes.append(self.node(element))
+            for name in matched:
+                self.marks[name].append(len(self.nodes) - 1)
+
+        if tag == "script":
+            kind = attrs.get("type", "").lower()
+            self._script = (kind, attrs.get("id", ""), [])
+        elif tag in ("style", "noscript"):
+            self._skip_text += 1
+        elif tag == "title" and not self.title:
+            self._capture = ("title", [])
+        elif tag == "h1" and not self.h1:
+            self._capture = ("h1", [])
+
+        if tag not in VOID_TAGS:
+            self.stack.append(element)
+
+    def handle_startendtag(self, tag, attr_list):
+        self.handle_starttag(tag, attr_list)
+        if tag not in VOID_TAGS and self.stack and self.stack[-1]["tag"] == tag:
+            self.stack.pop()
+
+    def handle_endtag(self, tag):
+        if tag == "script" and self._script:
+            kind, script_id, chunks = self._script
+            text = "".join(chunks)
+            if kind == "application/ld+json":
+                self.json_ld.append(text)
+            elif kind == "application/json" and ("product" in script_id.lower() or '"images":' in text):
+                self.product_json.append(text)
+            self._script = None
+        elif tag in ("style", "noscript") and self._skip_text:
+            self._skip_text -= 1
+        elif self._capture and tag == self._capture[0]:
+            text = " ".join("".join(self._capture[1]).split())
+            setattr(self, tag, text)
+            self._capture = None
+
+        # Pop up to the matching open tag (tolerates unclosed children)
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i]["tag"] == tag:
+                del self.stack[i:]
+                break
+
+    def handle_data(self, data):
+        if self._script:
+            self._script[2].append(data)
+            return
+        if self._skip_text:
+            return
+        if self._capture:
+            self._capture[1].append(data)
+        self.text_chars += len(data.strip())
+
+    def node(self, element):
+        attrs = element["attrs"]
+        is_img = element["tag"] == "img"
+        bg = BG_URL.search(attrs.get("style", ""))
+        return {
+            "tag": element["tag"],
+            "id": attrs.get("id", ""),
+            "cls": attrs.get("class", ""),
+            "src": urljoin(self.base, attrs["src"]) if is_img and attrs.get("src") else "",
+            "current_src": "",
+            "srcset": attrs.get("srcset", ""),
+            "data": dataset(attrs),
+            "bg": urljoin(self.base, bg.group(1)) if bg else None,
+            "shadow": False,
+        }
+
+def static_snapshot(html, url):
+    """
+    Harvest-shaped snapshot of server-rendered HTML (see module docstring for what is filled in).
+    """
+    parser = StaticHarvest(url)
+    parser.feed(html)
+    parser.close()
+    return {
+        "url": url,
+        "title": parser.title,
+        "h1": parser.h1,
+        "nodes": parser.nodes,
+        "marks": parser.marks,
+        "product_json": parser.product_json,
+        "json_ld": parser.json_ld,
+        "meta_images": meta_images(html),
+        "shopify": "Shopify.shop" in html or "window.Shopify" in html,
+        "shopify_source": "cdn.shopify.com" in html or "myshopify" in html,
+        "text_chars": parser.text_chars,
+        "img_count": parser.img_count,
+    }
+
+META_JSON = re.compile(r'var meta\s*=\s*(\{.*?\});\s*(?:\n|for|var|window)', re.S)
+
+def meta_images(html):
+    # Shopify themes: `var meta = {"product": {...}}` (window.meta.product.images in the browser)
+    match = META_JSON.search(html)
+    if not match:
+        return []
+    try:
+        images = json.loads(match.group(1)).get("product", {}).get("images")
+    except (ValueError, AttributeError):
+        return []
+    return images if isinstance(images, list) else []
+
+# === JSON-LD ===
+
+def json_ld_images(snapshot):
+    """
+    schema.org Product.image (string, list, ImageObject), including @graph documents.
+    """
+    images = []
+
+    def visit(item):
+        if isinstance(item, list):
+            for entry in item:
+                visit(entry)
+            return
+        if not isinstance(item, dict):
+            return
+        kind = item.get("@type")
+        kinds = kind if isinstance(kind, list) else [kind]
+        if "Product" in kinds or "ProductGroup" in kinds:
+            add(item.get("image"))
+            visit(item.get("hasVariant"))
+        visit(item.get("@graph"))
+
+    def add(value):
+        if isinstance(value, str):
+            images.append(value)
+        elif isinstance(value, list):
+            for entry in value:
+                add(entry)
+        elif isinstance(value, dict):
+            add(value.get("contentUrl") or value.get("url"))
+
+    for text in snapshot["json_ld"]:
+        try:
+            visit(json.loads(text))
+        except ValueError:
+            continue
+    return [urljoin(snapshot["url"], u) for u in dict.fromkeys(images) if u]
+
+# === DETECTION ===
+
+def bail_reason(response, html, snapshot):
+    """
+    Why this page needs the browser (None when the static HTML is worth reading).
+    """
+    if response.status >= 400:
+        return f"HTTP {response.status}"
+    if "html" not in response.content_type.lower():
+        return f"Not HTML ({response.content_type or 'no content type'})"
+    # Real pages load captcha scripts too: the body only counts when there is little else on the page
+    title = snapshot["title"].lower()
+    body = html.lower() if snapshot["text_chars"] < SHELL_MAX_TEXT * 4 else ""
+    if any(marker in title or marker in body for marker in BLOCK_MARKERS):
+        return "Block page"
+    if snapshot["img_count"] == 0 and snapshot["text_chars"] < SHELL_MAX_TEXT and any(m in html for m in SHELL_MOUNTS):
+        return "JS shell"
+    return None
+
+# === EXTRACTION ===
+
+def extract(snapshot, html, url):
+    """
+    Yields (images, strategy, note) for each strategy the judges accept, in priority order.
+    """
+    page_ctx = {"title": snapshot["title"], "h1": snapshot["h1"], "url": url}
+    attempts = []
+
+    platform = pick_platform(url)
+    if platform:
+        candidates = {"ebay": ebay_candidates, "amazon": amazon_candidates, "flipkart": flipkart_candidates}[platform](snapshot)
+        finish = {"ebay": finish_ebay, "amazon": finish_amazon, "flipkart": finish_flipkart}[platform]
+        attempts.append(("Agent 5 (E-commerce)", "Agent 5", lambda: finish(candidates)))
+    attempts.append(("Agent 6 (Shopify)", "Agent 6", lambda: score_shopify(snapshot)))
+    if "ajio.com" in url:
+        attempts.append(("Agent 1 (Structural)", "Agent 1", lambda: (filter_ajio(ajio_matches(html)), "Structural: AJIO High-Res Regex")))
+    if "myntra.com" in url:
+        attempts.append(("Agent 4 (Myntra)", "Agent 4", lambda: finish_myntra(background_images(snapshot))))
+    attempts.append(("JSON-LD", "JSON-LD", lambda: (json_ld_images(snapshot), "JSON-LD Product.image")))
+
+    for label, judge_name, run in attempts:
+        images, note = run()
+        if not images:
+            continue
+        judged = final_judgment(page_ctx, list(images), f"{judge_name} (fast path)")
+        if judged:
+            yield judged, label, note
+
+async def fast_scrape(pool, url, timeout_ms=TIMEOUT_MS, probe=None):
+    """
+    Returns (response_dict, None) when the static HTML was enough, else (None, reason).
+    With `probe` (probe.ImageProbe), a strategy whose images are all thumbnails does not count.
+    """
+    try:
+        response = await pool.get_async(url, timeout_ms / 1000)
+    except Exception as e:
+        return None, f"GET failed: {str(e)[:80]}"
+
+    html = response.text()
+    snapshot = static_snapshot(html, response.url)
+    reason = bail_reason(response, html, snapshot)
+    if reason:
+        return None, reason
+
+    for images, strategy, note in extract(snapshot, html, response.url):
+        if probe:
+            images = await probe.filter(images)
+        if images:
+            break
+    else:
+        return None, "Nothing in the static HTML"
+
+    return {
+        "source_url": url,
+        "strategy_used": f"{strategy} [fast path]",
+        "total_images": len(images),
+        "product_images": images,
+        "note": note
+    }, None
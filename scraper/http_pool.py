@@ -0,0 +1,148 @@
+# scraper/http_pool.py
+"""
+HTTP CONNECTION POOL (NO BROWSER)
+---------------------------------
+Plain GETs for the fast path (fastpath.py) and the image probe (probe.py), standard library only.
+
+- Keep-Alive: idle connections are kept per (scheme, host, port), up to MAX_IDLE_PER_HOST,
+  so repeat requests to the same shop skip the TCP + TLS handshake.
+- Redirects: followed up to MAX_REDIRECTS.
+- Compression: gzip / deflate bodies are decoded.
+- Partial Reads: `max_bytes` stops reading early (ranged requests; a server that ignores
+  the Range header costs a closed connection, not a full download).
+- Async: `get_async` runs the blocking call in a worker thread (asyncio.to_thread).
+"""
+
+import asyncio
+import gzip
+import http.client
+import ssl
+import threading
+import zlib
+from urllib.parse import urljoin, urlsplit
+
+MAX_IDLE_PER_HOST = 4
+MAX_REDIRECTS = 5
+MAX_BODY_BYTES = 8 * 1024 * 1024 # Product pages are well below this; anything bigger is not a PDP
+
+class Response:
+    def __init__(self, url, status, headers, body):
+        self.url = url
+        self.status = status
+        self.headers = headers # lowercase names
+        self.body = body
+
+    @property
+    def content_type(self):
+        return self.headers.get("content-type", "")
+
+    def text(self):
+        charset = "utf-8"
+        for part in self.content_type.split(";")[1:]:
+            name, _, value = part.strip().partition("=")
+            if name.lower() == "charset" and value:
+                charset = value.strip('"\' ')
+        try:
+            return self.body.decode(charset, errors="replace")
+        except LookupError:
+            return self.body.decode("utf-8", errors="replace")
+
+class HttpPool:
+    def __init__(self, headers=None, timeout_s=10):
+        self.headers = dict(headers or {})
+        self.timeout_s = timeout_s
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._ssl = ssl.create_default_context()
+
+    def get(self, url, timeout_s=None, headers=None, max_bytes=MAX_BODY_BYTES):
+        """
+        Blocking GET. Returns a Response (any status); raises on network errors.
+        `headers` are added to the pool's headers for this request only.
+        """
+        timeout_s = timeout_s or self.timeout_s
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self._request(url, timeout_s, headers or {}, max_bytes)
+            location = response.headers.get("location")
+            if response.status in (301, 302, 303, 307, 308) and location:
+                url = urljoin(url, location)
+                continue
+            return response
+        return response
+
+    async def get_async(self, url, timeout_s=None, headers=None, max_bytes=MAX_BODY_BYTES):
+        return await asyncio.to_thread(self.get, url, timeout_s, headers, max_bytes)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def _request(self, url, timeout_s, extra_headers, max_bytes):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        headers = {"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive", **self.headers, **extra_headers}
+
+        # A pooled connection may have been closed by the server: one retry on a fresh one
+        for attempt in range(2):
+            conn, reused = self._checkout(key, timeout_s)
+            try:
+                conn.request("GET", target, headers=headers)
+                raw = conn.getresponse()
+                body = raw.read(max_bytes + 1)
+            except (http.client.HTTPException, ConnectionError) as e:
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+
+            response_headers = {name.lower(): value for name, value in raw.getheaders()}
+            if raw.will_close or len(body) > max_bytes:
+                conn.close()
+            else:
+                self._checkin(key, conn)
+            return Response(url, raw.status, response_headers, decode_body(body[:max_bytes], response_headers))
+
+    def _checkout(self, key, timeout_s):
+        with self._lock:
+            conns = self._idle.get(key)
+            if conns:
+                conn = conns.pop()
+                conn.timeout = timeout_s
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout_s)
+                return conn, True
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=timeout_s, context=self._ssl), False
+        return http.client.HTTPConnection(host, port, timeout=timeout_s), False
+
+    def _checkin(self, key, conn):
+        with self._lock:
+            conns = self._idle.setdefault(key, [])
+            if len(conns) < MAX_IDLE_PER_HOST:
+                conns.append(conn)
+                return
+        conn.close()
+
+def decode_body(body, headers):
+    encoding = headers.get("content-encoding", "").lower()
+    try:
+        if encoding == "gzip":
+            return gzip.decompress(body)
+        if encoding == "deflate":
+            try:
+                return zlib.decompress(body)
+            except zlib.error:
+                return zlib.decompress(body, -zlib.MAX_WBITS) # raw deflate
+    except (OSError, EOFError, zlib.error):
+        pass
+    return body
@@ -11,6 +11,12 @@ Only images approved by BOTH judges survive.
 from urllib.parse import urlparse
 import sys
 
+try:
+    from tokens import NOISE
+except ImportError:
+    sys.path.append('scraper')
+    from tokens import NOISE
+
 class ProductRelevanceJudge:
     def judge(self, context, images):
         """
@@ -38,36 +44,13 @@ class ProductRelevanceJudge:
 class NoiseEliminationJudge:
     def judge(self, context, images):
         """
-        Explicitly blocks known bad patterns.
+        Explicitly blocks known bad patterns (tokens.NOISE_TERMS, matched as whole URL words).
         """
-        BAD_TOKENS = [
-            'icon', 'logo', 'button', 'sprite', 
-            'banner', 'promo', 'ad-', 'advert',
-            'social', 'facebook', 'twitter', 'instagram',
-            'arrow', 'check', 'star', 'rating',
-            'user', 'avatar', 'profile'
-        ]
-        
-        # Color swatches often are small square images, usually handled by size check in Agents.
-        # But if they leak, we check for 'swatch' token.
-        BAD_TOKENS.append('swatch')
+        return [img for img in images if not NOISE.matches(img)]
 
-        approved = []
-        for img in images:
-            lower_url = img.lower()
-            
-            is_bad = False
-            for token in BAD_TOKENS:
-                if token in lower_url:
-                    is_bad = True
-                    break
-            
-            if is_bad:
-                continue
-                
-            approved.append(img)
-            
-        return approved
+# The judges keep no state: one of each serves every agent
+RELEVANCE_JUDGE = ProductRelevanceJudge()
+NOISE_JUDGE = NoiseEliminationJudge()
 
 def final_judgment(context, candidates, source_agent="Unknown"):
     """
@@ -75,13 +58,10 @@ def final_judgment(context, candidates, source_agent="Unknown"):
     """
     print(f"[Judge] Reviewing {len(candidates)} candidates from {source_agent}...", file=sys.stderr)
     
-    judge1 = ProductRelevanceJudge()
-    judge2 = NoiseEliminationJudge()
-    
     # Round 1
-    r1 = judge1.judge(context, candidates)
+    r1 = RELEVANCE_JUDGE.judge(context, candidates)
     # Round 2
-    r2 = judge2.judge(context, r1)
+    r2 = NOISE_JUDGE.judge(context, r1)
     
     msg = f"Judges approved {len(r2)}/{len(candidates)} images."
     print(f"[Judge] {msg}", file=sys.stderr)
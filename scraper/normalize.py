@@ -0,0 +1,163 @@
+# scraper/normalize.py
+"""
+CDN URL NORMALIZATION ENGINE
+----------------------------
+Every agent upgrades image URLs to the biggest size its CDN serves. The rules live here, ONCE,
+as a table: one entry per CDN, matched on the image host (and its parent domains).
+
+CDN_RULES entry:
+- hosts: host suffixes served by this CDN ("media-amazon.com" matches "m.media-amazon.com").
+- paths: path markers for CDNs served from the shop's own host (Shopify `/cdn/shop/`).
+- sub: (pattern, replacement) rewrites, applied in order. Patterns are compiled once at import.
+- thumb: (pattern, replacement) rewrites from the normalized URL's PATH to a ~100 px rendition (the
+  query is never touched), for stages that only need to look at the picture (dedup.py).
+  CDNs without one are never fetched for it.
+- drop_params: query parameters to remove (size params). The rest of the query is kept verbatim,
+  never re-encoded: CDN queries like H&M's `set=source[/x.jpg]` must reach the server as they were.
+
+Rules:
+1. Host Dispatch: a URL is only matched against its own CDN's rules (dict lookup per host suffix).
+2. Signed URLs are never touched: changing a signed URL breaks its signature (SIGNED_PARAMS).
+3. Protocol-relative URLs (`//cdn...`) become https.
+
+Adding a CDN = adding a table entry; no agent code changes.
+"""
+
+import re
+from functools import lru_cache
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, unquote_plus
+
+CDN_RULES = [
+    {
+        # 71abc._AC_SY879_.jpg -> 71abc.jpg (_AC_, _SX450_, _SL1500_, _CR0,0,300,300_ ...)
+        "name": "amazon",
+        "hosts": ["media-amazon.com", "images-amazon.com", "ssl-images-amazon.com"],
+        "sub": [(r'\._[\w,]+\.(jpe?g|png|webp)', r'.\1')],
+        "thumb": [(r'\.(jpe?g|png|webp)(?=\?|$)', r'._SL100_.\1')],
+    },
+    {
+        # .../s-l500.jpg -> .../s-l1600.jpg
+        "name": "ebay",
+        "hosts": ["ebayimg.com"],
+        "sub": [(r's-l\d+\.', 's-l1600.')],
+        "thumb": [(r's-l\d+\.', 's-l140.')],
+    },
+    {
+        # .../image/128/128/... -> .../image/1664/1664/...
+        "name": "flipkart",
+        "hosts": ["flixcart.com"],
+        "sub": [(r'/image/\d+/\d+/', '/image/1664/1664/')],
+        "thumb": [(r'/image/\d+/\d+/', '/image/128/128/')],
+    },
+    {
+        # tee_1024x1024_crop_center.jpg?v=123 -> tee.jpg?v=123 (the version is kept: it busts stale CDN copies)
+        "name": "shopify",
+        "hosts": ["cdn.shopify.com"],
+        "paths": ["/cdn/shop/"],
+        "sub": [(r'(?:_(?:\d+x\d*|x\d+|small|medium|large|grande|compact|crop_center))+(?=\.[A-Za-z0-9]+(?:\?|$))', '')],
+        "thumb": [(r'\.(jpe?g|png|webp|gif)(?=\?|$)', r'_100x.\1')],
+    },
+    {
+        # h_720,q_90,w_540 -> h_1440,q_90,w_1080
+        "name": "myntra",
+        "hosts": ["myntassets.com"],
+        "sub": [(r'h_\d+,q_\d+,w_\d+', 'h_1440,q_90,w_1080')],
+        "thumb": [(r'h_\d+,q_\d+,w_\d+', 'h_144,q_60,w_108')],
+    },
+    {
+        "name": "hm",
+        "hosts": ["hm.com"],
+        "drop_params": ["imwidth"],
+    },
+    {
+        "name": "zara",
+        "hosts": ["zara.net", "zara.com"],
+        "drop_params": ["w"],
+    },
+]
+
+# Query parameters that mean "this URL is signed / expiring": leave it exactly as it is
+SIGNED_PARAMS = {'sig', 'signature', 'token', 'auth', 'key', 'hmac', 'expires', 'timestamp', 'policy', 'key-pair-id'}
+SIGNED_PREFIXES = ('x-amz-', 'x-goog-')
+
+def _compile(rule):
+    return {
+        "name": rule["name"],
+        "sub": [(re.compile(pattern), replacement) for pattern, replacement in rule.get("sub", [])],
+        "thumb": [(re.compile(pattern), replacement) for pattern, replacement in rule.get("thumb", [])],
+        "drop_params": set(rule.get("drop_params", [])),
+    }
+
+HOST_INDEX = {host: _compile(rule) for rule in CDN_RULES for host in rule.get("hosts", [])}
+PATH_RULES = [(marker, _compile(rule)) for rule in CDN_RULES for marker in rule.get("paths", [])]
+
+def rule_for(host, path):
+    """
+    The compiled CDN rule for this host (or path marker), None when no CDN matches.
+    """
+    parts = host.split('.')
+    for i in range(len(parts) - 1):
+        rule = HOST_INDEX.get('.'.join(parts[i:]))
+        if rule:
+            return rule
+    for marker, rule in PATH_RULES:
+        if marker in path:
+            return rule
+    return None
+
+def is_signed(query):
+    for name, _ in parse_qsl(query, keep_blank_values=True):
+        name = name.lower()
+        if name in SIGNED_PARAMS or name.startswith(SIGNED_PREFIXES):
+            return True
+    return False
+
+@lru_cache(maxsize=4096)
+def normalize(url):
+    """
+    Highest-resolution form of one image URL (unchanged when no CDN rule applies or it is signed).
+    """
+    url = url.strip()
+    if url.startswith('//'):
+        url = 'https:' + url
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    rule = rule_for((parts.hostname or "").lower(), parts.path)
+    if not rule or is_signed(parts.query):
+        return url
+
+    if rule["drop_params"] and parts.query:
+        pieces = parts.query.split('&')
+        kept = [p for p in pieces if unquote_plus(p.split('=', 1)[0]) not in rule["drop_params"]]
+        if len(kept) < len(pieces):
+            url = urlunsplit(parts._replace(query='&'.join(kept)))
+    for pattern, replacement in rule["sub"]:
+        url = pattern.sub(replacement, url)
+    return url
+
+@lru_cache(maxsize=4096)
+def thumbnail(url):
+    """
+    A small (~100 px) rendition of the image from its own CDN, or None when the CDN has no
+    thumb rule or the URL is signed.
+    """
+    url = normalize(url)
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+    rule = rule_for((parts.hostname or "").lower(), parts.path)
+    if not rule or not rule["thumb"] or is_signed(parts.query):
+        return None
+    path = parts.path
+    for pattern, replacement in rule["thumb"]:
+        path = pattern.sub(replacement, path)
+    return urlunsplit(parts._replace(path=path)) if path != parts.path else None
+
+def normalize_all(urls):
+    """
+    normalize() over a list; duplicates after normalization are dropped, order kept.
+    """
+    return list(dict.fromkeys(normalize(u) for u in urls if u))
@@ -0,0 +1,137 @@
+# scraper/readiness.py
+"""
+READINESS (EVENT-DRIVEN WAITS)
+------------------------------
+Replaces fixed sleeps with "wait until the page is actually ready, and not a millisecond longer".
+
+A page is READY as soon as one of these is true:
+1. Gallery Present: a known gallery selector (harvest.GALLERY_SELECTORS + per-domain extras)
+   matches an element holding a finished <img>, and the DOM has been still for SETTLE_MS.
+2. DOM Quiet: no mutations for QUIET_MS (server-rendered pages with no recognizable gallery).
+3. Network Idle: Playwright's `networkidle`.
+4. Cap: the per-domain ceiling. Never longer than the old fixed sleep.
+
+- wait_until_ready_async: after goto / reload.
+- wait_for_quiet_async: short settle after a scroll, click or mouse move.
+"""
+
+import asyncio
+import sys
+from urllib.parse import urlparse
+
+try:
+    from agents.harvest import GALLERY_SELECTORS
+except ImportError:
+    sys.path.append('scraper')
+    from agents.harvest import GALLERY_SELECTORS
+
+NAME = "READINESS"
+
+SETTLE_MS = 150
+QUIET_MS = 800
+DEFAULT_CAP_MS = 5000 # The old fixed sleep after goto
+
+# Domain -> extra gallery selectors + cap. Matched on the host and its parent domains.
+PROFILES = {
+    "amazon.in": {"selectors": ["#landingImage", "#imgTagWrapperId img"], "cap_ms": 4000},
+    "amazon.com": {"selectors": ["#landingImage", "#imgTagWrapperId img"], "cap_ms": 4000},
+    "ebay.com": {"selectors": [".ux-image-carousel-item img"], "cap_ms": 4000},
+    "flipkart.com": {"selectors": ["img._396cs4", "img._2r_T1I", "img.q6DClP"], "cap_ms": 4000},
+    "myntra.com": {"selectors": [".image-grid-image"], "cap_ms": 5000},
+    "ajio.com": {"selectors": [], "cap_ms": 6000},
+    "hm.com": {"selectors": [".product-detail-main-image-container img", "figure.pdp-image-template img"], "cap_ms": 5000},
+}
+
+DEFAULT_PROFILE = {"selectors": [], "cap_ms": DEFAULT_CAP_MS}
+
+# Resolves with the reason the page counts as ready.
+READY_JS = '''({selectors, settleMs, quietMs, capMs}) => new Promise(resolve => {
+    const start = performance.now();
+    let lastMutation = start;
+
+    const observer = new MutationObserver(() => { lastMutation = performance.now(); });
+    observer.observe(document.documentElement, {
+        childList: true, subtree: true, attributes: true,
+        attributeFilter: ['src', 'srcset', 'style', 'class']
+    });
+
+    // Gallery = matched element that is (or holds) an <img> that finished loading or failed
+    const hasGallery = () => selectors.some(sel => {
+        let el = null;
+        try { el = document.querySelector(sel); } catch (e) { return false; }
+        if (!el) return false;
+        if (el.tagName === 'IMG') return el.complete;
+        const img = el.querySelector('img');
+        return img ? img.complete : getComputedStyle(el).backgroundImage.startsWith('url(');
+    });
+
+    const done = (reason) => {
+        observer.disconnect();
+        resolve(reason);
+    };
+
+    const tick = () => {
+        const now = performance.now();
+        const quietFor = now - lastMutation;
+        if (quietFor >= settleMs && hasGallery()) return done('gallery');
+        if (quietFor >= quietMs && document.readyState !== 'loading') return done('quiet');
+        if (now - start >= capMs) return done('cap');
+        setTimeout(tick, 50);
+    };
+    tick();
+})'''
+
+def profile_for(url):
+    parts = (urlparse(url).hostname or "").lower().split('.')
+    for i in range(len(parts)):
+        profile = PROFILES.get('.'.join(parts[i:]))
+        if profile:
+            return profile
+    return DEFAULT_PROFILE
+
+def ready_args(url, cap_ms=None, quiet_ms=QUIET_MS):
+    profile = profile_for(url)
+    return {
+        "selectors": profile["selectors"] + GALLERY_SELECTORS,
+        "settleMs": SETTLE_MS,
+        "quietMs": quiet_ms,
+        "capMs": cap_ms if cap_ms is not None else profile["cap_ms"]
+    }
+
+async def wait_until_ready_async(page, url, cap_ms=None):
+    """
+    Races the DOM check against Playwright's `networkidle`.
+    Returns the readiness reason ('gallery', 'quiet', 'network_idle', 'cap' or 'error').
+    """
+    args = ready_args(url, cap_ms)
+    dom = asyncio.ensure_future(page.evaluate(READY_JS, args))
+    network = asyncio.ensure_future(page.wait_for_load_state("networkidle", timeout=args["capMs"]))
+    try:
+        done, _ = await asyncio.wait({dom, network}, return_when=asyncio.FIRST_COMPLETED)
+        if dom in done:
+            return dom.result()
+        if network.exception() is None:
+            return "network_idle"
+        # networkidle timed out: the DOM check has hit its own cap by now
+        return await dom
+    except Exception as e:
+        print(f"[{NAME}] Readiness wait aborted: {str(e)[:80]}", file=sys.stderr)
+        return "error"
+    finally:
+        for task in (dom, network):
+            if not task.done():
+                task.cancel()
+            # Swallow "exception never retrieved" on the loser
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+def quiet_args(quiet_ms, cap_ms):
+    return {"selectors": [], "settleMs": quiet_ms, "quietMs": quiet_ms, "capMs": cap_ms}
+
+async def wait_for_quiet_async(page, quiet_ms=150, cap_ms=500):
+    """
+    Waits until the DOM stops changing (after a scroll / click), at most cap_ms.
+    """
+    try:
+        return await page.evaluate(READY_JS, quiet_args(quiet_ms, cap_ms))
+    except Exception:
+        return "error"
@@ -0,0 +1,144 @@
+# scraper/recovery.py
+"""
+LOW-YIELD RECOVERY LADDER
+-------------------------
+Agent 7K's retry for Amazon / Flipkart pages that showed fewer than MIN_YIELD gallery images.
+A full reload doubles the network and render cost of the page, so it is the LAST rung:
+
+1. Mutation: wait (at most MUTATION_CAP_MS) for the gallery to appear / the DOM to settle, re-query.
+2. Scroll: scroll the gallery into view (lazy galleries only fill in when visible), re-query.
+3. Source: scan the already-loaded page source for the hi-res URLs the scripts have not rendered yet
+   (in-page, see harvest.source_matches_async: no document dump).
+4. Reload: reload + readiness wait, re-query. Only while the domain has reload budget left.
+
+The ladder stops at the first rung that brings the page to MIN_YIELD images.
+
+Reload Budget: at most RELOADS_PER_WINDOW reloads per domain per RELOAD_WINDOW_S, per process
+(SCRAPER_RELOAD_BUDGET, 0 = never reload). A burst of low-yield pages on one shop can no longer
+turn into a burst of double page loads.
+
+- recover_async(page, candidates): new candidates ({'src', 'method'}).
+"""
+
+import os
+import re
+import sys
+import time
+from collections import deque
+
+try:
+    from readiness import wait_until_ready_async, wait_for_quiet_async
+    from agents.harvest import source_matches_async, invalidate
+    from routing import domain_of
+except ImportError:
+    sys.path.append('scraper')
+    from readiness import wait_until_ready_async, wait_for_quiet_async
+    from agents.harvest import source_matches_async, invalidate
+    from routing import domain_of
+
+NAME = "RECOVERY"
+
+MIN_YIELD = 2           # Gallery images below which a page counts as low-yield
+MUTATION_CAP_MS = 1500  # Rung 1: longest wait for the gallery to show up
+RELOADS_PER_WINDOW = int(os.environ.get("SCRAPER_RELOAD_BUDGET", "3"))
+RELOAD_WINDOW_S = 600
+
+# Amazon main image / dynamic images, Flipkart gallery (same selectors as readiness.PROFILES)
+RETRY_SELECTOR = "#landingImage, #imgTagWrapperId img, .a-dynamic-image, img._396cs4, img._2r_T1I, img.q6DClP"
+RETRY_JS = "els => els.map(e => e.getAttribute('data-old-hires') || e.getAttribute('src'))"
+GALLERY_ANCHOR = "#imgTagWrapperId, #main-image-container, #altImages, img._396cs4, img._2r_T1I, img.q6DClP"
+SCROLL_JS = '''(sel) => {
+    const el = document.querySelector(sel);
+    if (!el) return false;
+    el.scrollIntoView({block: 'center'});
+    return true;
+}'''
+
+# Rung 3: hi-res URLs in the source (Amazon image JSON / attributes, Flipkart CDN paths)
+SOURCE_PATTERNS = [
+    re.compile(r'"hiRes"\s*:\s*"(https://[^"]+)"'),
+    re.compile(r'data-old-hires="(https://[^"]+)"'),
+    re.compile(r'"large"\s*:\s*"(https://m\.media-amazon\.com/images/I/[^"]+)"'),
+    re.compile(r'(https://rukminim\d*\.flixcart\.com/image/[^"\s\\]+\.(?:jpe?g|png|webp)(?:\?q=\d+)?)'),
+]
+
+class ReloadBudget:
+    """
+    Sliding window of reload times per domain.
+    """
+    def __init__(self, per_window=RELOADS_PER_WINDOW, window_s=RELOAD_WINDOW_S):
+        self.per_window = per_window
+        self.window_s = window_s
+        self.reloads = {}  # domain -> deque of monotonic times
+
+    def take(self, domain):
+        """
+        Uses one reload of the domain's budget. False (and nothing used) when it is spent.
+        """
+        now = time.monotonic()
+        times = self.reloads.setdefault(domain, deque())
+        while times and now - times[0] > self.window_s:
+            times.popleft()
+        if len(times) >= self.per_window:
+            return False
+        times.append(now)
+        return True
+
+BUDGET = ReloadBudget()
+
+class Ladder:
+    """
+    Bookkeeping for one climb: which URLs the page already gave, which rung found what.
+    """
+    def __init__(self, candidates):
+        self.seen = {c.get('src') for c in candidates if c.get('src')}
+        self.start = len(self.seen)
+        self.found = []
+
+    def add(self, rung, urls):
+        for url in urls:
+            if url and url not in self.seen:
+                self.seen.add(url)
+                self.found.append({'src': url, 'method': f'retry_{rung}'})
+
+    def enough(self, rung):
+        if len(self.seen) < MIN_YIELD:
+            return False
+        print(f"[{NAME}] Recovered {len(self.seen) - self.start} image(s) at rung '{rung}'.", file=sys.stderr)
+        return True
+
+async def recover_async(page, candidates):
+    """
+    Climbs the ladder. Returns only the candidates it found (the caller keeps its own).
+    """
+    ladder = Ladder(candidates)
+    try:
+        await wait_until_ready_async(page, page.url, cap_ms=MUTATION_CAP_MS)
+        invalidate(page) # DOM may have changed: later agents and rung 3 need a fresh read
+        ladder.add("mutation", await page.eval_on_selector_all(RETRY_SELECTOR, RETRY_JS))
+        if ladder.enough("mutation"):
+            return ladder.found
+
+        if await page.evaluate(SCROLL_JS, GALLERY_ANCHOR):
+            await wait_for_quiet_async(page)
+            invalidate(page)
+            ladder.add("scroll", await page.eval_on_selector_all(RETRY_SELECTOR, RETRY_JS))
+            if ladder.enough("scroll"):
+                return ladder.found
+
+        ladder.add("source", await source_matches_async(page, SOURCE_PATTERNS))
+        if ladder.enough("source"):
+            return ladder.found
+
+        if not BUDGET.take(domain_of(page.url)):
+            print(f"[{NAME}] Reload budget spent for {domain_of(page.url)}, not reloading.", file=sys.stderr)
+            return ladder.found
+        print(f"[{NAME}] Cheap rungs failed. Reloading...", file=sys.stderr)
+        await page.reload(wait_until="domcontentloaded")
+        invalidate(page)
+        await wait_until_ready_async(page, page.url)
+        ladder.add("reload", await page.eval_on_selector_all(RETRY_SELECTOR, RETRY_JS))
+        ladder.enough("reload")
+    except Exception as e:
+        print(f"[{NAME}] Recovery error: {e}", file=sys.stderr)
+    return ladder.found
@@ -0,0 +1,136 @@
+# scraper/resource_policy.py
+"""
+RESOURCE POLICY (REQUEST INTERCEPTION)
+--------------------------------------
+The agents read DOM attributes, URLs and JSON (currentSrc, srcset, data-zoom-src, JSON-LD,
+Shopify JSON). They almost never need the bytes behind them, so we stop paying for them.
+
+Every request of a page goes through one route handler:
+1. Always Blocked: video/audio, web fonts, text tracks, known tracker/ad hosts.
+2. Per-Domain Profile: decides whether image binaries are downloaded and which script hosts may run.
+   - Default (unknown sites): images ALLOWED, all non-tracker scripts ALLOWED. Agent 2 (Context),
+     Agent 1 (extract_from_container) and 7K check `naturalWidth`, which stays 0 for an image that never loaded.
+   - Known sites whose specialist reads URLs only (Amazon, eBay, Flipkart, Myntra, AJIO): images BLOCKED,
+     and third-party scripts BLOCKED (only the site itself + its own asset CDNs in `script_hosts`).
+3. Everything else (documents, CSS, XHR) goes through untouched.
+
+Set SCRAPER_RESOURCE_POLICY=off to disable interception completely.
+"""
+
+import os
+import sys
+from urllib.parse import urlparse
+
+NAME = "RESOURCE_POLICY"
+
+ENABLED = os.environ.get("SCRAPER_RESOURCE_POLICY", "on").lower() not in ("off", "0", "false")
+
+# Resource types no agent ever looks at
+ALWAYS_BLOCKED_TYPES = {"media", "font", "texttrack"}
+
+# Analytics / ads / session replay. Matched on the host and all its parent domains.
+TRACKER_HOSTS = {
+    "google-analytics.com", "googletagmanager.com", "googleadservices.com", "googlesyndication.com",
+    "doubleclick.net", "adservice.google.com", "connect.facebook.net", "facebook.net",
+    "analytics.tiktok.com", "bat.bing.com", "clarity.ms", "hotjar.com", "segment.io", "segment.com",
+    "criteo.com", "criteo.net", "taboola.com", "outbrain.com", "scorecardresearch.com",
+    "amazon-adsystem.com", "nr-data.net", "quantserve.com", "ct.pinterest.com", "sc-static.net",
+    "moatads.com", "adnxs.com", "branch.io", "mixpanel.com", "fullstory.com", "newrelic.com"
+}
+
+# script_hosts=None: every script may run. A set: only the site's own domain + these hosts.
+DEFAULT_PROFILE = {"images": True, "script_hosts": None}
+
+AMAZON = {"images": False, "script_hosts": {"media-amazon.com", "ssl-images-amazon.com"}}
+EBAY = {"images": False, "script_hosts": {"ebaystatic.com", "ebayimg.com"}}
+
+# Domain -> profile. Matched like TRACKER_HOSTS (www.amazon.in -> amazon.in).
+PROFILES = {
+    # Agent 5 reads data-old-hires / data-a-dynamic-image / data-zoom-src / src attributes
+    "amazon.in": AMAZON,
+    "amazon.com": AMAZON,
+    "amazon.co.uk": AMAZON,
+    "ebay.com": EBAY,
+    "ebay.co.uk": EBAY,
+    "flipkart.com": {"images": False, "script_hosts": {"flixcart.com", "flipkart.net"}},
+    # Agent 4 reads background-image URLs from computed style (no download needed)
+    "myntra.com": {"images": False, "script_hosts": {"myntassets.com", "myntra.net"}},
+    # Agent 1 pulls the 1117W URLs out of the page source
+    "ajio.com": {"images": False, "script_hosts": set()},
+}
+
+def host_suffixes(host):
+    """
+    www.shop.amazon.in -> [www.shop.amazon.in, shop.amazon.in, amazon.in, in]
+    """
+    parts = (host or "").lower().split('.')
+    return ['.'.join(parts[i:]) for i in range(len(parts))]
+
+def matches_host(host, table):
+    for suffix in host_suffixes(host):
+        if suffix in table:
+            return suffix
+    return None
+
+def profile_for(url):
+    """
+    Returns (site domain, profile). Unknown sites get (None, DEFAULT_PROFILE).
+    """
+    match = matches_host(urlparse(url).hostname, PROFILES)
+    return (match, PROFILES[match]) if match else (None, DEFAULT_PROFILE)
+
+def block_reason(resource_type, url, site, profile):
+    """
+    Returns why a request should be blocked, or None to let it through.
+    """
+    if resource_type in ALWAYS_BLOCKED_TYPES:
+        return resource_type
+    host = urlparse(url).hostname
+    if matches_host(host, TRACKER_HOSTS):
+        return "tracker"
+    if resource_type == "image" and not profile["images"]:
+        return "image"
+    if resource_type == "script" and profile["script_hosts"] is not None:
+        allowed = profile["script_hosts"] | {site}
+        if not matches_host(host, allowed):
+            return "third_party_script"
+    return None
+
+class ResourcePolicy:
+    """
+    One per page. Keeps a count of what it blocked, by reason.
+    """
+
+    def __init__(self, target_url):
+        self.site, self.profile = profile_for(target_url)
+        self.blocked = {}
+        self.allowed = 0
+
+    async def install(self, page):
+        if ENABLED:
+            await page.route("**/*", self._handle)
+        return self
+
+    async def _handle(self, route):
+        request = route.request
+        reason = block_reason(request.resource_type, request.url, self.site, self.profile)
+        try:
+            if reason:
+                self.blocked[reason] = self.blocked.get(reason, 0) + 1
+                await route.abort()
+            else:
+                self.allowed += 1
+                # Fallback (not continue_) so context-level routes still get a say
+                await route.fallback()
+        except Exception:
+            # Page already closed / request already handled: nothing left to do
+            pass
+
+    def summary(self):
+        return {"allowed": self.allowed, "blocked": dict(self.blocked)}
+
+    def log(self):
+        if not ENABLED:
+            return
+        total = sum(self.blocked.values())
+        print(f"[{NAME}] Blocked {total} requests {self.blocked}, allowed {self.allowed}.", file=sys.stderr)
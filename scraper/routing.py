@@ -0,0 +1,159 @@
+# scraper/routing.py
+"""
+DOMAIN ROUTING TABLE
+--------------------
+We scrape the same few hundred domains over and over. This table remembers, per domain,
+which agent won and how long each agent took, and reorders the cascade for the next request.
+
+Storage: one SQLite file (SCRAPER_ROUTING_DB, default `data/routing.sqlite`), shared by all
+workers. `SCRAPER_ROUTING_DB=off` disables routing.
+
+Routing rules (per domain, www. stripped):
+1. Winner First: the fallback agent with the most wins runs first (ties keep today's priority order).
+   Agent 7K keeps its Priority 0 slot whenever it runs.
+2. Skip Losers: an agent that ran MIN_RUNS times and never produced accepted images is skipped.
+   That includes Agent 7K, whose scroll / reload is the most expensive step of the scrape.
+   Hits are counted apart from wins: with the parallel / latency arbiters a working fallback
+   often loses on priority, and it must still be there the day the winner breaks.
+3. Explore: every EXPLORE_EVERY-th scrape of a domain runs the full default order, so a site
+   that changes its layout gets re-learned.
+
+Routing is an optimization: any storage error is logged and the scrape carries on unrouted.
+"""
+
+import os
+import sqlite3
+import sys
+import time
+from urllib.parse import urlparse
+
+NAME = "ROUTING"
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "routing.sqlite")
+DB_PATH = os.environ.get("SCRAPER_ROUTING_DB", DEFAULT_PATH)
+ENABLED = DB_PATH.lower() not in ("off", "0", "false", "")
+
+MIN_RUNS = 5        # Runs without a hit before an agent is skipped on a domain
+EXPLORE_EVERY = 20  # Every Nth scrape of a domain ignores the table
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS domains (
+    domain TEXT PRIMARY KEY,
+    scrapes INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS outcomes (
+    domain TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    runs INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    hits INTEGER NOT NULL DEFAULT 0,
+    total_ms REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (domain, agent)
+);
+'''
+
+def domain_of(url):
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+class Route:
+    """
+    The plan for one scrape of a domain: wins per agent (stage keys, e.g. "agent_5") and the agents to skip.
+    """
+    def __init__(self, domain, wins=None, skip=None, explore=False):
+        self.domain = domain
+        self.wins = wins or {}
+        self.skip = set(skip or ())
+        self.explore = explore
+
+    def allows(self, agent):
+        return agent not in self.skip
+
+    def arrange(self, steps, key):
+        """
+        Reorders `steps` by wins (ties keep their given priority order) and drops skipped ones.
+        `key(step)` gives the step's stage key.
+        """
+        kept = [s for s in steps if key(s) not in self.skip]
+        return sorted(kept, key=lambda s: -self.wins.get(key(s), 0))
+
+    def __str__(self):
+        if self.explore:
+            return f"{self.domain}: exploring (default order)"
+        order = sorted(self.wins, key=lambda a: -self.wins[a])
+        return f"{self.domain}: first {order or '-'}, skip {sorted(self.skip) or '-'}"
+
+class RoutingTable:
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._db = None
+
+    def _connect(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Several worker processes share the file: short busy timeout, WAL for concurrent readers
+            self._db = sqlite3.connect(self.path, timeout=1.0)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+            # Tables created before hits were counted
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(outcomes)")}
+            if "hits" not in columns:
+                with self._db:
+                    self._db.execute("ALTER TABLE outcomes ADD COLUMN hits INTEGER NOT NULL DEFAULT 0")
+                    self._db.execute("UPDATE outcomes SET hits = wins")
+        return self._db
+
+    def route(self, url):
+        """
+        Returns the Route for this URL's domain (an empty Route when nothing is known yet).
+        """
+        domain = domain_of(url)
+        try:
+            db = self._connect()
+            row = db.execute("SELECT scrapes FROM domains WHERE domain = ?", (domain,)).fetchone()
+            scrapes = row[0] if row else 0
+            if scrapes and scrapes % EXPLORE_EVERY == 0:
+                return Route(domain, explore=True)
+
+            outcomes = db.execute("SELECT agent, runs, wins, hits FROM outcomes WHERE domain = ?", (domain,)).fetchall()
+        except (sqlite3.Error, OSError) as e:
+            print(f"[{NAME}] Routing table unavailable: {e}", file=sys.stderr)
+            return Route(domain)
+
+        wins = {agent: wins for agent, runs, wins, hits in outcomes if wins > 0}
+        skip = [agent for agent, runs, wins, hits in outcomes if hits == 0 and runs >= MIN_RUNS]
+        return Route(domain, wins, skip)
+
+    def record(self, url, runs, winner=None, hits=()):
+        """
+        runs: {stage key: ms} for every agent that ran to the end on this scrape.
+        winner: stage key of the agent whose result was returned (None when all failed).
+        hits: stage keys of the agents whose images were accepted, won or not (the winner always is).
+        """
+        hits = set(hits)
+        if winner:
+            hits.add(winner)
+        domain = domain_of(url)
+        try:
+            db = self._connect()
+            with db:
+                db.execute(
+                    "INSERT INTO domains (domain, scrapes, updated_at) VALUES (?, 1, ?) "
+                    "ON CONFLICT(domain) DO UPDATE SET scrapes = scrapes + 1, updated_at = excluded.updated_at",
+                    (domain, time.time())
+                )
+                for agent, ms in runs.items():
+                    db.execute(
+                        "INSERT INTO outcomes (domain, agent, runs, wins, hits, total_ms) VALUES (?, ?, 1, ?, ?, ?) "
+                        "ON CONFLICT(domain, agent) DO UPDATE SET runs = runs + 1, wins = wins + excluded.wins, "
+                        "hits = hits + excluded.hits, total_ms = total_ms + excluded.total_ms",
+                        (domain, agent, int(agent == winner), int(agent in hits), ms)
+                    )
+        except (sqlite3.Error, OSError) as e:
+            print(f"[{NAME}] Failed to record outcome for {domain}: {e}", file=sys.stderr)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
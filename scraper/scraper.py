@@ -5,7 +5,7 @@ CORE SCRAPER ARBITER (3-AGENT CASCADE)
 Orchestrates the High-Accuracy Extraction Pipeline.
 Updated for AJIO (Firefox Headless Mode - Production Ready).
 
-Pipeline:
+Pipeline (see engine.py):
 1. Firefox Init (Bypasses Chrome Blocking, Headless)
 2. Context Extraction (Title, H1)
 3. Agent 1: Structural (Strict) -> Judges
@@ -16,228 +16,159 @@ Pipeline:
 8. Agent 6: Shopify Specialist -> Judges
 9. Agent 7K: Elite Extractor (Priority 0) -> Judges
 10. Final Output
+
+Modes:
+- `scraper.py <url>`                     One-shot: prints one JSON result and exits.
+- `scraper.py [--concurrency N] <url>...` Batch: one JSON line per URL as each finishes (one browser).
+- `scraper.py --worker`                  Long-lived: warm Firefox, jobs over stdin/stdout (used by the Node worker pool).
+- `--budget-ms N`                        Time budget per URL (default TOTAL_BUDGET_MS, see deadline.py).
+- `--events`                             One-shot mode prints progress lines first, the result last (see events.py).
 """
 
+import argparse
+import asyncio
+import os
 import sys
 import json
-import time
-import random
-from playwright.sync_api import sync_playwright
-
-NAME = "MAIN_ORCHESTRATOR"
 
-# Agents
 try:
-    from agents.structural import run_structural_agent
-    from agents.context import run_context_agent
-    from agents.visual import run_visual_agent
-    from agents.myntra import run_myntra_agent
-    from agents.ecommerce import run_ecommerce_agent
-    from agents.shopify import run_shopify_agent
-    from agents.agent_7k import run_agent_7k
-    from judges import final_judgment
+    from engine import Engine, MAX_CONTEXTS, NAME, TOTAL_BUDGET_MS
+    from events import ScrapeEvents, SILENT
 except ImportError:
     sys.path.append('scraper')
-    from agents.structural import run_structural_agent
-    from agents.context import run_context_agent
-    from agents.visual import run_visual_agent
-    from agents.myntra import run_myntra_agent
-    from agents.ecommerce import run_ecommerce_agent
-    from agents.shopify import run_shopify_agent
-    from agents.agent_7k import run_agent_7k
-    from judges import final_judgment
-
-# Config
-TOTAL_BUDGET_MS = 570000 # 9.5 minutes (Leave buffer for Node timeout) 
-
-def stabilize_page(page):
-    try:
-        page.mouse.move(100, 100)
-        time.sleep(0.5)
-    except:
-        pass
-
-def extract_page_context(page):
-    return page.evaluate('''() => {
-        let h1 = document.querySelector('h1');
-        return {
-            title: document.title || "",
-            h1: h1 ? h1.innerText.trim() : "",
-            url: window.location.href
-        }
-    }''')
+    from engine import Engine, MAX_CONTEXTS, NAME, TOTAL_BUDGET_MS
+    from events import ScrapeEvents, SILENT
+
+async def run_worker():
+    """
+    WORKER MODE (`scraper.py --worker`)
+    Keeps one warm Firefox alive and takes jobs over stdin/stdout, one JSON object per line:
+        IN:  {"id": "42", "url": "https://...", "budget_ms": 60000, "events": true}   (budget_ms, events optional)
+        OUT: {"id": "42", "event": "agent_result", "agent": "Agent 1", ...}   (only with events, see events.py)
+        OUT: {"id": "42", "result": {...same JSON the CLI prints...}, "health": {...}}
+        IN:  {"id": "43", "cmd": "health"}
+        OUT: {"id": "43", "health": {"ok": true, "rss_mb": 412.5, ...}}
+        IN:  {"id": "44", "cmd": "cancel", "target": "42"}
+        OUT: {"id": "42", "cancelled": true}
+    A {"event": "ready"} line is sent once the browser is up.
+    Up to MAX_CONTEXTS jobs run at the same time; answers come back in completion order.
+    The browser pool recycles contexts and restarts Firefox when it hits its job/memory ceilings.
+    """
+    # The protocol owns stdout. Anything else that prints goes to stderr with the agent logs.
+    protocol = sys.stdout
+    sys.stdout = sys.stderr
+
+    def send(message):
+        protocol.write(json.dumps(message) + "\n")
+        protocol.flush()
+
+    tasks = {}
+
+    async def handle_job(job_id, target_url, budget_ms, events):
+        try:
+            result = await engine.scrape(target_url, budget_ms, events)
+        except asyncio.CancelledError:
+            send({"id": job_id, "cancelled": True})
+            return
+        except Exception as e:
+            result = {"error_code": "SCRAPER_CRASH", "message": str(e)}
+        finally:
+            tasks.pop(job_id, None)
+
+        send({"id": job_id, "result": result, "health": await engine.health()})
+
+    async def handle_health(job_id):
+        send({"id": job_id, "health": await engine.health(probe=True)})
+
+    async with Engine(concurrency=MAX_CONTEXTS) as engine:
+        send({"event": "ready", "pid": os.getpid()})
+
+        while True:
+            line = await asyncio.to_thread(sys.stdin.readline)
+            if not line:
+                break
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                job = json.loads(line)
+            except ValueError:
+                send({"event": "error", "error_code": "INVALID_JOB", "message": "Job line is not valid JSON."})
+                continue
+
+            job_id = job.get("id")
+
+            # Health probe from the gateway (answered even while jobs are running)
+            if job.get("cmd") == "health":
+                asyncio.ensure_future(handle_health(job_id))
+                continue
+
+            # Gateway gave up on a job (timeout): stop it and free its browser slot
+            if job.get("cmd") == "cancel":
+                task = tasks.get(job.get("target"))
+                if task:
+                    task.cancel()
+                continue
+
+            target_url = job.get("url")
+            if not target_url:
+                send({"id": job_id, "result": {"error_code": "MISSING_ARGUMENT", "message": "No URL provided."}})
+                continue
+
+            events = ScrapeEvents(lambda event, job_id=job_id: send({"id": job_id, **event})) if job.get("events") else SILENT
+            tasks[job_id] = asyncio.ensure_future(handle_job(job_id, target_url, job.get("budget_ms"), events))
+
+        # stdin closed: let in-flight jobs finish before the browser goes away
+        if tasks:
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+async def run_once(target_url, budget_ms, events=SILENT):
+    async with Engine(concurrency=1) as engine:
+        return await engine.scrape(target_url, budget_ms, events)
+
+async def run_batch(urls, concurrency, budget_ms):
+    async with Engine(concurrency=concurrency) as engine:
+        async for result in engine.scrape_many(urls, budget_ms):
+            print(json.dumps(result), flush=True)
 
 def main():
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(description="Universal product image scraper.")
+    parser.add_argument("urls", nargs="*", help="Product page URL(s)")
+    parser.add_argument("--worker", action="store_true", help="Run as a long-lived worker (jobs over stdin/stdout)")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONTEXTS, help="Pages scraped at the same time in batch mode")
+    parser.add_argument("--budget-ms", type=int, default=TOTAL_BUDGET_MS, help="Time budget per URL; the best result so far is returned when it runs out")
+    parser.add_argument("--events", action="store_true", help="One-shot mode: print progress events (one JSON line each), then the result as a final event")
+    args = parser.parse_args()
+
+    if args.worker:
+        asyncio.run(run_worker())
+        return
+
+    if not args.urls:
         print(json.dumps({"error_code": "MISSING_ARGUMENT", "message": "No URL provided."}))
         sys.exit(1)
-        
-    target_url = sys.argv[1]
-    
+
+    if len(args.urls) > 1:
+        print(f"[{NAME}] Batch of {len(args.urls)} URLs, concurrency {args.concurrency}", file=sys.stderr)
+        asyncio.run(run_batch(args.urls, args.concurrency, args.budget_ms))
+        return
+
+    events = SILENT
+    if args.events:
+        # Progress lines must reach the reader now, not when the buffer fills
+        events = ScrapeEvents(lambda event: print(json.dumps(event), flush=True))
+
     try:
-        with sync_playwright() as p:
-            # === FIREFOX LAUNCH (HEADLESS) ===
-            # Firefox Headless bypasses AJIO rules that block Chrome Headless.
-            # This is "Production Ready" (Invisible).
-            
-            browser = p.firefox.launch(
-                headless=True,
-                args=[
-                    "--no-remote",
-                    "--disable-dev-shm-usage", # Critical for Docker OOM
-                    "--disable-background-networking",
-                    "--disable-gpu" 
-                ]
-            )
-            
-            # Real User Agent to bypass basic blocking
-            context = browser.new_context(
-                viewport=None,
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            )
-            page = context.new_page()
-            
-            # Init Response
-            response = {
-                "source_url": target_url,
-                "strategy_used": "None",
-                "total_images": 0,
-                "product_images": [],
-                "note": ""
-            }
-            
-            # Load
-            try:
-                page.goto(target_url, wait_until='domcontentloaded', timeout=60000)
-                time.sleep(5) 
-            except Exception as e:
-                response["note"] = f"Navigation Failed: {str(e)[:50]}"
-                print(json.dumps(response))
-                browser.close()
-                sys.exit(0)
-                
-            stabilize_page(page)
-            
-            # Quick Post-Load Check (Blocking Detection)
-            page_title = page.title()
-            if "Access Denied" in page_title or "Robot Check" in page_title or "CAPTCHA" in page_title:
-                response["note"] = "BLOCKED_BY_AMAZON_CAPTCHA"
-                print(json.dumps(response))
-                browser.close()
-                sys.exit(0)
-            
-            # === CONTEXT ===
-            page_ctx = extract_page_context(page)
-            
-            final_images = []
-            strategy = "None"
-            note = "All agents failed."
-
-            # === AGENT PIPELINE ===
-
-            # 0. AGENT-7K (ELITE EXTRACTOR) - HIGH PRIORITY
-            candidates, agent_note = run_agent_7k(page)
-            if candidates:
-                # TRUST AGENT 7K (Enterprise Luxury Mode - Visual Trust)
-                final_images = candidates
-                strategy = "Agent 7K (Enterprise Luxury)"
-                note = agent_note
-                print(f"[{NAME}] Agent 7K success! Found {len(candidates)} images.", file=sys.stderr)
-                print(json.dumps({"product_images": candidates, "total_images": len(candidates), "strategy_used": "Agent 7K (Enterprise Luxury)"}))
-                return
-
-            # --- FALLBACK: STANDARD CASCADE (Agents 1-6) ---
-            print(f"[{NAME}] Agent 7K yielded no visual results. Engaging Tactical Cascade (Agents 1-6)...", file=sys.stderr)
-            
-            # 1. Structural Agent (Microdata/JSON-LD) - FASTEST
-            # 0. SPECIALIST CHECK (Agent 5 - E-commerce Priority)
-            # Run FIRST if domain matches to ensure High-Res Specialist logic is used.
-            is_ecommerce = any(d in target_url.lower() for d in ['amazon', 'ebay', 'flipkart'])
-            if is_ecommerce:
-                candidates, agent_note = run_ecommerce_agent(page)
-                if candidates:
-                    candidates = list(candidates)
-                    judged = final_judgment(page_ctx, candidates, "Agent 5")
-                    if judged:
-                        final_images = judged
-                        strategy = "Agent 5 (E-commerce)"
-                        note = agent_note
-
-            # 6. SHOPIFY SPECIALIST (Agent 6)
-            if not final_images:
-                candidates, agent_note = run_shopify_agent(page)
-                if candidates:
-                    judged = final_judgment(page_ctx, candidates, "Agent 6")
-                    if judged:
-                        final_images = judged
-                        strategy = "Agent 6 (Shopify)"
-                        note = agent_note
-
-            # 1. Structural (Agent 1)
-            if not final_images:
-                candidates, agent_note = run_structural_agent(page)
-                if candidates:
-                    judged = final_judgment(page_ctx, candidates, "Agent 1")
-                    if judged:
-                        final_images = judged
-                        strategy = "Agent 1 (Structural)"
-                        note = agent_note
-            
-            if not final_images:
-                candidates, agent_note = run_context_agent(page)
-                if candidates:
-                    judged = final_judgment(page_ctx, candidates, "Agent 2")
-                    if judged:
-                        final_images = judged
-                        strategy = "Agent 2 (Context)"
-                        note = agent_note
-            
-            if not final_images:
-                candidates, agent_note = run_visual_agent(page)
-                if candidates:
-                    judged = final_judgment(page_ctx, candidates, "Agent 3")
-                    if judged:
-                        final_images = judged
-                        strategy = "Agent 3 (Visual)"
-                        note = agent_note
-
-            # 4. MYNTRA SPECIFIC (Agent 4)
-            if not final_images:
-                candidates, agent_note = run_myntra_agent(page)
-                if candidates:
-                    judged = final_judgment(page_ctx, candidates, "Agent 4")
-                    if judged:
-                        final_images = judged
-                        strategy = "Agent 4 (Myntra)"
-                        note = agent_note
-
-            # 2. Gallery Finder (DOM Heuristics) - BEST VISUALS
-            # This section seems to be from a different logic flow or file,
-            # as 'NAME' and 'gallery_finder' are not defined in this context.
-            # Assuming this is a placeholder or an example of a new agent.
-            # If this is intended to be active, 'NAME' and 'gallery_finder' need to be defined/imported.
-            # For now, it's commented out to maintain syntactical correctness.
-            # print(f"[{NAME}] Structural extraction failed. Deployed Agent 3 (Gallery Finder)...")
-            # gallery_images = gallery_finder.find_gallery_images(page)
-            # if gallery_images:
-            #     print(f"[{NAME}] Agent 3 (Gallery) success.")
-            #     print(json.dumps({"product_images": gallery_images, "total_images": len(gallery_images), "strategy_used": "Agent 3 (Gallery Finder)"}))
-            #     return
-
-            # === FINAL OUTPUT ===
-            response["strategy_used"] = strategy
-            response["total_images"] = len(final_images)
-            response["product_images"] = final_images
-            response["note"] = note
-            
-            print(json.dumps(response))
-            browser.close()
+        response = asyncio.run(run_once(args.urls[0], args.budget_ms, events))
+        print(json.dumps({"event": "final", "result": response} if args.events else response))
 
     except Exception as e:
-        print(json.dumps({
-            "error_code": "SCRAPER_CRASH", 
+        crash = {
+            "error_code": "SCRAPER_CRASH",
             "message": str(e),
-        }))
+        }
+        print(json.dumps({"event": "final", "result": crash} if args.events else crash))
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -0,0 +1,142 @@
+# scraper/sessions.py
+"""
+PER-DOMAIN SESSION STORE
+------------------------
+A fresh browser context starts with an empty cookie jar, so every visit to AJIO / Amazon / Myntra
+pays for the consent banner, the bot check and the first-visit redirects again.
+This store keeps the context's storage state (cookies + localStorage, Playwright `storage_state()`)
+per domain on local disk and hands it to the next context opened for that domain.
+
+Storage: one JSON file per (domain, slot) in SCRAPER_SESSION_DIR (default `data/sessions`), shared
+by all workers (writes are atomic: temp file + rename). `SCRAPER_SESSION_DIR=off` disables it.
+
+Rules:
+1. Rotation: each domain has SLOTS sessions, handed out in turn, so no single cookie jar carries
+   all of our traffic on a shop. A session is retired after MAX_USES scrapes.
+2. TTL: a session older than TTL_MS (since it was first saved) is deleted and the slot starts cold.
+3. Burned Sessions: a scrape that ends on a block page deletes its session; cookies that got us
+   flagged once will get us flagged again.
+4. Cold Start: an empty slot gives a normal fresh context; its state is saved after the scrape.
+
+Sessions are an optimization: any storage error is logged and the scrape carries on with a fresh context.
+"""
+
+import json
+import os
+import re
+import sys
+import time
+
+try:
+    from routing import domain_of
+except ImportError:
+    sys.path.append('scraper')
+    from routing import domain_of
+
+NAME = "SESSIONS"
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "sessions")
+SESSION_DIR = os.environ.get("SCRAPER_SESSION_DIR", DEFAULT_DIR)
+ENABLED = SESSION_DIR.lower() not in ("off", "0", "false", "")
+
+TTL_MS = int(os.environ.get("SCRAPER_SESSION_TTL_MS", str(6 * 60 * 60 * 1000)))  # 6 hours
+SLOTS = int(os.environ.get("SCRAPER_SESSION_SLOTS", "3"))                         # Sessions per domain
+MAX_USES = 50                                                                     # Scrapes before a session is retired
+
+SAFE_NAME = re.compile(r'[^a-z0-9.-]')
+
+class Session:
+    """
+    One checked-out slot: `state` is the storage_state dict to open the context with (None = cold).
+    """
+    def __init__(self, domain, slot, state=None, created_at=None, uses=0):
+        self.domain = domain
+        self.slot = slot
+        self.state = state
+        self.created_at = created_at
+        self.uses = uses
+
+    def __str__(self):
+        state = f"warm, {self.uses} uses" if self.state else "cold"
+        return f"{self.domain}#{self.slot} ({state})"
+
+class SessionStore:
+    def __init__(self, directory=SESSION_DIR, ttl_ms=TTL_MS, slots=SLOTS):
+        self.directory = directory
+        self.ttl_ms = ttl_ms
+        self.slots = max(1, slots)
+        self.turns = {}  # domain -> next slot
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            print(f"[{NAME}] Cannot create {directory}: {e}", file=sys.stderr)
+
+    def checkout(self, url):
+        """
+        The next session for the URL's domain (round-robin over its slots).
+        Expired and worn-out sessions are deleted here and come back cold.
+        """
+        domain = domain_of(url)
+        slot = self.turns.get(domain, 0)
+        self.turns[domain] = (slot + 1) % self.slots
+
+        session = Session(domain, slot)
+        path = self._path(domain, slot)
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return session
+        except (OSError, ValueError) as e:
+            print(f"[{NAME}] Unreadable session {path}: {e}", file=sys.stderr)
+            self._delete(path)
+            return session
+
+        age_ms = (time.time() - saved.get("created_at", 0)) * 1000
+        if age_ms > self.ttl_ms or saved.get("uses", 0) >= MAX_USES:
+            self._delete(path)
+            return session
+
+        session.state = saved.get("state")
+        session.created_at = saved.get("created_at")
+        session.uses = saved.get("uses", 0)
+        return session
+
+    def save(self, session, state):
+        """
+        Stores the context's storage state after a scrape. The TTL keeps counting from the first save.
+        """
+        path = self._path(session.domain, session.slot)
+        saved = {
+            "domain": session.domain,
+            "created_at": session.created_at or time.time(),
+            "updated_at": time.time(),
+            "uses": session.uses + 1,
+            "state": state
+        }
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(saved, f)
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"[{NAME}] Cannot save session {path}: {e}", file=sys.stderr)
+            self._delete(tmp)
+
+    def burn(self, session):
+        """
+        Deletes a session that ended on a block page.
+        """
+        print(f"[{NAME}] Session {session} was blocked, discarding it.", file=sys.stderr)
+        self._delete(self._path(session.domain, session.slot))
+
+    def _path(self, domain, slot):
+        return os.path.join(self.directory, f"{SAFE_NAME.sub('_', domain) or 'unknown'}.{slot}.json")
+
+    def _delete(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"[{NAME}] Cannot delete {path}: {e}", file=sys.stderr)
@@ -0,0 +1,39 @@
+# scraper/timings.py
+"""
+STAGE TIMINGS
+-------------
+Wall-clock time per pipeline stage for one scrape, returned as the `timings` field of the result:
+    {"total_ms": 4213.7, "stages": {"queue_wait": 0.1, "goto": 1820.4, "agent_7k": 12.3, ...}}
+
+Stages run more than once (e.g. two judgments of the same agent) add up.
+With the parallel arbiter the agent stages overlap, so they can sum to more than total_ms.
+"""
+
+import time
+from contextlib import contextmanager
+
+class Timings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        """
+        with timings.stage("goto"):
+            await page.goto(url)
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def add(self, name, ms):
+        self.stages[name] = self.stages.get(name, 0.0) + ms
+
+    def as_dict(self):
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "stages": {name: round(ms, 1) for name, ms in self.stages.items()}
+        }
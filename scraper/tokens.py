@@ -0,0 +1,103 @@
+# scraper/tokens.py
+"""
+URL TOKEN FILTER
+----------------
+The "is this image junk?" word lists, shared by the Noise Elimination Judge (judges.py) and
+Agent 7K's luxury filter (agents/agent_7k.py).
+
+- Whole Words: terms match URL words, not raw substrings. The host and path are split into segments
+  on anything that is not a letter or digit (/ . _ -). A letter segment is split on camelCase humps
+  and a word with a number after it loses the number, so `star` still catches `star-rating.png`,
+  `icon48.png` and `productThumb.jpg`, but no longer `starter-kit.jpg`. Plurals (s / es) are allowed.
+- Opaque IDs: a segment that mixes letters and digits any other way (`81nAd8U1lWS`, `51e1oFIT9wn`)
+  is a CDN image ID, not words: it is never split and never matches.
+- Segment Terms: a term too short to trust inside camelCase (`ad`) only matches a whole segment
+  (`ad-300x250.jpg`, `/ad/`), which is what the old `ad-` substring meant.
+- Host + Path only: query strings carry hashes and tracking ids, not image names.
+- One Regex per list, compiled at import (TokenMatcher): one scan per URL, whatever the list length.
+"""
+
+import re
+from urllib.parse import urlsplit
+
+# Noise Elimination Judge
+NOISE_TERMS = [
+    'icon', 'favicon', 'logo', 'button', 'sprite',
+    'banner', 'promo', 'advert',
+    'social', 'facebook', 'twitter', 'instagram',
+    'arrow', 'check', 'star', 'rating',
+    'user', 'avatar', 'profile',
+    # Color swatches are usually caught by the agents' size checks; this catches the ones that leak
+    'swatch',
+]
+NOISE_SEGMENTS = ['ad']
+
+# Agent 7K (STRICT FILTER LEVEL 7): everything the judge rejects, plus UI chrome and editorial content.
+# No 'bag': it is a product.
+JUNK_TERMS = NOISE_TERMS + [
+    'base64', 'blank', 'transparent', 'gif', 'loader', 'spinner',
+    'cookielaw', 'tracking', 'pixel', 'pinterest', 'campaign', 'editorial',
+    'thumb', 'thumbnail', 'flag', 'review',
+    'chevron', 'plus', 'minus', 'zoom', 'close', 'cookie',
+    'footer', 'header', 'cart', 'wishlist', 'search', 'menu',
+    'share', 'print', 'download', 'play', 'pause', 'video', 'audio',
+    'placeholder', 'default', 'empty', 'no-image', 'missing', 'broken',
+    'chart', 'guide', 'measure', 'sizing', 'fit', 'infographic'
+]
+
+SEGMENT = re.compile(r'[A-Za-z0-9]+')
+CAMEL_HUMP = re.compile(r'([a-z])([A-Z])')
+NUMBERED = re.compile(r'([A-Za-z]+)[0-9]+')
+
+def url_segments(url):
+    """
+    The host + path segments of the URL, case kept (camelCase is read from it).
+    data: URIs only keep their header ("image/png;base64"), never the payload.
+    """
+    if url.startswith('data:'):
+        return SEGMENT.findall(url[5:url.find(',')] if ',' in url else url[5:])
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return SEGMENT.findall(url)
+    return SEGMENT.findall(parts.netloc + parts.path)
+
+def url_words(segments):
+    """
+    Lowercased words of the segments, space separated ("productThumb2" -> "product thumb productthumb2").
+    Opaque IDs and bare numbers give none.
+    """
+    words = []
+    for segment in segments:
+        if segment.isalpha():
+            words.append(CAMEL_HUMP.sub(r'\1 \2', segment))
+        elif NUMBERED.fullmatch(segment):
+            # icon48, base64: the word, and the segment itself for terms that carry the number
+            words.append(CAMEL_HUMP.sub(r'\1 \2', NUMBERED.fullmatch(segment).group(1)))
+            words.append(segment)
+    return ' '.join(words).lower()
+
+class TokenMatcher:
+    def __init__(self, terms, segments=()):
+        alternation = '|'.join(re.escape(t) for t in sorted(set(terms), key=len, reverse=True))
+        # Multi-word terms ('no-image') match across the space the split left between the words
+        alternation = alternation.replace(re.escape('-'), ' ')
+        self.pattern = re.compile(rf'(?<![a-z0-9])(?:{alternation})(?:e?s)?(?![a-z0-9])')
+        self.segments = {s for t in segments for s in (t, t + 's')}
+
+    def find(self, url):
+        """
+        The first junk word in the URL, or None.
+        """
+        segments = url_segments(url)
+        for segment in segments:
+            if segment.lower() in self.segments:
+                return segment.lower()
+        match = self.pattern.search(url_words(segments))
+        return match.group(0) if match else None
+
+    def matches(self, url):
+        return self.find(url) is not None
+
+NOISE = TokenMatcher(NOISE_TERMS, NOISE_SEGMENTS)
+JUNK = TokenMatcher(JUNK_TERMS, NOISE_SEGMENTS)
@@ -16,13 +16,105 @@ module.exports = {
     // Path to the scraper script (Absolute path is safer)
     SCRAPER_SCRIPT: path.join(__dirname, '../scraper/scraper.py'),
 
-    // Execution Limits
+    // Max JSON request body (batches of thousands of URLs need more than the 100kb default)
+    JSON_BODY_LIMIT: '5mb',
+
     // Execution Limits
     TIMEOUT_MS: 600000, // 10 Minutes (Render Free Tier is slow)
 
+    // Scrape Deadline
+    // Each scrape gets a time budget (`budget_ms` in the request body). The scraper skips agents that
+    // no longer fit and answers with the best result so far, instead of being killed at TIMEOUT_MS.
+    SCRAPE_BUDGET_MS: 570000,      // Default budget (matches TOTAL_BUDGET_MS in scraper/engine.py)
+    SCRAPE_MIN_BUDGET_MS: 5000,    // Smallest budget a client may ask for
+    SCRAPE_BUDGET_GRACE_MS: 15000, // Time the scraper gets past its budget to hand the result back before it is killed
+
+    // Streaming Scrape (GET /api/scrape/stream, Server-Sent Events)
+    SSE_HEARTBEAT_MS: 15000, // Comment line sent while nothing happens, so proxies keep the connection
+
+    // Batch Scraping (POST /api/scrape/batch)
+    BATCH_MAX_URLS: 5000,
+    BATCH_CONCURRENCY: 4,       // Default in-flight scrapes per batch
+    BATCH_MAX_CONCURRENCY: 16,  // Hard cap, whatever the client asks for
+
+    // Result Cache (api/cache.js)
+    // Successful scrapes keyed by canonical product URL. `Cache-Control: no-cache` on a request skips the lookup.
+    CACHE_MAX_ENTRIES: parseInt(process.env.CACHE_MAX_ENTRIES || '5000', 10), // 0 = cache off
+    CACHE_TTL_MS: 6 * 60 * 60 * 1000,                                         // Default: 6 hours
+    CACHE_DOMAIN_TTL_MS: {                                                    // Per domain (and its subdomains)
+        'amazon.in': 60 * 60 * 1000,
+        'amazon.com': 60 * 60 * 1000,
+        'flipkart.com': 60 * 60 * 1000,
+        'ebay.com': 2 * 60 * 60 * 1000,
+        'myntra.com': 12 * 60 * 60 * 1000,
+        'ajio.com': 12 * 60 * 60 * 1000
+    },
+    CACHE_STORE_FILE: process.env.CACHE_STORE_FILE || null,                   // e.g. /data/cache.json to survive restarts
+
+    // Job Queue (POST /api/jobs)
+    JOBS_MAX_QUEUED: 1000,                                           // Waiting jobs before we answer 503
+    JOBS_CONCURRENCY: parseInt(process.env.JOBS_CONCURRENCY || '4', 10), // Jobs scraped at the same time
+    JOBS_STORE_FILE: process.env.JOBS_STORE_FILE || null,            // e.g. /data/jobs.json to survive restarts
+    JOBS_RESULT_TTL_MS: 60 * 60 * 1000,                              // Keep finished jobs for 1 hour
+
+    // Scrape Scheduler (api/scheduler.js)
+    // Admission control in front of the scraper: global + per-domain concurrency and a per-domain
+    // token bucket (rate per second, burst). Waiting scrapes are served round-robin across domains.
+    SCHED_MAX_CONCURRENCY: parseInt(process.env.SCHED_MAX_CONCURRENCY || '0', 10), // 0 = pool slots (workers x pages), 4 without the pool
+    SCHED_DOMAIN_CONCURRENCY: 2,
+    SCHED_DOMAIN_RATE: 1,    // Scrapes started per second per domain (refill rate)
+    SCHED_DOMAIN_BURST: 4,   // Bucket size: back-to-back starts allowed after a quiet period
+    SCHED_DOMAIN_LIMITS: {   // Per domain (and its subdomains); missing keys use the defaults above
+        'amazon.in': { concurrency: 2, rate: 0.5, burst: 2 },
+        'amazon.com': { concurrency: 2, rate: 0.5, burst: 2 },
+        'flipkart.com': { concurrency: 2, rate: 0.5, burst: 2 }
+    },
+
+    // Worker Pool
+    // Long-lived `scraper.py --worker` processes, each keeping a warm Firefox.
+    // Set to 0 to go back to one Python process per request.
+    WORKER_POOL_SIZE: parseInt(process.env.WORKER_POOL_SIZE || '2', 10),
+    WORKER_RESPAWN_DELAY_MS: 1000,
+    WORKER_HEALTH_INTERVAL_MS: 30000, // Probe idle workers (browser alive + can run JS)
+    WORKER_HEALTH_TIMEOUT_MS: 15000,  // No answer in time = worker is killed and respawned
+
+    // Browser Pool (inside each worker)
+    // Passed to Python as SCRAPER_* env vars.
+    BROWSER_MAX_CONTEXTS: parseInt(process.env.BROWSER_MAX_CONTEXTS || '2', 10), // Jobs one worker runs at once (async engine, one Firefox)
+    BROWSER_PAGES_PER_CONTEXT: 1,    // 1 = fresh context per job (cookies come from the session store below)
+    BROWSER_JOBS_PER_BROWSER: 100,   // Restart Firefox after this many jobs
+    BROWSER_MAX_RSS_MB: parseInt(process.env.BROWSER_MAX_RSS_MB || '1500', 10), // ...or when it grows past this
+
+    // Browser Sessions (passed to Python as SCRAPER_SESSION_*)
+    // Cookies + localStorage saved per domain and loaded into the next context for that domain,
+    // so warm visits skip consent banners and first-visit bot checks. 'off' disables it.
+    SESSION_DIR: process.env.SESSION_DIR || path.join(__dirname, '../data/sessions'),
+    SESSION_TTL_MS: 6 * 60 * 60 * 1000, // A session is thrown away 6 hours after it was first saved
+    SESSION_SLOTS: 3,                   // Sessions per domain, used in turn
+
+    // Low-yield Recovery (passed to Python as SCRAPER_RELOAD_BUDGET)
+    // Agent 7K tries a wait, a scroll and the page source before it reloads a low-yield page.
+    RELOAD_BUDGET: 3, // Reloads per domain per 10 minutes, per worker (0 = never reload)
+
+    // Agent Arbiter (passed to Python as SCRAPER_ARBITER)
+    // cascade = fallback agents one after another | parallel = all at once, priority order wins
+    // latency = all at once, first accepted answer wins
+    SCRAPER_ARBITER: process.env.SCRAPER_ARBITER || 'cascade',
+
+    // Domain Routing Table (passed to Python as SCRAPER_ROUTING_DB)
+    // SQLite file shared by all workers: which agent wins on which domain. 'off' disables it.
+    ROUTING_DB_FILE: process.env.ROUTING_DB_FILE || path.join(__dirname, '../data/routing.sqlite'),
+
+    // Browser-free fast path (passed to Python as SCRAPER_FASTPATH)
+    // Plain HTTP GET + static HTML parse before the browser opens. 'off' disables it.
+    SCRAPER_FASTPATH: process.env.SCRAPER_FASTPATH || 'on',
+
 
 
-    // Validation Defaults
+    // Validation Defaults (passed to Python as SCRAPER_MIN_IMAGE_WIDTH / SCRAPER_MIN_IMAGE_HEIGHT)
+    // Judged images whose real size (read from the first KB of the file) is smaller are dropped.
     MIN_IMAGE_WIDTH: 300,
     MIN_IMAGE_HEIGHT: 300,
+    IMAGE_PROBE: process.env.IMAGE_PROBE || 'on', // 'off' = trust the judges, no image requests
+    IMAGE_DEDUP: process.env.IMAGE_DEDUP || 'on', // Merge the same photo served at several sizes / hosts
 };